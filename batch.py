@@ -0,0 +1,204 @@
+'''
+Cilly 批量运行器
+
+把一批 .cilly 文件分发到 ProcessPoolExecutor 的工作进程中运行，
+每个程序的结果作为一行 JSON 按完成顺序写出：
+
+    {"path", "hash", "status", "output", "error", "elapsed", "cached", "primitive_calls"}
+
+- 工作进程池在计时前预热：每个进程先编译运行一个小程序，
+  进程启动、模块导入都在此完成
+- 每个工作进程按源码的 sha256 缓存编译结果 (LRU，最多 COMPILED_CACHE_SIZE 个)，
+  同一源码只编译一次
+- turtle 等 primitive 在工作进程中没有画布，只计数调用次数
+
+用法:
+    python batch.py <目录|清单文件|.cilly 文件>... [-j 进程数] [-o 输出文件] [--max-instructions N]
+
+清单文件 (非 .cilly 后缀) 每行一个路径，相对清单所在目录；空行和 # 开头的行忽略。
+'''
+
+import sys
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, RUNNING, FINISHED, ERROR
+from primitives import PRIMITIVES
+from output import StringSink
+from errors import error_text
+
+BUDGET = 'budget'  # 超出 max_instructions
+TIMEOUT = 'timeout'  # 超出运行时间限制
+
+BATCH_SLICE = 100000
+BATCH_CHUNK = 8  # 每个任务携带的程序数，摊薄小程序的进程间通信开销
+COMPILED_CACHE_SIZE = 256  # 编译缓存最多保留的程序数，超出时淘汰最久未用的
+
+# --- 工作进程 ---
+
+_compiled_cache = OrderedDict()  # sha256 -> (code, consts, scopes, functions)，按最近使用排序
+_cache_lock = threading.Lock()  # 常驻服务在多个线程中调用 compile_cached
+
+WARM_UP_SOURCE = 'define f = fun(n) { return n + 1; }; print(f(1));'
+
+def warm_up():
+    # 工作进程的 initializer：进程启动时先编译运行一个小程序，完成模块导入
+    run_source('<warm-up>', WARM_UP_SOURCE)
+
+def worker_pid(_):
+    return os.getpid()
+
+def source_hash(source):
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+def compile_cached(source, digest):
+    # 锁只保护缓存的查找和插入，编译在锁外进行，大程序的编译不会阻塞其它线程
+    with _cache_lock:
+        compiled = _compiled_cache.get(digest)
+        if compiled is not None:
+            _compiled_cache.move_to_end(digest)
+            return compiled, True
+    ast = cilly_parser(cilly_lexer(source))
+    compiled = cilly_vm_compiler(ast, [prim["name"] for prim in PRIMITIVES])
+    with _cache_lock:
+        _compiled_cache[digest] = compiled
+        while len(_compiled_cache) > COMPILED_CACHE_SIZE:
+            _compiled_cache.popitem(last=False)
+    return compiled, False
+
+def counting_primitives(counter):
+    def make(name):
+        def prim(*args):
+            counter[0] += 1
+        return prim
+    return {prim["name"]: make(prim["name"]) for prim in PRIMITIVES}
+
+def execute(compiled, max_instructions=None, timeout=None):
+    # 运行一个已编译的程序，返回 (状态, 输出, 错误, primitive 调用次数)
+    code, consts, scopes, functions = compiled
+    output = StringSink()
+    counter = [0]
+    # VM 把变量值写进作用域列表，每次运行都要用新的副本
+    vm = CillyVM(code, consts, [list(s) for s in scopes], functions,
+                 primitives=counting_primitives(counter), output=output)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    budget = max_instructions
+    status = RUNNING
+    while status == RUNNING:
+        if budget is not None and budget <= 0:
+            status = BUDGET
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            status = TIMEOUT
+            break
+        n = BATCH_SLICE if budget is None else min(BATCH_SLICE, budget)
+        status = vm.run_for(n)
+        if budget is not None:
+            budget -= n
+    error = error_text(vm.error) if status == ERROR else None
+    return status, output.getvalue(), error, counter[0]
+
+def run_source(path, source, max_instructions=None, timeout=None):
+    digest = source_hash(source)
+    result = {"path": path, "hash": digest, "status": None, "output": "", "error": None,
+              "elapsed": 0.0, "cached": False, "primitive_calls": 0}
+    start = time.perf_counter()
+    try:
+        compiled, result["cached"] = compile_cached(source, digest)
+        result["status"], result["output"], result["error"], result["primitive_calls"] = \
+            execute(compiled, max_instructions, timeout)
+    except Exception as e:
+        result["status"] = ERROR
+        result["error"] = str(e)
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+def run_chunk(chunk, max_instructions=None):
+    return [run_source(path, source, max_instructions) for path, source in chunk]
+
+# --- 主进程 ---
+
+def collect_sources(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in names if n.endswith('.cilly'))
+        elif path.endswith('.cilly'):
+            files.append(path)
+        else:
+            base = os.path.dirname(path)
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        files.append(os.path.join(base, line))
+    return sorted(files)
+
+def read_sources(files):
+    sources = []
+    for path in files:
+        with open(path, encoding='utf-8') as f:
+            sources.append((path, f.read()))
+    return sources
+
+def start_pool(workers=None, warm=True):
+    workers = workers or os.cpu_count() or 1
+    if not warm:
+        return ProcessPoolExecutor(max_workers=workers)
+    # 每个进程启动时都先执行 warm_up，按需启动的进程也不例外；
+    # 再提交与进程数相同的空任务，让进程在计时前都已启动并预热完毕
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+    list(pool.map(worker_pid, range(workers)))
+    return pool
+
+def run_batch(sources, pool, max_instructions=None, write=None, chunk_size=BATCH_CHUNK):
+    # sources: [(path, source)]；按完成顺序回调 write(result)，返回全部结果
+    futures = [pool.submit(run_chunk, sources[i:i + chunk_size], max_instructions)
+               for i in range(0, len(sources), chunk_size)]
+    results = []
+    for future in as_completed(futures):
+        for result in future.result():
+            results.append(result)
+            if write is not None:
+                write(result)
+    return results
+
+def json_line(result):
+    return json.dumps(result, ensure_ascii=False) + '\n'
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='批量运行 Cilly 程序')
+    parser.add_argument('paths', nargs='+', help='目录、清单文件或 .cilly 文件')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='工作进程数，默认为 CPU 核数')
+    parser.add_argument('-o', '--output', default=None, help='JSON lines 输出文件，默认标准输出')
+    parser.add_argument('--max-instructions', type=int, default=None, help='每个程序的指令预算')
+    parser.add_argument('--chunk', type=int, default=BATCH_CHUNK, help='每个任务携带的程序数')
+    args = parser.parse_args(argv)
+
+    sources = read_sources(collect_sources(args.paths))
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    failed = 0
+    try:
+        with start_pool(args.workers) as pool:
+            def write(result):
+                out.write(json_line(result))
+                out.flush()
+            results = run_batch(sources, pool, args.max_instructions, write, args.chunk)
+            failed = sum(1 for r in results if r["status"] != FINISHED)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+'''
+Cilly 基准测试
+
+- corpus.py: 基准程序语料 (循环、递归、大量输出、深层嵌套、大量定义、turtle 绘图)
+- suite.py:  分阶段计时 (词法/语法分析、编译、反汇编、运行)，结果写成 JSON，
+             compare 子命令比较两个结果文件并标出性能回退
+- bench_*.py: 针对单项优化的独立脚本
+
+    python -m benchmarks.suite run -o before.json
+    python -m benchmarks.suite compare before.json after.json
+'''
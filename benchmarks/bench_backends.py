@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+栈式 VM 与寄存器式 VM 对比：指令分派次数与运行时间；
+同时给出 Python 后端 (py_transpiler) 的运行时间作为参照。
+
+用法: python benchmarks/bench_backends.py
+"""
+
+import sys
+import os
+import time
+from io import StringIO
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM
+from reg_compile import cilly_reg_compiler
+from reg_vm import CillyRegVM
+from py_transpiler import cilly_to_py, load_py_module, run_py_module
+
+WORKLOADS = {
+    "loop": '''
+var i = 0;
+var s = 0;
+while (i < 100000) {
+    s = s + i;
+    i = i + 1;
+}
+print(s);
+''',
+    "fib": '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+print(fib(20));
+''',
+    "arith": '''
+var i = 0;
+var a = 1;
+var b = 2;
+var c = 0;
+while (i < 50000) {
+    c = a * b + c - a % 3;
+    a = b;
+    b = c % 1000;
+    i = i + 1;
+}
+print(c);
+''',
+}
+
+
+def count_dispatches(vm):
+    counter = [0]
+
+    def wrap(proc):
+        def counted(pc):
+            counter[0] += 1
+            return proc(pc)
+        return counted
+
+    vm.ops = {op: wrap(proc) for op, proc in vm.ops.items()}
+    return counter
+
+
+def make_stack_vm(ast):
+    code, consts, scopes, functions = cilly_vm_compiler(ast)
+    vm = CillyVM(code, consts, scopes, functions)
+    return vm, lambda: vm.run(show_stats=False)
+
+
+def make_reg_vm(ast):
+    code, consts, functions, frame_size = cilly_reg_compiler(ast)
+    vm = CillyRegVM(code, consts, functions, frame_size)
+    return vm, vm.run
+
+
+def measure(make, ast):
+    vm, run = make(ast)
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        run()
+    elapsed = time.perf_counter() - start
+
+    vm, run = make(ast)
+    counter = count_dispatches(vm)
+    with redirect_stdout(StringIO()):
+        run()
+    return counter[0], elapsed
+
+
+def measure_py(ast):
+    module = load_py_module(cilly_to_py(ast))
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        run_py_module(module)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'workload':10s} {'stack disp':>12s} {'reg disp':>12s} {'stack s':>9s} {'reg s':>9s} {'speedup':>8s} {'py s':>9s}")
+    for name, src in WORKLOADS.items():
+        ast = cilly_parser(cilly_lexer(src))
+        sd, st = measure(make_stack_vm, ast)
+        rd, rt = measure(make_reg_vm, ast)
+        pt = measure_py(ast)
+        print(f"{name:10s} {sd:12d} {rd:12d} {st:9.3f} {rt:9.3f} {st / rt:7.2f}x {pt:9.4f}")
+
+
+if __name__ == "__main__":
+    main()
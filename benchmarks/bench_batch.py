@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+批量运行器的扩展曲线：同一语料在 1, 2, 4, 8 ... 个工作进程上的吞吐量，
+以及相对单进程的加速比。进程池在计时前预热；inproc 行为不经过进程池的顺序运行。
+
+用法: python benchmarks/bench_batch.py [程序数] [最大进程数]
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import start_pool, run_batch, run_source
+
+PROGRAM = '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+var i = 0;
+var s = %d;
+while (i < 20) {
+    s = s + i;
+    i = i + 1;
+}
+print(s, fib(12));
+'''
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    # 一半源码互不相同，一半重复，覆盖编译缓存
+    sources = [(f"p{k}.cilly", PROGRAM % (k % (n // 2 or 1))) for k in range(n)]
+
+    print(f"{n} 个程序, os.cpu_count() = {os.cpu_count()}")
+    print(f"{'workers':>8}{'time(s)':>10}{'progs/s':>10}{'speedup':>10}")
+    start = time.perf_counter()
+    for path, src in sources:
+        run_source(path, src)
+    t = time.perf_counter() - start
+    print(f"{'inproc':>8}{t:>10.2f}{n / t:>10.0f}{'':>10}")
+
+    base = None
+    workers = 1
+    while workers <= max_workers:
+        with start_pool(workers) as pool:
+            start = time.perf_counter()
+            results = run_batch(sources, pool)
+            t = time.perf_counter() - start
+        assert len(results) == n
+        base = base or t
+        print(f"{workers:>8}{t:>10.2f}{n / t:>10.0f}{base / t:>10.2f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+字节码容器基准：对比 Python list 与 array('i') 编码的内存占用和 VM 吞吐量。
+
+用法: python benchmarks/bench_bytecode.py [语句数]
+默认生成 260000 条赋值语句 (超过 100 万条指令)。
+"""
+
+import sys
+import os
+import time
+from io import StringIO
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, decode_code, instruction_count
+
+
+def make_program(n):
+    return "var x = 0;\n" + "x = x + 1;\n" * n + "print(x);\n"
+
+
+def list_code_bytes(code):
+    # list 本身的指针数组 + 非缓存小整数的 int 对象
+    seen = set()
+    total = sys.getsizeof(code)
+    for v in code:
+        if (v < -5 or v > 256) and id(v) not in seen:
+            seen.add(id(v))
+            total += sys.getsizeof(v)
+    return total
+
+
+def time_run(vm):
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        vm.run()
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 260000
+    ast = cilly_parser(cilly_lexer(make_program(n)))
+    code, consts, scopes, functions = cilly_vm_compiler(ast)
+    count = instruction_count(code)
+    list_code = decode_code(code)
+
+    array_bytes = sys.getsizeof(code)
+    list_bytes = list_code_bytes(list_code)
+
+    print(f"指令数: {count}  槽数: {len(code)}")
+    print(f"list  : {list_bytes} 字节, {list_bytes / count:.2f} 字节/指令")
+    print(f"array : {array_bytes} 字节, {array_bytes / count:.2f} 字节/指令")
+
+    for label, c in (("list", list_code), ("array", code)):
+        vm = CillyVM(code, consts, scopes, functions)
+        vm.code = c
+        t = time_run(vm)
+        print(f"{label:6s}: {t:.3f} 秒, {count / t / 1e6:.2f} M 指令/秒")
+
+
+if __name__ == "__main__":
+    main()
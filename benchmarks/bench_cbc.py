@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+.cbc 加载基准：对比从源码编译 (lexer + parser + compiler) 与加载字节码文件的耗时。
+
+用法: python benchmarks/bench_cbc.py [语句数]
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from cbc import write_cbc, load_vm
+from vm import CillyVM
+
+
+def make_program(n):
+    lines = ["var x = 0;"]
+    for i in range(n):
+        lines.append(f'if (x < {i}) {{ x = x + {i % 7}; }} else {{ print("s{i}", x); }}')
+    return "\n".join(lines) + "\n"
+
+
+def best_of(f, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        t = time.perf_counter() - start
+        best = t if best is None else min(best, t)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    src = make_program(n)
+
+    def from_source():
+        result = cilly_vm_compiler(cilly_parser(cilly_lexer(src)))
+        return CillyVM(*result)
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'prog.cbc')
+        size = write_cbc(path, *cilly_vm_compiler(cilly_parser(cilly_lexer(src))))
+
+        t_src = best_of(from_source, 3)
+        t_cbc = best_of(lambda: load_vm(path), 10)
+
+    print(f"源码: {len(src)} 字节, cbc: {size} 字节")
+    print(f"从源码编译: {t_src * 1000:.1f} ms")
+    print(f"加载 cbc  : {t_cbc * 1000:.1f} ms  ({t_src / t_cbc:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
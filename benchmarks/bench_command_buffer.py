@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+逐条信号 vs 批量命令缓冲区：蕨类程序的事件数与"画完"所需时间。
+
+没有 Qt 事件循环时，用一个队列模拟跨线程的 queued connection：
+每次 emit 把一个事件放进队列 (Qt 为每个事件分配 QMetaCallEvent 并加锁投递)，
+VM 结束后由"GUI 线程"依次处理队列中的事件，并在纯 Python 的画布模型上执行绘图。
+画完时间 = VM 运行时间 + 事件处理时间。
+
+用法: python benchmarks/bench_command_buffer.py [蕨类长度] [每批命令数]
+"""
+
+import sys
+import os
+import time
+from collections import deque
+from math import sin, cos, radians
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM
+from command_buffer import CommandBuffer
+
+TURTLE_NAMES = ["forward", "backward", "left", "right", "penup", "pendown",
+                "pencolor", "pensize", "reset", "speed"]
+
+FERN = '''
+define fern = fun(len) {
+    if(len > 5){
+        forward(len);
+        right(10);
+        fern(len - 10);
+        left(40);
+        fern(len - 10);
+        right(30);
+        backward(len);
+    }
+};
+pencolor("green");
+left(90);
+penup();
+backward(200);
+pendown();
+fern(%d);
+'''
+
+
+class Canvas:
+    # 与 TurtleCanvas 的绘图操作相同的状态变化，线段存入列表
+    def __init__(self):
+        self.x = self.y = self.heading = 0.0
+        self.down = True
+        self.lines = []
+
+    def forward(self, d):
+        rad = radians(self.heading)
+        x, y = self.x - d * sin(rad), self.y - d * cos(rad)
+        if self.down:
+            self.lines.append((self.x, self.y, x, y))
+        self.x, self.y = x, y
+
+    def backward(self, d):
+        self.forward(-d)
+
+    def left(self, a):
+        self.heading -= a
+
+    def right(self, a):
+        self.heading += a
+
+    def penup(self):
+        self.down = False
+
+    def pendown(self):
+        self.down = True
+
+    def pencolor(self, c):
+        pass
+
+    def apply_batch(self, batch):
+        for name, args in batch:
+            getattr(self, name)(*args)
+
+
+class QueuedSignal:
+    def __init__(self, queue, slot):
+        self.queue = queue
+        self.slot = slot
+
+    def emit(self, *args):
+        self.queue.append((self.slot, args))
+
+
+def compile_fern(length):
+    return cilly_vm_compiler(cilly_parser(cilly_lexer(FERN % length)), TURTLE_NAMES)
+
+
+def drain(queue):
+    while queue:
+        slot, args = queue.popleft()
+        slot(*args)
+
+
+def per_call(length):
+    canvas, queue = Canvas(), deque()
+    signals = {name: QueuedSignal(queue, getattr(canvas, name)) for name in TURTLE_NAMES if hasattr(canvas, name)}
+    vm = CillyVM(*compile_fern(length), signals=signals)
+    start = time.perf_counter()
+    vm.run(show_stats=False)
+    events = len(queue)
+    drain(queue)
+    return events, time.perf_counter() - start, len(canvas.lines)
+
+
+def batched(length, max_count):
+    canvas, queue = Canvas(), deque()
+    buffer = CommandBuffer(QueuedSignal(queue, canvas.apply_batch).emit, max_count=max_count)
+    vm = CillyVM(*compile_fern(length), primitives=buffer.primitives())
+    start = time.perf_counter()
+    vm.run(show_stats=False)
+    buffer.flush()
+    events = len(queue)
+    drain(queue)
+    return events, time.perf_counter() - start, len(canvas.lines)
+
+
+def main():
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 125
+    max_count = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+
+    print(f"{'mode':<12}{'events':>10}{'time(s)':>10}{'lines':>10}")
+    for name, (events, t, lines) in (("per-call", per_call(length)), ("batched", batched(length, max_count))):
+        print(f"{name:<12}{events:>10}{t:>10.3f}{lines:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+常驻执行服务与冷启动的延迟对比 (p50 / p99)：
+
+- daemon: 持久连接上逐个发送请求 (源码已缓存)
+- client: 每次启动一个 cilly_client.py 进程连接服务
+- cold:   每次启动一个 python 进程，导入前端、编译并运行
+
+用法: python benchmarks/bench_daemon.py [请求数]
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from daemon import serve_socket
+from cilly_client import CillyClient
+
+PROGRAM = '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+print(fib(10));
+'''
+
+COLD = '''
+import sys
+sys.path.insert(0, %r)
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM
+from primitives import PRIMITIVES
+src = open(sys.argv[1], encoding='utf-8').read()
+code = cilly_vm_compiler(cilly_parser(cilly_lexer(src)), [p["name"] for p in PRIMITIVES])
+CillyVM(*code).run()
+''' % ROOT
+
+def percentiles(samples):
+    s = sorted(samples)
+    return s[len(s) // 2] * 1000, s[min(len(s) - 1, int(len(s) * 0.99))] * 1000
+
+def timed(fn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    tmp = tempfile.mkdtemp()
+    sock = os.path.join(tmp, 'cilly.sock')
+    prog = os.path.join(tmp, 'prog.cilly')
+    with open(prog, 'w', encoding='utf-8') as f:
+        f.write(PROGRAM)
+
+    server = serve_socket(sock)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with CillyClient(sock) as client:
+            client.run(PROGRAM)  # 预热并缓存
+            daemon = timed(lambda: client.run(PROGRAM), n * 10)
+        client_cmd = [sys.executable, os.path.join(ROOT, 'cilly_client.py'), '--socket', sock, prog]
+        client = timed(lambda: subprocess.run(client_cmd, stdout=subprocess.DEVNULL, check=True), n)
+        cold_cmd = [sys.executable, '-c', COLD, prog]
+        cold = timed(lambda: subprocess.run(cold_cmd, stdout=subprocess.DEVNULL, check=True), n)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print(f'{"mode":8} {"n":>5} {"p50 ms":>9} {"p99 ms":>9}')
+    for name, samples in (('daemon', daemon), ('client', client), ('cold', cold)):
+        p50, p99 = percentiles(samples)
+        print(f'{name:8} {len(samples):5} {p50:9.2f} {p99:9.2f}')
+
+if __name__ == '__main__':
+    main()
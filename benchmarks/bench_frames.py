@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+函数调用与块作用域的分配/GC 统计：在 fern 与互递归程序上记录
+- 运行时间 (取 TIMING_RUNS 次中的最小值)
+- 各代 GC 回收次数 (gc.get_stats 的差值)
+- 分配的内存块净增 (sys.getallocatedblocks)
+- 稳态递归中 GC 可见对象数 (len(gc.get_objects())) 的采样范围
+
+用法: python benchmarks/bench_frames.py [fern 参数] [互递归 n] [重复次数]
+"""
+
+import sys
+import os
+import gc
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, RUNNING
+from output import StringSink
+from providers import load_provider
+
+FERN = '''
+define fern = fun(len) {
+    if(len > 5){
+        forward(len);
+        right(10);
+        fern(len - 10);
+        left(40);
+        fern(len - 10);
+        right(30);
+        backward(len);
+    }
+};
+pencolor("green");
+fern(%d);
+'''
+
+MUTUAL = '''
+define odd = fun(n){
+  if(n == 0)
+    return false;
+  else
+   return even(n-1);
+};
+define even = fun(n) {
+ if(n==0)
+   return true;
+ else
+   return odd(n-1);
+};
+var i = 0;
+while (i < %d) {
+    even(%d);
+    i = i + 1;
+}
+'''
+
+SAMPLE_SLICE = 20000
+TIMING_RUNS = 5
+
+def make_vm(src):
+    prims = load_provider('headless')
+    compiled = cilly_vm_compiler(cilly_parser(cilly_lexer(src)), list(prims))
+    return CillyVM(*compiled, primitives=prims, output=StringSink())
+
+def collections():
+    return [s["collections"] for s in gc.get_stats()]
+
+def measure(src):
+    vm = make_vm(src)
+    gc.collect()
+    before, blocks = collections(), sys.getallocatedblocks()
+    start = time.perf_counter()
+    vm.run(show_stats=False)
+    elapsed = time.perf_counter() - start
+    after = collections()
+    blocks = sys.getallocatedblocks() - blocks
+    for _ in range(TIMING_RUNS - 1):
+        vm = make_vm(src)
+        start = time.perf_counter()
+        vm.run(show_stats=False)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    # 分片运行，在片与片之间采样 GC 可见对象数 (不计入上面的计时)
+    vm = make_vm(src)
+    gc.collect()
+    samples = []
+    while vm.run_for(SAMPLE_SLICE) == RUNNING:
+        samples.append(len(gc.get_objects()))
+    return {
+        "time": elapsed,
+        "collections": [a - b for a, b in zip(after, before)],
+        "blocks": blocks,
+        "objects": (min(samples), max(samples)) if samples else (0, 0),
+    }
+
+def main():
+    fern = int(sys.argv[1]) if len(sys.argv) > 1 else 125
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    programs = [(f'fern({fern})', FERN % fern), (f'even({n}) x{repeat}', MUTUAL % (repeat, n))]
+    print(f'{"program":18} {"time s":>8} {"gen0":>6} {"gen1":>5} {"gen2":>5} {"blocks":>8} {"gc objects (min..max)":>24}')
+    for name, src in programs:
+        r = measure(src)
+        g0, g1, g2 = r["collections"]
+        lo, hi = r["objects"]
+        print(f'{name:18} {r["time"]:8.3f} {g0:6} {g1:5} {g2:5} {r["blocks"]:8} {lo:>11}..{hi:<11}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+JIT 基准：递归数值代码 (fib) 在解释器与 JIT 下的运行时间。
+
+用法: python benchmarks/bench_jit.py [n]
+"""
+
+import sys
+import os
+import time
+from io import StringIO
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM
+
+FIB = '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+print(fib(%d));
+'''
+
+
+def run(compiled, threshold=None):
+    vm = CillyVM(*compiled)
+    if threshold is not None:
+        vm.enable_jit(threshold)
+    out = StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(out):
+        vm.run(show_stats=False)
+    return time.perf_counter() - start, out.getvalue().strip()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 22
+    compiled = cilly_vm_compiler(cilly_parser(cilly_lexer(FIB % n)))
+
+    t_interp, r1 = run(compiled)
+    t_jit, r2 = run(compiled, threshold=50)
+    assert r1 == r2
+    print(f"fib({n}) = {r1}")
+    print(f"解释器: {t_interp:.3f} 秒")
+    print(f"JIT   : {t_jit:.3f} 秒  ({t_interp / t_jit:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+行号表的内存开销：对示例程序和一个重复拼接的大程序，比较
+- 字节码本身的大小 (array('i'))
+- 行程编码的行号表 (LineTable.data) 与解码后的查找数组
+每个字节码槽位存一个行号的朴素做法 (array('i')) 与字节码一样大，即 100%。
+以及 token / AST 节点携带位置信息后的大小变化 (sys.getsizeof)。
+
+用法: python benchmarks/bench_linetable.py [大程序重复次数]
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from examples import tests
+from primitives import PRIMITIVES
+
+NAMES = [prim["name"] for prim in PRIMITIVES]
+
+BLOCK = '''
+var x%(i)d = %(i)d;
+define f%(i)d = fun(n) {
+    if (n < 2) return n;
+    return f%(i)d(n - 1) + n;
+};
+print(f%(i)d(3));
+'''
+
+def sizes(src):
+    tokens = cilly_lexer(src)
+    ast = cilly_parser(tokens)
+    code = cilly_vm_compiler(ast, NAMES)[0]
+    table = code.linetable
+    starts, lines = table.decoded()
+    token_bytes = sum(sys.getsizeof(t) for t in tokens)
+    plain_bytes = sum(sys.getsizeof(list(t)) for t in tokens)
+    return {
+        "code": code.itemsize * len(code),
+        "table": len(table.data),
+        "decoded": starts.itemsize * len(starts) + lines.itemsize * len(lines),
+        "tokens": token_bytes,
+        "plain_tokens": plain_bytes,
+        "pc_to_line": lookup_time(table, len(code)),
+    }
+
+def lookup_time(table, n, count=100000):
+    table.pc_to_line(0)
+    start = time.perf_counter()
+    for i in range(count):
+        table.pc_to_line(i % n)
+    return (time.perf_counter() - start) / count
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    programs = list(tests.items())
+    programs.append((f'generated x{repeat}', ''.join(BLOCK % {"i": i} for i in range(repeat))))
+    print(f'{"program":24} {"code B":>8} {"table B":>8} {"%code":>6} {"decoded B":>10} '
+          f'{"tokens B":>9} {"+token B":>9} {"lookup ns":>10}')
+    for name, src in programs:
+        s = sizes(src)
+        print(f'{name:24} {s["code"]:8} {s["table"]:8} {s["table"] / s["code"] * 100:5.1f}% {s["decoded"]:10} '
+              f'{s["tokens"]:9} {s["tokens"] - s["plain_tokens"]:9} {s["pc_to_line"] * 1e9:10.0f}')
+
+if __name__ == '__main__':
+    main()
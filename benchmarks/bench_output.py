@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+print 吞吐量基准：程序打印 N 行 (默认 100 万行)，比较逐项 print() 与缓冲输出端。
+
+两种方式的输出都写到 os.devnull，只比较虚拟机内输出路径的开销。
+
+用法: python benchmarks/bench_output.py [行数]
+"""
+
+import sys
+import os
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, val
+from output import BufferedSink
+
+PROGRAM = '''
+var i = 0;
+while (i < %d) {
+    print("line", i);
+    i = i + 1;
+}
+'''
+
+
+class PrintVM(CillyVM):
+    # 改造前的输出路径：每项一次 print()，经由 sys.stdout
+    def print_item(self, pc):
+        print(val(self.pop()), end=' ')
+        return pc + 1
+
+    def print_newline(self, pc):
+        print('')
+        return pc + 1
+
+
+def timed(vm):
+    start = time.perf_counter()
+    vm.run(show_stats=False)
+    return time.perf_counter() - start
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    compiled = cilly_vm_compiler(cilly_parser(cilly_lexer(PROGRAM % lines)))
+
+    with open(os.devnull, 'w') as devnull:
+        with redirect_stdout(devnull):
+            t_print = timed(PrintVM(*compiled))
+        t_sink = timed(CillyVM(*compiled, output=BufferedSink(devnull.write)))
+
+        # 只统计输出路径：循环本身 (不打印) 的时间
+        t_loop = timed(CillyVM(*cilly_vm_compiler(cilly_parser(cilly_lexer(
+            PROGRAM.replace('print("line", i);', '') % lines)))))
+
+    print(f"{lines} 行")
+    print(f"{'mode':<10}{'total(s)':>10}{'output(s)':>11}{'lines/s':>12}")
+    for name, t in (("print()", t_print), ("sink", t_sink)):
+        print(f"{name:<10}{t:>10.2f}{t - t_loop:>11.2f}{lines / t:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
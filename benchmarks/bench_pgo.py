@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+剖析引导优化基准：同一组训练负载记录剖析，同一组评测负载分别用普通编译和
+按剖析编译运行，比较执行的指令数与运行时间。
+
+训练负载是语料程序的小规模版本 (结构相同，循环次数或递归深度更小)；
+many_definitions 与 generated 的结构随规模变化，训练与评测用同一个程序。
+两种编译的运行交替进行，每种取最好的一次。
+
+用法: python benchmarks/bench_pgo.py [重复次数]
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM
+from output import StringSink
+from providers import headless_primitives
+from pgo import record_profile
+from benchmarks import corpus
+
+# 名字 -> (训练程序, 评测程序)
+WORKLOADS = {
+    "tight_loop": (corpus.tight_loop(1000), corpus.tight_loop()),
+    "fib": (corpus.fib(12), corpus.fib()),
+    "mutual_recursion": (corpus.mutual_recursion(50, 5), corpus.mutual_recursion()),
+    "heavy_print": (corpus.heavy_print(500), corpus.heavy_print()),
+    "deep_nesting": (corpus.deep_nesting(n=50), corpus.deep_nesting()),
+    "many_definitions": (corpus.many_definitions(), corpus.many_definitions()),
+    "turtle_fern": (corpus.turtle_fern(75), corpus.turtle_fern()),
+    "generated": (corpus.generated(), corpus.generated()),
+}
+
+
+def run(compiled, primitives, count=False):
+    # -> (秒, 输出, 执行的指令数；count 为 False 时为 None)
+    vm = CillyVM(*compiled, primitives, output=StringSink())
+    executed = None
+    if count:
+        executed = [0]
+        for opcode, handler in list(vm.ops.items()):
+            def op(pc, handler=handler):
+                executed[0] += 1
+                return handler(pc)
+            vm.ops[opcode] = op
+    start = time.perf_counter()
+    vm.run(show_stats=False)
+    elapsed = time.perf_counter() - start
+    return elapsed, vm.output.getvalue(), executed and executed[0]
+
+
+def bench(name, train, evaluate, repeat):
+    primitives = headless_primitives()
+    profile = record_profile(train, primitives)
+    ast = cilly_parser(cilly_lexer(evaluate))
+    base = cilly_vm_compiler(ast, list(primitives))
+    pgo = cilly_vm_compiler(ast, list(primitives), profile)
+
+    _, base_out, base_count = run(base, primitives, count=True)
+    _, pgo_out, pgo_count = run(pgo, primitives, count=True)
+    assert base_out == pgo_out, name
+
+    base_time = pgo_time = float('inf')
+    for _ in range(repeat):
+        base_time = min(base_time, run(base, primitives)[0])
+        pgo_time = min(pgo_time, run(pgo, primitives)[0])
+    return base_count, pgo_count, base_time, pgo_time
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f'{"程序":18} {"指令数 (普通)":>14} {"指令数 (PGO)":>13} {"普通 ms":>9} {"PGO ms":>9} {"加速":>6}')
+    for name, (train, evaluate) in WORKLOADS.items():
+        base_count, pgo_count, base_time, pgo_time = bench(name, train, evaluate, repeat)
+        print(f'{name:18} {base_count:14} {pgo_count:13} {base_time * 1000:9.1f} {pgo_time * 1000:9.1f} '
+              f'{base_time / pgo_time:5.2f}x')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+primitive 调用开销基准：蕨类绘图程序的总运行时间，以及单次 primitive 调用的开销
+(循环中调用 forward 与空循环的时间差)。每项取多次运行中的最小值。
+
+用法: python benchmarks/bench_primitives.py [蕨类长度] [循环次数] [重复次数]
+"""
+
+import sys
+import os
+import time
+from io import StringIO
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, CALL_PRIMITIVE, iter_instructions
+
+TURTLE_NAMES = ["forward", "backward", "left", "right", "penup", "pendown",
+                "pencolor", "pensize", "reset", "speed"]
+
+FERN = '''
+define fern = fun(len) {
+    if(len > 5){
+        forward(len);
+        right(10);
+        fern(len - 10);
+        left(40);
+        fern(len - 10);
+        right(30);
+        backward(len);
+    }
+};
+pencolor("green");
+left(90);
+penup();
+backward(200);
+pendown();
+fern(%d);
+'''
+
+LOOP = '''
+var i = 0;
+while (i < %d) {
+    %s
+    i = i + 1;
+}
+'''
+
+
+class CountingSignal:
+    def __init__(self):
+        self.count = 0
+
+    def emit(self, *args):
+        self.count += 1
+
+
+def run_once(src):
+    signals = {name: CountingSignal() for name in TURTLE_NAMES}
+    vm = CillyVM(*cilly_vm_compiler(cilly_parser(cilly_lexer(src)), TURTLE_NAMES), signals=signals)
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        vm.run(show_stats=False)
+    return time.perf_counter() - start, sum(s.count for s in signals.values())
+
+
+def run(src, repeat):
+    return min(run_once(src) for _ in range(repeat))
+
+
+def time_proc(n, repeat):
+    # 只计 call_primitive_proc 本身：减去同样的 push/pop 循环
+    signals = {name: CountingSignal() for name in TURTLE_NAMES}
+    vm = CillyVM(*cilly_vm_compiler(cilly_parser(cilly_lexer("forward(1);")), TURTLE_NAMES), signals=signals)
+    pc = next(p for p, opcode, _ in iter_instructions(vm.code) if opcode == CALL_PRIMITIVE)
+    arg = ['num', 1]
+
+    def loop(call):
+        start = time.perf_counter()
+        for _ in range(n):
+            vm.push(arg)
+            if call:
+                vm.call_primitive_proc(pc)
+            vm.pop()
+        return time.perf_counter() - start
+
+    t_call = min(loop(True) for _ in range(repeat))
+    t_base = min(loop(False) for _ in range(repeat))
+    return (t_call - t_base) / n
+
+
+def main():
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 125
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    t, calls = run(FERN % length, repeat)
+    print(f"fern({length}): {calls} 次 primitive 调用, {t:.3f} 秒")
+
+    t_call, _ = run(LOOP % (n, "forward(1);"), repeat)
+    t_empty, _ = run(LOOP % (n, ""), repeat)
+    print(f"单次 primitive 调用开销 (解释执行): {(t_call - t_empty) / n * 1e6:.2f} 微秒")
+    print(f"call_primitive_proc 单次耗时: {time_proc(n, repeat) * 1e6:.2f} 微秒")
+
+
+if __name__ == "__main__":
+    main()
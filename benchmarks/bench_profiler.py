@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+剖析器开销：同一程序在未开启剖析、开启后又关闭、开启剖析三种情况下的运行时间。
+关闭时分派表恢复原状，前两行应在噪声范围内一致。
+
+用法: python benchmarks/bench_profiler.py [fib 参数]
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM
+from output import StringSink
+
+PROGRAM = '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+print(fib(%d));
+'''
+
+RUNS = 5
+
+def timed(src, mode):
+    best = None
+    for _ in range(RUNS):
+        vm = CillyVM(*cilly_vm_compiler(cilly_parser(cilly_lexer(src))), output=StringSink())
+        if mode != 'off':
+            prof = vm.enable_profiling()
+            if mode == 'disabled':
+                prof.disable()
+        start = time.perf_counter()
+        vm.run(show_stats=False)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    src = PROGRAM % n
+    base = timed(src, 'off')
+    print(f'{"mode":10} {"time s":>8} {"ratio":>6}')
+    for mode in ('off', 'disabled', 'on'):
+        t = base if mode == 'off' else timed(src, mode)
+        print(f'{mode:10} {t:8.3f} {t / base:6.2f}')
+
+if __name__ == '__main__':
+    main()
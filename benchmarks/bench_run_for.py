@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+run_for 指令预算的开销：同一程序用 run() 一次跑完，与用 run_for(n) 按不同
+片大小分片跑完的时间对比。
+
+用法: python benchmarks/bench_run_for.py [fib 参数]
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, RUNNING
+from output import StringSink
+
+PROGRAM = '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+print(fib(%d));
+'''
+
+SLICES = [1, 10, 100, 1000, 10000, 100000]
+
+
+def make_vm(compiled):
+    return CillyVM(*compiled, output=StringSink())
+
+
+def time_run(compiled):
+    vm = make_vm(compiled)
+    start = time.perf_counter()
+    vm.run(show_stats=False)
+    return time.perf_counter() - start
+
+
+def time_slices(compiled, n):
+    vm = make_vm(compiled)
+    calls = 0
+    start = time.perf_counter()
+    while vm.run_for(n) == RUNNING:
+        calls += 1
+    return time.perf_counter() - start, calls + 1
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    compiled = cilly_vm_compiler(cilly_parser(cilly_lexer(PROGRAM % n)))
+
+    base = min(time_run(compiled) for _ in range(3))
+    print(f"fib({n})")
+    print(f"{'mode':<16}{'time(s)':>10}{'calls':>10}{'vs run()':>10}")
+    print(f"{'run()':<16}{base:>10.3f}{'-':>10}{'':>10}")
+    for size in SLICES:
+        t, calls = min(time_slices(compiled, size) for _ in range(3))
+        print(f"{f'run_for({size})':<16}{t:>10.3f}{calls:>10}{(t / base - 1) * 100:>9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+采样剖析器的开销：同一程序用 run() 跑完，与在 CillySampler 下以不同
+采样频率、不同片大小跑完的时间对比 (各模式交替运行 RUNS 轮，取最小值)。
+
+用法: python benchmarks/bench_sampler.py [fib 参数]
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM
+from output import StringSink
+from sampler import CillySampler
+
+PROGRAM = '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+print(fib(%d));
+'''
+
+RUNS = 7
+CONFIGS = [(1000, 200), (1000, 1000), (100, 1000), (10000, 200)]  # (采样频率 Hz, 片大小)
+
+def make_vm(compiled):
+    code, consts, scopes, functions = compiled
+    return CillyVM(code, consts, [list(s) for s in scopes], functions, output=StringSink())
+
+def run_plain(vm):
+    vm.run(show_stats=False)
+    return 0
+
+def sampled(hz, slice_size):
+    def run(vm):
+        sampler = CillySampler(vm, interval=1 / hz, slice_size=slice_size)
+        sampler.run()
+        return sampler.sample_count
+    return run
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 22
+    compiled = cilly_vm_compiler(cilly_parser(cilly_lexer(PROGRAM % n)))
+    modes = [("run()", run_plain)] + [(f"{hz} Hz, slice {size}", sampled(hz, size)) for hz, size in CONFIGS]
+    run_plain(make_vm(compiled))  # 预热
+    # 各模式交替运行，减小机器负载波动的影响；取最小值
+    times = {name: [] for name, _ in modes}
+    samples = {}
+    for _ in range(RUNS):
+        for name, run in modes:
+            vm = make_vm(compiled)
+            start = time.perf_counter()
+            samples[name] = run(vm)
+            times[name].append(time.perf_counter() - start)
+    base = min(times["run()"])
+    print(f'{"mode":22} {"time s":>8} {"overhead":>9} {"samples":>8}')
+    for name, _ in modes:
+        t = min(times[name])
+        print(f'{name:22} {t:8.3f} {(t / base - 1) * 100:8.1f}% {samples[name]:8}')
+
+    # 单次采样的代价 (调用栈深度约为 n)，与负载波动无关的开销估计
+    vm = make_vm(compiled)
+    sampler = CillySampler(vm)
+    while len(vm.call_stack.stack) < n - 2:
+        vm.run_for(1)
+    count = 10000
+    start = time.perf_counter()
+    for _ in range(count):
+        sampler.sample()
+    per_sample = (time.perf_counter() - start) / count
+    print(f'one sample at depth {len(vm.call_stack.stack)}: {per_sample * 1e6:.1f} us '
+          f'-> {per_sample * 1000 * 100:.2f}% of each second at 1 kHz')
+
+if __name__ == '__main__':
+    main()
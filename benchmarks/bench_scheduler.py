@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+CillyScheduler 负载基准：N 个 (默认 1000) 程序同时提交，每个程序做一段计算
+并调用两次异步 I/O primitive (本地替身：asyncio.sleep 模拟 1-5 毫秒的延迟)。
+报告吞吐量 (scripts/s) 与延迟分位数；对照为逐个 await 的顺序执行。
+
+全部程序同时运行时按片轮转，每个程序都要等大家一起跑完，延迟接近总时间；
+bounded 模式用 max_concurrency 限制同时运行的 VM 个数，排队的程序延迟计入等待时间。
+
+用法: python benchmarks/bench_scheduler.py [程序数] [片大小] [bounded 并发数]
+"""
+
+import sys
+import os
+import time
+import random
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import CillyScheduler, FINISHED
+from primitives import register_primitive, RETURNS_VALUE
+
+PROGRAM = '''
+var key = %d;
+var v = io_read(key);
+var i = 0;
+var s = 0;
+while (i < 200) {
+    s = s + i * v;
+    i = i + 1;
+}
+io_write(key, s);
+print(key, s);
+'''
+
+register_primitive("io_read", 1, RETURNS_VALUE)
+register_primitive("io_write", 2)
+
+
+async def io_read(key):
+    await asyncio.sleep(random.uniform(0.001, 0.005))
+    return key % 7
+
+
+async def io_write(key, value):
+    await asyncio.sleep(random.uniform(0.001, 0.005))
+
+
+PRIMITIVES = {"io_read": io_read, "io_write": io_write}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def report(name, results, elapsed):
+    assert all(r["status"] == FINISHED for r in results), [r for r in results if r["status"] != FINISHED][:1]
+    lat = [r["latency"] * 1000 for r in results]
+    print(f"{name:<14}{len(results) / elapsed:>12.0f}{percentile(lat, 0.5):>10.1f}"
+          f"{percentile(lat, 0.99):>10.1f}{max(lat):>10.1f}")
+
+
+async def concurrent(sources, slice_size, max_concurrency=None):
+    sched = CillyScheduler(PRIMITIVES, slice_size, max_concurrency)
+    start = time.perf_counter()
+    results = await sched.run_all(sources)
+    return results, time.perf_counter() - start
+
+
+async def sequential(sources, slice_size):
+    sched = CillyScheduler(PRIMITIVES, slice_size)
+    start = time.perf_counter()
+    results = [await sched.run_program(src) for src in sources]
+    return results, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    slice_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    bound = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+    random.seed(0)
+    sources = [PROGRAM % k for k in range(n)]
+
+    print(f"{n} 个程序, slice={slice_size}")
+    print(f"{'mode':<14}{'scripts/s':>12}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    report("sequential", *asyncio.run(sequential(sources, slice_size)))
+    report("concurrent", *asyncio.run(concurrent(sources, slice_size)))
+    report(f"bounded({bound})", *asyncio.run(concurrent(sources, slice_size, bound)))
+
+
+if __name__ == "__main__":
+    main()
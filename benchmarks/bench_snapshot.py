@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+快照恢复 vs 重新执行前导代码：程序先用一段循环建立全局状态 (前导)，
+之后才做实际工作。比较"新 VM 从头执行前导"与"新 VM 恢复快照"两种
+到达同一状态的耗时，以及快照大小。
+
+用法: python benchmarks/bench_snapshot.py [前导循环次数]
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, LOAD_CONST, iter_instructions
+from output import StringSink
+
+PROGRAM = '''
+var a = 0;
+var b = 1;
+var acc = 0;
+var name = "table";
+define mix = fun(x, y) { return (x * 31 + y) %% 1000003; };
+var i = 0;
+while (i < %d) {
+    a = mix(a, i);
+    b = mix(b, a);
+    acc = acc + a %% 7;
+    i = i + 1;
+}
+print("ready");
+print(name, a, b, acc);
+'''
+
+
+def compile_program(n):
+    return cilly_vm_compiler(cilly_parser(cilly_lexer(PROGRAM % n)))
+
+
+def make_vm(n):
+    return CillyVM(*compile_program(n), output=StringSink())
+
+
+def ready_pc(vm):
+    # 前导结束处：加载 "ready" 常量的指令
+    k = vm.consts.index(['str', 'ready'])
+    return next(pc for pc, opcode, ops in iter_instructions(vm.code) if opcode == LOAD_CONST and ops[0] == k)
+
+
+def run_prelude(vm, marker):
+    # 单步执行，正好停在标记处 (只用于生成快照，不计时)
+    while vm.pc != marker:
+        vm.run_for(1)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    vm = make_vm(n)
+    run_prelude(vm, ready_pc(vm))
+    blob = vm.snapshot()
+    vm.run(show_stats=False)
+    expected = vm.output.getvalue()
+
+    # 重新执行：整个程序 (前导之后只有两条 print)
+    again = make_vm(n)
+    start = time.perf_counter()
+    again.run(show_stats=False)
+    t_prelude = time.perf_counter() - start
+    assert again.output.getvalue() == expected
+
+    fresh = make_vm(n)
+    start = time.perf_counter()
+    fresh.restore(blob)
+    t_restore = time.perf_counter() - start
+    fresh.run(show_stats=False)
+    assert fresh.output.getvalue() == expected
+
+    print(f"前导循环 {n} 次")
+    print(f"重新执行前导: {t_prelude * 1000:10.2f} ms")
+    print(f"恢复快照:     {t_restore * 1000:10.2f} ms  ({len(blob)} 字节)")
+    print(f"加速:         {t_prelude / t_restore:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
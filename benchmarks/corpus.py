@@ -0,0 +1,124 @@
+'''
+基准程序语料
+
+每个条目是 名字 -> 源码；程序规模由生成函数的参数决定，默认规模下
+每个程序在 CillyVM 上运行几十到几百毫秒。turtle primitive 在运行时用
+无操作的 headless 提供者代替。generated 由 generator.py 按种子合成。
+'''
+
+from benchmarks.generator import generate
+
+def tight_loop(n=50000):
+    return f'''
+var i = 0;
+var s = 0;
+while (i < {n}) {{
+    s = s + i % 7;
+    i = i + 1;
+}}
+print(s);
+'''
+
+def fib(n=20):
+    return f'''
+define fib = fun(n) {{
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+}};
+print(fib({n}));
+'''
+
+def mutual_recursion(n=300, repeat=100):
+    return f'''
+define odd = fun(n) {{
+  if (n == 0) return false;
+  return even(n - 1);
+}};
+define even = fun(n) {{
+  if (n == 0) return true;
+  return odd(n - 1);
+}};
+var i = 0;
+while (i < {repeat}) {{
+    even({n});
+    i = i + 1;
+}}
+print(even({n}));
+'''
+
+def heavy_print(n=20000):
+    return f'''
+var i = 0;
+while (i < {n}) {{
+    print("line", i, i * 2, "done");
+    i = i + 1;
+}}
+'''
+
+def deep_nesting(depth=60, n=2000):
+    # 深层嵌套的块与条件 + 深层括号表达式，考验语法分析与作用域进出
+    opens = ''.join(f'{{ var v{d} = {d}; if (v{d} >= 0) ' for d in range(depth))
+    closes = '{ s = s + 1; }' + ' }' * depth
+    expr = '(' * depth + '1' + ' + 1)' * depth
+    return f'''
+var s = 0;
+var i = 0;
+while (i < {n}) {{
+    {opens}{closes}
+    i = i + 1;
+}}
+print(s, {expr});
+'''
+
+def many_definitions(count=400):
+    parts = []
+    for i in range(count):
+        parts.append(f'''
+define f{i} = fun(a, b) {{
+    var t = a * {i % 13 + 1} + b;
+    if (t > {i}) return t - {i};
+    return t;
+}};
+var g{i} = f{i}({i}, {i + 1});
+''')
+    parts.append(f'print(g{count - 1});\n')
+    return ''.join(parts)
+
+def turtle_fern(size=135):
+    return f'''
+define fern = fun(len) {{
+    if (len > 5) {{
+        forward(len);
+        right(10);
+        fern(len - 10);
+        left(40);
+        fern(len - 10);
+        right(30);
+        backward(len);
+    }}
+}};
+pencolor("green");
+left(90);
+penup();
+backward(200);
+pendown();
+fern({size});
+'''
+
+def generated(seed=0, **knobs):
+    # 合成程序，knobs 见 generator.GEN_DEFAULTS
+    return generate(seed, **knobs)
+
+CORPUS = {
+    "tight_loop": tight_loop(),
+    "fib": fib(),
+    "mutual_recursion": mutual_recursion(),
+    "heavy_print": heavy_print(),
+    "deep_nesting": deep_nesting(),
+    "many_definitions": many_definitions(),
+    "turtle_fern": turtle_fern(),
+    "generated": generated(),
+}
+
+__all__ = ['CORPUS', 'tight_loop', 'fib', 'mutual_recursion', 'heavy_print',
+           'deep_nesting', 'many_definitions', 'turtle_fern', 'generated']
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+合成 Cilly 程序生成器
+
+按种子生成语法合法、一定能运行结束的 Cilly 程序 (文法见
+cilly_parser_module.py)，用于 lexer / parser / compiler / VM 的规模曲线和压力测试。
+同一组参数和种子总是生成同样的程序。
+
+规模参数：
+    statements           顶层语句数 (指定 size 时改为按字节数生成)
+    functions            函数个数
+    function_statements  每个函数体的语句数
+    block_depth          语句块 (if / while / {}) 的最大嵌套深度
+    expr_depth           表达式括号的最大嵌套深度
+    loop_trips           每个 while 循环的次数
+    loop_depth           while 循环的最大嵌套层数 (总次数为 loop_trips ** loop_depth)
+    string_size          print 中字符串字面量的长度
+    identifiers          全局变量个数
+
+保证程序能结束：
+- 循环都是 `var t = 0; while (t < N) { t = t + 1; ... }`，循环变量不会被再次赋值
+- 函数只调用编号更小的函数，且最多一次、不在循环里，调用链不会爆炸
+- 赋值语句的结果对 MODULUS 取模，乘法也取模，数值不会无限增长；除数都是非零常量
+- 函数体只使用自己的参数和局部变量 (函数内看不到全局变量)
+
+输出通过 write 回调逐条语句写出，生成 GB 级文件也不需要把整个程序放在内存里。
+
+用法:
+    python -m benchmarks.generator [-o out.cilly] [--seed 0] [--size 100M] [--statements 1000] ...
+"""
+
+import sys
+import os
+import random
+import string
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GEN_DEFAULTS = {
+    "statements": 200,
+    "functions": 10,
+    "function_statements": 4,
+    "block_depth": 3,
+    "expr_depth": 3,
+    "loop_trips": 10,
+    "loop_depth": 1,
+    "string_size": 16,
+    "identifiers": 20,
+}
+
+MODULUS = 1000
+CALL_CHANCE = 0.3  # 函数体调用更小编号函数的概率
+INDENT = '    '
+STRING_CHARS = string.ascii_letters + string.digits + ' '
+
+class ProgramGenerator:
+    def __init__(self, seed=0, **knobs):
+        unknown = set(knobs) - set(GEN_DEFAULTS)
+        if unknown:
+            raise ValueError(f'未知的生成参数: {", ".join(sorted(unknown))}')
+        self.knobs = dict(GEN_DEFAULTS, **knobs)
+        for name, value in self.knobs.items():
+            if value < 0:
+                raise ValueError(f'生成参数 {name} 不能为负数: {value}')
+        self.rng = random.Random(seed)
+        self.counter = 0
+        self.arity = []  # 已生成函数的参数个数，函数名为 f<编号>
+        self.scopes = []  # [[(变量名, 可赋值)]]
+        self.callable = 0  # 可调用的函数为 f0 .. f<callable - 1>
+        self.call_budget = None  # None 为不限；函数体中最多调用一次
+        self.loops = 0  # 当前所在的循环层数
+        self.in_function = False
+
+    # --- 名字与作用域 ---
+
+    def fresh(self, prefix):
+        self.counter += 1
+        return f'{prefix}{self.counter}'
+
+    def declare(self, name, assignable=True):
+        self.scopes[-1].append((name, assignable))
+
+    def visible(self, assignable=False):
+        return [name for scope in self.scopes for name, ok in scope if ok or not assignable]
+
+    # --- 表达式 ---
+
+    def number(self):
+        return str(self.rng.randint(0, 99))
+
+    def leaf(self):
+        names = self.visible()
+        if names and self.rng.random() < 0.7:
+            return self.rng.choice(names)
+        return self.number()
+
+    def call(self):
+        # 没有可调用的函数或预算用完时返回 None
+        if self.callable == 0 or self.call_budget == 0:
+            return None
+        if self.call_budget is not None:
+            self.call_budget -= 1
+        func = self.rng.randrange(self.callable)
+        args = ', '.join(self.leaf() for _ in range(self.arity[func]))
+        return f'f{func}({args})'
+
+    def expr(self, depth=None):
+        # 数值表达式，括号嵌套深度恰为 depth
+        depth = self.knobs["expr_depth"] if depth is None else depth
+        rng = self.rng
+        if depth == 0:
+            if rng.random() < 0.1:
+                call = self.call()
+                if call is not None:
+                    return call
+            return self.leaf()
+        left = self.expr(depth - 1)
+        right = self.expr(rng.randrange(depth))
+        op = rng.choice('+-*/%-')
+        if op == '*':
+            return f'({left} * {right} % {MODULUS})'
+        if op in '/%':
+            return f'({left} {op} {rng.randint(1, 9)})'
+        if op == '-' and rng.random() < 0.2:
+            return f'(-{left} + {right})'
+        return f'({left} {op} {right})'
+
+    def cond(self):
+        rng = self.rng
+        depth = min(self.knobs["expr_depth"], 1)
+        e = f'{self.expr(depth)} {rng.choice(["<", "<=", ">", ">=", "==", "!="])} {self.number()}'
+        r = rng.random()
+        if r < 0.15:
+            return f'!({e})'
+        if r < 0.3:
+            return f'{e} {rng.choice(["&&", "||"])} {self.leaf()} < {self.number()}'
+        return e
+
+    def text(self):
+        return '"' + ''.join(self.rng.choice(STRING_CHARS) for _ in range(self.knobs["string_size"])) + '"'
+
+    # --- 语句 ---
+
+    def statement(self, depth, pad):
+        rng = self.rng
+        kinds = ['var', 'assign', 'assign', 'print']
+        if self.callable and self.call_budget != 0:
+            kinds.append('call')
+        if depth < self.knobs["block_depth"]:
+            kinds += ['if', 'block']
+            if self.loops < self.knobs["loop_depth"] and self.knobs["loop_trips"] > 0:
+                kinds.append('while')
+            if self.loops:
+                kinds.append('exit')
+        kind = rng.choice(kinds)
+        if kind in ('var', 'while') and len(self.scopes) == 1 and not self.in_function:
+            return self.top_block(kind, depth, pad)
+        return getattr(self, f'stat_{kind}')(depth, pad)
+
+    def top_block(self, kind, depth, pad):
+        # 顶层的新变量放进块里，全局变量始终只有 identifiers 个，
+        # 否则变量表随程序长度增长，生成 (和编译) 都会变成平方复杂度
+        self.scopes.append([])
+        body = getattr(self, f'stat_{kind}')(depth + 1, pad + INDENT)
+        body += ''.join(self.statement(depth + 1, pad + INDENT) for _ in range(self.rng.randint(0, 2)))
+        self.scopes.pop()
+        return f'{pad}{{\n{body}{pad}}}\n'
+
+    def stat_var(self, depth, pad):
+        name = self.fresh('t')
+        line = f'{pad}var {name} = {self.expr()};\n'
+        self.declare(name)
+        return line
+
+    def stat_assign(self, depth, pad):
+        names = self.visible(assignable=True)
+        if not names:
+            return self.stat_var(depth, pad)
+        return f'{pad}{self.rng.choice(names)} = {self.expr()} % {MODULUS};\n'
+
+    def stat_print(self, depth, pad):
+        rng = self.rng
+        args = []
+        for _ in range(rng.randint(1, 4)):
+            r = rng.random()
+            if r < 0.3:
+                args.append(self.text())
+            elif r < 0.4:
+                args.append(rng.choice(['true', 'false', 'null']))
+            else:
+                args.append(self.expr())
+        return f'{pad}print({", ".join(args)});\n'
+
+    def stat_call(self, depth, pad):
+        call = self.call()
+        if call is None:
+            return self.stat_print(depth, pad)
+        return f'{pad}{call};\n'
+
+    def block(self, depth, pad, count=None):
+        # { 语句... }，返回不含外层缩进的文本
+        count = count if count is not None else self.rng.randint(1, 3)
+        self.scopes.append([])
+        body = ''.join(self.statement(depth + 1, pad + INDENT) for _ in range(count))
+        self.scopes.pop()
+        return '{\n' + body + pad + '}'
+
+    def stat_block(self, depth, pad):
+        return pad + self.block(depth, pad) + '\n'
+
+    def stat_if(self, depth, pad):
+        line = f'{pad}if ({self.cond()}) {self.block(depth, pad)}'
+        if self.rng.random() < 0.5:
+            line += f' else {self.block(depth, pad)}'
+        return line + '\n'
+
+    def stat_while(self, depth, pad):
+        counter = self.fresh('i')
+        line = f'{pad}var {counter} = 0;\n'
+        self.declare(counter, assignable=False)
+        # 函数体中的调用不放进循环，避免调用次数按循环次数放大
+        budget = self.call_budget
+        if self.in_function:
+            self.call_budget = 0
+        self.loops += 1
+        self.scopes.append([])
+        body = [f'{pad}{INDENT}{counter} = {counter} + 1;\n']
+        body += [self.statement(depth + 1, pad + INDENT) for _ in range(self.rng.randint(1, 3))]
+        self.scopes.pop()
+        self.loops -= 1
+        if self.in_function:
+            self.call_budget = budget
+        return line + f'{pad}while ({counter} < {self.knobs["loop_trips"]}) {{\n' + ''.join(body) + pad + '}\n'
+
+    def stat_exit(self, depth, pad):
+        # 循环变量已在循环体开头递增，continue 不会造成死循环
+        return f'{pad}if ({self.cond()}) {self.rng.choice(["break", "continue"])};\n'
+
+    # --- 程序 ---
+
+    def globals(self):
+        self.scopes = [[]]
+        for i in range(self.knobs["identifiers"]):
+            name = f'g{i}'
+            yield f'var {name} = {self.number()};\n'
+            self.declare(name)
+
+    def function(self, index):
+        rng = self.rng
+        params = [self.fresh('p') for _ in range(rng.randint(0, 3))]
+        outer = self.scopes
+        self.scopes = [[(p, True) for p in params]]
+        self.in_function = True
+        self.callable = index
+        self.call_budget = 1 if rng.random() < CALL_CHANCE else 0
+        body = [self.statement(1, INDENT) for _ in range(self.knobs["function_statements"])]
+        body.append(f'{INDENT}return {self.expr()};\n')
+        self.scopes = outer
+        self.in_function = False
+        self.call_budget = None
+        self.arity.append(len(params))
+        self.callable = len(self.arity)
+        return f'define f{index} = fun({", ".join(params)}) {{\n' + ''.join(body) + '};\n'
+
+    def chunks(self, statements=None):
+        # 逐条产生程序文本；statements 为 None 时顶层语句无限生成
+        yield from self.globals()
+        for i in range(self.knobs["functions"]):
+            yield self.function(i)
+        count = self.knobs["statements"] if statements is None else statements
+        i = 0
+        while count < 0 or i < count:
+            yield self.statement(0, '')
+            i += 1
+
+def generate(seed=0, **knobs):
+    return ''.join(ProgramGenerator(seed, **knobs).chunks())
+
+def write_program(write, seed=0, size=None, **knobs):
+    # 把程序写给 write；指定 size 时写到至少 size 个字符为止。返回写出的字符数
+    gen = ProgramGenerator(seed, **knobs)
+    written = 0
+    for chunk in gen.chunks(-1 if size is not None else None):
+        write(chunk)
+        written += len(chunk)
+        if size is not None and written >= size:
+            break
+    return written
+
+__all__ = ['ProgramGenerator', 'GEN_DEFAULTS', 'MODULUS', 'generate', 'write_program']
+
+def main(argv=None):
+    import argparse
+    from memory import parse_bytes
+    parser = argparse.ArgumentParser(description='生成合成 Cilly 程序')
+    parser.add_argument('-o', '--output', help='输出文件，默认标准输出')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--size', type=parse_bytes, help='按大小生成 (例如 64K、10M、1G)，忽略 --statements')
+    for name, default in GEN_DEFAULTS.items():
+        parser.add_argument(f'--{name.replace("_", "-")}', dest=name, type=int, default=default)
+    args = parser.parse_args(argv)
+    knobs = {name: getattr(args, name) for name in GEN_DEFAULTS}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            written = write_program(f.write, args.seed, args.size, **knobs)
+        print(f'{args.output}: {written} 字节', file=sys.stderr)
+    else:
+        write_program(sys.stdout.write, args.seed, args.size, **knobs)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
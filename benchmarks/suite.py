@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+分阶段基准测试与回退检查
+
+对 corpus.py 中的每个程序分别计时 cilly_lexer、cilly_parser、
+cilly_vm_compiler、cilly_vm_dis 和 CillyVM.run：每个阶段先预热 warmup 次，
+再重复 repeat 次，记录最小值、中位数和平均值 (秒)。结果写成 JSON：
+
+    {"meta": {...}, "results": {程序: {阶段: {"min", "median", "mean", "runs"}}}}
+
+compare 比较两个结果文件的中位数，新结果慢于旧结果超过阈值时标为回退，
+有回退时退出码为 1。新旧都短于 MIN_COMPARE_TIME 的阶段只受计时噪声影响，不参与判断。
+
+scale 用 generator.py 按不同的顶层语句数合成程序，得到各阶段的规模曲线，
+结果格式相同 (程序名为 generated_<语句数>)，同样可以 compare。
+
+用法:
+    python -m benchmarks.suite run [-o results.json] [-n 重复次数] [-w 预热次数] [程序...]
+    python -m benchmarks.suite compare old.json new.json [--threshold 0.1]
+    python -m benchmarks.suite scale [-o scale.json] [--seed 0] [--statements 100 1000 10000]
+"""
+
+import sys
+import os
+import json
+import time
+import platform
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler, COMPILER_VERSION
+from vm import CillyVM, cilly_vm_dis, BYTECODE_VERSION
+from output import StringSink
+from providers import load_provider
+
+from benchmarks.corpus import CORPUS
+from benchmarks.generator import generate
+
+STAGES = ['lexer', 'parser', 'compiler', 'dis', 'run']
+SUITE_REPEAT = 5
+SUITE_WARMUP = 1
+REGRESSION_THRESHOLD = 0.10  # 中位数变慢超过 10% 视为回退
+MIN_COMPARE_TIME = 0.001  # 秒
+SCALE_STATEMENTS = [100, 1000, 10000]
+
+def measure(f, repeat, warmup):
+    for _ in range(warmup):
+        f()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "runs": len(times),
+    }
+
+def bench_program(source, repeat=SUITE_REPEAT, warmup=SUITE_WARMUP):
+    primitives = load_provider('headless')
+    names = list(primitives)
+    tokens = cilly_lexer(source)
+    ast = cilly_parser(tokens)
+    code, consts, scopes, functions = cilly_vm_compiler(ast, names)
+
+    def run():
+        # VM 把变量值写进作用域列表，每次运行用新的副本
+        vm = CillyVM(code, consts, [list(s) for s in scopes], functions,
+                     primitives=primitives, output=StringSink())
+        vm.run(show_stats=False)
+
+    return {
+        'lexer': measure(lambda: cilly_lexer(source), repeat, warmup),
+        'parser': measure(lambda: cilly_parser(tokens), repeat, warmup),
+        'compiler': measure(lambda: cilly_vm_compiler(ast, names), repeat, warmup),
+        'dis': measure(lambda: cilly_vm_dis(code, consts, scopes), repeat, warmup),
+        'run': measure(run, repeat, warmup),
+    }
+
+def run_suite(names=None, repeat=SUITE_REPEAT, warmup=SUITE_WARMUP, corpus=None, write=None):
+    corpus = corpus if corpus is not None else CORPUS
+    names = names or list(corpus)
+    for name in names:
+        if name not in corpus:
+            raise ValueError(f'未知的基准程序: {name} (可选 {", ".join(corpus)})')
+    results = {}
+    for name in names:
+        results[name] = bench_program(corpus[name], repeat, warmup)
+        if write is not None:
+            write(format_row(name, results[name]))
+    return {"meta": meta(repeat, warmup), "results": results}
+
+def run_scaling(sizes=None, seed=0, repeat=SUITE_REPEAT, warmup=SUITE_WARMUP, write=None, **knobs):
+    # 同一种子、不同顶层语句数的合成程序
+    sizes = sizes or SCALE_STATEMENTS
+    corpus = {f'generated_{n}': generate(seed, statements=n, **knobs) for n in sizes}
+    data = run_suite(list(corpus), repeat, warmup, corpus, write)
+    data["meta"]["generator"] = dict(knobs, seed=seed)
+    return data
+
+def meta(repeat, warmup):
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "compiler_version": COMPILER_VERSION,
+        "bytecode_version": BYTECODE_VERSION,
+        "repeat": repeat,
+        "warmup": warmup,
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def format_row(name, stages):
+    cells = ' '.join(f'{stages[s]["median"] * 1000:10.2f}' for s in STAGES)
+    return f'{name:18} {cells}\n'
+
+def header():
+    return f'{"program (ms)":18} ' + ' '.join(f'{s:>10}' for s in STAGES) + '\n'
+
+def compare(old, new, threshold=REGRESSION_THRESHOLD, min_time=MIN_COMPARE_TIME):
+    # -> [{program, stage, old, new, ratio, status}]，status 为 regression / improvement / ok
+    rows = []
+    for name, stages in new["results"].items():
+        if name not in old["results"]:
+            continue
+        for stage in STAGES:
+            if stage not in stages or stage not in old["results"][name]:
+                continue
+            before = old["results"][name][stage]["median"]
+            after = stages[stage]["median"]
+            ratio = after / before if before > 0 else float('inf')
+            if before < min_time and after < min_time:
+                status = 'ok'
+            elif ratio > 1 + threshold:
+                status = 'regression'
+            elif ratio < 1 - threshold:
+                status = 'improvement'
+            else:
+                status = 'ok'
+            rows.append({"program": name, "stage": stage, "old": before, "new": after,
+                         "ratio": ratio, "status": status})
+    return rows
+
+def format_compare(rows):
+    lines = [f'{"program":18} {"stage":9} {"old ms":>10} {"new ms":>10} {"ratio":>7}']
+    for r in rows:
+        flag = {'regression': '  <-- 回退', 'improvement': '  (提升)'}.get(r["status"], '')
+        lines.append(f'{r["program"]:18} {r["stage"]:9} {r["old"] * 1000:10.2f} '
+                     f'{r["new"] * 1000:10.2f} {r["ratio"]:7.2f}{flag}')
+    return '\n'.join(lines) + '\n'
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Cilly 分阶段基准测试')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_p = sub.add_parser('run', help='运行基准测试')
+    run_p.add_argument('programs', nargs='*', help='只运行这些程序，默认全部')
+    run_p.add_argument('-o', '--output', help='结果 JSON 文件')
+    run_p.add_argument('-n', '--repeat', type=int, default=SUITE_REPEAT)
+    run_p.add_argument('-w', '--warmup', type=int, default=SUITE_WARMUP)
+    scale_p = sub.add_parser('scale', help='合成程序的规模曲线')
+    scale_p.add_argument('-o', '--output', help='结果 JSON 文件')
+    scale_p.add_argument('-n', '--repeat', type=int, default=SUITE_REPEAT)
+    scale_p.add_argument('-w', '--warmup', type=int, default=SUITE_WARMUP)
+    scale_p.add_argument('--seed', type=int, default=0)
+    scale_p.add_argument('--statements', type=int, nargs='+', default=SCALE_STATEMENTS)
+    cmp_p = sub.add_parser('compare', help='比较两个结果文件')
+    cmp_p.add_argument('old')
+    cmp_p.add_argument('new')
+    cmp_p.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.command in ('run', 'scale'):
+        sys.stdout.write(header())
+        if args.command == 'run':
+            data = run_suite(args.programs, args.repeat, args.warmup, write=sys.stdout.write)
+        else:
+            data = run_scaling(args.statements, args.seed, args.repeat, args.warmup, write=sys.stdout.write)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        return 0
+
+    rows = compare(load_results(args.old), load_results(args.new), args.threshold)
+    sys.stdout.write(format_compare(rows))
+    return 1 if any(r["status"] == 'regression' for r in rows) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+'''
+Cilly 字节码文件 (.cbc)
+
+将 cilly_vm_compiler 的输出 (code, consts, scopes, functions) 持久化为
+带版本的二进制容器，加载时无需 lexer/parser/compiler 即可构造 CillyVM。
+
+文件布局 (小端序):
+
+    magic            4s   b'\\x7fCBC'
+    format_version   H    CBC_FORMAT_VERSION
+    bytecode_version H    vm.BYTECODE_VERSION
+    compiler_version str  (u16 长度 + utf-8)
+    consts           u32 个数, 每项: u8 类型 + 数据
+    scopes           u32 个数, 每项: u32 名字个数 + str*
+    functions        u32 个数, 每项: name, u32 参数个数 + str*, i32 entry_point, u32 id
+    primitives       u32 个数 + str*  (写入时的 primitive 注册表，按 prim_id 排列)
+    code             u32 槽数 + 槽数 * 4 字节 (array('i'))
+'''
+
+import struct
+
+from errors import error
+from primitives import PRIMITIVES, primitive_id
+from vm import CillyVM, BYTECODE_VERSION, mk_num, mk_str, val, code_to_bytes, code_from_bytes
+
+CBC_MAGIC = b'\x7fCBC'
+CBC_FORMAT_VERSION = 2
+
+CONST_INT = 0
+CONST_FLOAT = 1
+CONST_STR = 2
+CONST_BIGINT = 3
+
+_U8 = struct.Struct('<B')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_I32 = struct.Struct('<i')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+_HEADER = struct.Struct('<4sHH')
+
+def err(msg):
+    error('cilly cbc', msg)
+
+# --- 写入 ---
+
+class _Writer:
+    def __init__(self):
+        self.parts = []
+
+    def u8(self, v):
+        self.parts.append(_U8.pack(v))
+
+    def u32(self, v):
+        self.parts.append(_U32.pack(v))
+
+    def i32(self, v):
+        self.parts.append(_I32.pack(v))
+
+    def raw(self, b):
+        self.parts.append(b)
+
+    def text(self, s, size=_U32):
+        b = s.encode('utf-8')
+        self.parts.append(size.pack(len(b)))
+        self.parts.append(b)
+
+    def getvalue(self):
+        return b''.join(self.parts)
+
+def write_const(w, c):
+    tag, v = c[0], val(c)
+    if tag == 'str':
+        w.u8(CONST_STR)
+        w.text(v)
+    elif tag == 'num' and isinstance(v, float):
+        w.u8(CONST_FLOAT)
+        w.raw(_F64.pack(v))
+    elif tag == 'num' and -2**63 <= v < 2**63:
+        w.u8(CONST_INT)
+        w.raw(_I64.pack(v))
+    elif tag == 'num':
+        w.u8(CONST_BIGINT)
+        w.text(str(v))
+    else:
+        err(f'不支持的常量类型: {c}')
+
+def dump_cbc(code, consts, scopes, functions, compiler_version=None):
+    if compiler_version is None:
+        # 仅写入路径需要编译器版本，加载路径不依赖前端
+        from compile import COMPILER_VERSION
+        compiler_version = COMPILER_VERSION
+
+    w = _Writer()
+    w.raw(_HEADER.pack(CBC_MAGIC, CBC_FORMAT_VERSION, BYTECODE_VERSION))
+    w.text(compiler_version, _U16)
+
+    w.u32(len(consts))
+    for c in consts:
+        write_const(w, c)
+
+    w.u32(len(scopes))
+    for scope in scopes:
+        w.u32(len(scope))
+        for name in scope:
+            w.text(name)
+
+    w.u32(len(functions))
+    for func in functions:
+        w.text(func["name"])
+        params = func.get("params", [])
+        w.u32(len(params))
+        for p in params:
+            w.text(p)
+        w.i32(func["entry_point"])
+        w.u32(func["id"])
+
+    # CALL_PRIMITIVE 的操作数是 prim_id，记录编号对应的名字以便加载时校验
+    w.u32(len(PRIMITIVES))
+    for prim in PRIMITIVES:
+        w.text(prim["name"])
+
+    w.u32(len(code))
+    w.raw(code_to_bytes(code))
+    return w.getvalue()
+
+def write_cbc(path, code, consts, scopes, functions, compiler_version=None):
+    data = dump_cbc(code, consts, scopes, functions, compiler_version)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+# --- 读取 ---
+
+class _Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def unpack(self, st):
+        try:
+            v = st.unpack_from(self.data, self.pos)
+        except struct.error:
+            err('文件被截断')
+        self.pos += st.size
+        return v
+
+    def u8(self):
+        return self.unpack(_U8)[0]
+
+    def u32(self):
+        return self.unpack(_U32)[0]
+
+    def i32(self):
+        return self.unpack(_I32)[0]
+
+    def raw(self, n):
+        if self.pos + n > len(self.data):
+            err('文件被截断')
+        b = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return b
+
+    def text(self, size=_U32):
+        n = self.unpack(size)[0]
+        return str(self.raw(n), 'utf-8')
+
+def read_const(r):
+    return read_const_body(r, r.u8())
+
+def read_const_body(r, tag):
+    if tag == CONST_INT:
+        return mk_num(r.unpack(_I64)[0])
+    if tag == CONST_FLOAT:
+        return mk_num(r.unpack(_F64)[0])
+    if tag == CONST_STR:
+        return mk_str(r.text())
+    if tag == CONST_BIGINT:
+        return mk_num(int(r.text()))
+    err(f'未知常量类型: {tag}')
+
+def read_header(r):
+    magic, fmt, bc_version = r.unpack(_HEADER)
+    if magic != CBC_MAGIC:
+        err('不是 cbc 文件')
+    if fmt != CBC_FORMAT_VERSION:
+        err(f'不支持的 cbc 格式版本: {fmt}')
+    if bc_version != BYTECODE_VERSION:
+        err(f'字节码版本不匹配: 文件 {bc_version}, 虚拟机 {BYTECODE_VERSION}')
+    return {
+        "format_version": fmt,
+        "bytecode_version": bc_version,
+        "compiler_version": r.text(_U16),
+    }
+
+def cbc_info(data):
+    return read_header(_Reader(data))
+
+def load_cbc(data):
+    r = _Reader(data)
+    read_header(r)
+
+    consts = [read_const(r) for _ in range(r.u32())]
+
+    scopes = []
+    for _ in range(r.u32()):
+        scopes.append([r.text() for _ in range(r.u32())])
+
+    functions = []
+    for _ in range(r.u32()):
+        name = r.text()
+        params = [r.text() for _ in range(r.u32())]
+        entry_point = r.i32()
+        func_id = r.u32()
+        functions.append({
+            "name": name, "params": params,
+            "entry_point": entry_point, "id": func_id
+        })
+
+    for prim_id in range(r.u32()):
+        name = r.text()
+        if primitive_id(name) != prim_id:
+            err(f'primitive 编号不匹配: {name} 在文件中为 {prim_id}')
+
+    n = r.u32()
+    code = code_from_bytes(r.raw(n * 4))
+    return code, consts, scopes, functions
+
+def read_cbc(path):
+    with open(path, 'rb') as f:
+        return load_cbc(f.read())
+
+def load_vm(path, primitives=None, signals=None, output=None):
+    code, consts, scopes, functions = read_cbc(path)
+    return CillyVM(code, consts, scopes, functions, primitives, signals, output)
+
+__all__ = ['CBC_MAGIC', 'CBC_FORMAT_VERSION', 'dump_cbc', 'write_cbc', 'load_cbc', 'read_cbc', 'cbc_info', 'load_vm']
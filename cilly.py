@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+'''
+Cilly 命令行
+
+    python cilly.py run [file|-] [--time] [--profile] [--no-stats] [--max-instructions N]
+                        [--max-memory 512M] [--jit] [--backend vm|py] [--provider tk|headless]
+                        [--pgo prog.prof]
+    python cilly.py compile [file|-] [-o out.cbc] [--pgo prog.prof]
+    python cilly.py dis [file|-] [--pgo prog.prof]
+    python cilly.py transpile [file|-] --target js|py [-o out]
+    python cilly.py bench [run|compare|scale] [benchmarks.suite 的参数...]
+
+file 省略或为 - 时从标准输入读取；run / dis 也接受 compile 生成的 .cbc 文件
+(按文件头识别)。
+
+--pgo 按 pgo.py record 记录的剖析引导编译，只对源码有效。
+run --backend py 把程序转译为 Python 执行，只支持 --time 和 --provider；
+其余只对 VM 有意义的选项与它同时给出时按用法错误处理。
+
+程序输出写到标准输出，计时、剖析和错误信息写到标准错误。
+
+退出码：
+    0  成功
+    1  Cilly 程序出错 (词法/语法/编译/运行时错误，或超出内存上限)
+    2  命令行用法错误或无法读取输入
+    3  超出 --max-instructions 指令预算
+
+各子命令只导入自己用到的模块；turtle (tkinter) 在程序第一次调用绘图
+primitive 时才导入，不画图的程序不会加载 tkinter 或 PyQt5。
+'''
+
+import os
+import sys
+import time
+
+from errors import error_text
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_BUDGET = 3
+
+class UsageError(Exception):
+    pass
+
+# --- 输入 ---
+
+def read_input(path):
+    # -> (名字, bytes)
+    if path is None or path == '-':
+        return '<stdin>', sys.stdin.buffer.read()
+    try:
+        with open(path, 'rb') as f:
+            return path, f.read()
+    except OSError as e:
+        raise UsageError(f'无法读取 {path}: {e.strerror}')
+
+def is_cbc(data):
+    from cbc import CBC_MAGIC
+    return data.startswith(CBC_MAGIC)
+
+def decode_source(name, data):
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise UsageError(f'{name} 不是 UTF-8 文本: {e}')
+
+class Timer:
+    # 记录各阶段耗时，--time 时输出
+    def __init__(self):
+        self.stages = []
+
+    def __call__(self, name, f, *args):
+        start = time.perf_counter()
+        try:
+            return f(*args)
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def report(self):
+        total = sum(t for _, t in self.stages)
+        lines = [f'{name:10} {t * 1000:10.2f} ms' for name, t in self.stages]
+        lines.append(f'{"total":10} {total * 1000:10.2f} ms')
+        return '\n'.join(lines) + '\n'
+
+def load_program(name, data, primitive_names, timer, profile_path=None):
+    # 源码或 .cbc -> (code, consts, scopes, functions)
+    if is_cbc(data):
+        if profile_path is not None:
+            raise UsageError(f'{name} 已经是字节码，--pgo 只用于编译源码')
+        from cbc import load_cbc
+        return timer('load', load_cbc, data)
+    from lexer import cilly_lexer
+    from cilly_parser_module import cilly_parser
+    from compile import cilly_vm_compiler
+    source = decode_source(name, data)
+    profile = None
+    if profile_path is not None:
+        from pgo import load_profile
+        try:
+            profile = load_profile(profile_path)
+        except OSError as e:
+            raise UsageError(f'无法读取 {profile_path}: {e.strerror}')
+    tokens = timer('lexer', cilly_lexer, source)
+    ast = timer('parser', cilly_parser, tokens)
+    return timer('compiler', cilly_vm_compiler, ast, primitive_names, profile)
+
+def parse_source(name, data):
+    from lexer import cilly_lexer
+    from cilly_parser_module import cilly_parser
+    if is_cbc(data):
+        raise UsageError(f'{name} 是字节码文件，需要源码')
+    return cilly_parser(cilly_lexer(decode_source(name, data)))
+
+def primitives_for(provider):
+    from providers import lazy_primitives
+    return lazy_primitives(provider)
+
+# --- run ---
+
+def format_profile(stats, limit=10):
+    lines = ['--- profile ---', f'{"function":24} {"calls":>10} {"incl ms":>10} {"excl ms":>10}']
+    functions = sorted(stats["functions"].items(), key=lambda kv: -kv[1]["inclusive"])
+    for name, f in functions[:limit]:
+        lines.append(f'{name:24} {f["calls"]:10} {f["inclusive"] * 1000:10.2f} {f["exclusive"] * 1000:10.2f}')
+    lines.append(f'{"opcode":24} {"count":>10} {"ms":>10}')
+    opcodes = sorted(stats["opcodes"].items(), key=lambda kv: -kv[1]["time"])
+    for name, op in opcodes[:limit]:
+        lines.append(f'{name:24} {op["count"]:10} {op["time"] * 1000:10.2f}')
+    return '\n'.join(lines) + '\n'
+
+# --backend py 不支持的 run 选项 -> 命令行写法
+VM_ONLY_OPTIONS = (
+    ('max_instructions', '--max-instructions'), ('max_memory', '--max-memory'),
+    ('profile', '--profile'), ('jit', '--jit'), ('no_stats', '--no-stats'), ('pgo', '--pgo'),
+)
+
+def cmd_run(args):
+    from vm import CillyVM, RUNNING, ERROR
+    if args.backend == 'py':
+        given = [flag for attr, flag in VM_ONLY_OPTIONS if getattr(args, attr) not in (None, False)]
+        if given:
+            raise UsageError(f'{" ".join(given)} 只能用于 --backend vm')
+    name, data = read_input(args.file)
+    primitives = primitives_for(args.provider)
+    timer = Timer()
+    if args.backend == 'py':
+        from py_transpiler import cilly_to_py, load_py_module, run_py_module
+        ast = timer('parser', parse_source, name, data)
+        source = timer('transpile', cilly_to_py, ast, list(primitives))
+        timer('run', lambda: run_py_module(load_py_module(source, primitives)))
+        if args.time:
+            sys.stderr.write(timer.report())
+        return EXIT_OK
+
+    code, consts, scopes, functions = load_program(name, data, list(primitives), timer, args.pgo)
+    vm = CillyVM(code, consts, scopes, functions, primitives)
+    if args.jit:
+        vm.enable_jit()
+    profiler = vm.enable_profiling() if args.profile else None
+    show_stats = not args.no_stats
+    status = None
+    try:
+        if args.max_instructions is None and args.max_memory is None:
+            timer('run', vm.run, show_stats)
+        else:
+            from memory import run_capped
+            status = timer('run', run_capped, vm, args.max_memory, args.max_instructions)
+            if status == ERROR:
+                raise vm.error
+            if status != RUNNING:
+                vm.report(show_stats)
+    finally:
+        vm.output.flush()
+        if profiler is not None:
+            profiler.disable()
+            sys.stderr.write(format_profile(profiler.stats()))
+        if args.time:
+            sys.stderr.write(timer.report())
+    if status == RUNNING:
+        sys.stderr.write(f'cilly: 超出指令预算 ({args.max_instructions} 条)，程序未结束\n')
+        return EXIT_BUDGET
+    return EXIT_OK
+
+# --- compile / dis / transpile ---
+
+def output_path(args, ext):
+    if args.output:
+        return args.output
+    if args.file is None or args.file == '-':
+        return '-'
+    return os.path.splitext(args.file)[0] + ext
+
+def write_output(path, data):
+    if path == '-':
+        if isinstance(data, bytes):
+            sys.stdout.buffer.write(data)
+        else:
+            sys.stdout.write(data)
+        return
+    if isinstance(data, bytes):
+        with open(path, 'wb') as f:
+            f.write(data)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(data)
+
+def cmd_compile(args):
+    from cbc import dump_cbc
+    name, data = read_input(args.file)
+    primitives = primitives_for('headless')
+    compiled = load_program(name, data, list(primitives), Timer(), args.pgo)
+    write_output(output_path(args, '.cbc'), dump_cbc(*compiled))
+    return EXIT_OK
+
+def cmd_dis(args):
+    from vm import cilly_vm_dis
+    name, data = read_input(args.file)
+    code, consts, scopes, _ = load_program(name, data, list(primitives_for('headless')), Timer(), args.pgo)
+    sys.stdout.write(cilly_vm_dis(code, consts, scopes) + '\n')
+    return EXIT_OK
+
+def cmd_transpile(args):
+    name, data = read_input(args.file)
+    ast = parse_source(name, data)
+    if args.target == 'js':
+        from transpiler import cilly_to_js
+        text = cilly_to_js(ast) + '\n'
+    else:
+        from py_transpiler import cilly_to_py
+        text = cilly_to_py(ast, list(primitives_for('headless')))
+    write_output(args.output or '-', text)
+    return EXIT_OK
+
+# --- bench ---
+
+BENCH_COMMANDS = ('run', 'compare', 'scale')
+
+def cmd_bench(rest):
+    # 参数原样交给 benchmarks.suite，省略子命令时为 run
+    from benchmarks.suite import main as bench_main
+    rest = list(rest)
+    if not rest or rest[0] not in BENCH_COMMANDS:
+        rest.insert(0, 'run')
+    return bench_main(rest)
+
+# --- 入口 ---
+
+def build_parser():
+    import argparse
+    from memory import parse_bytes
+    parser = argparse.ArgumentParser(prog='cilly', description='Cilly 语言工具')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_p = sub.add_parser('run', help='运行程序 (源码或 .cbc)')
+    run_p.add_argument('file', nargs='?', help='文件，省略或 - 为标准输入')
+    run_p.add_argument('--time', action='store_true', help='输出各阶段耗时')
+    run_p.add_argument('--profile', action='store_true', help='输出按函数和 opcode 的剖析结果')
+    run_p.add_argument('--no-stats', action='store_true', help='不输出栈统计')
+    run_p.add_argument('--max-instructions', type=int, default=None, help='指令预算，超出时退出码为 3')
+    run_p.add_argument('--max-memory', type=parse_bytes, default=None, help='内存上限 (例如 512M)')
+    run_p.add_argument('--jit', action='store_true', help='开启函数 JIT')
+    run_p.add_argument('--backend', choices=['vm', 'py'], default='vm')
+    run_p.add_argument('--provider', choices=['tk', 'headless'], default='tk', help='绘图 primitive 的提供者')
+    run_p.add_argument('--pgo', metavar='PROFILE', help='按 pgo.py record 记录的剖析优化编译')
+    run_p.set_defaults(handler=cmd_run)
+
+    compile_p = sub.add_parser('compile', help='编译为字节码文件 (.cbc)')
+    compile_p.add_argument('file', nargs='?')
+    compile_p.add_argument('-o', '--output', help='输出文件，默认与源文件同名 (标准输入时写到标准输出)')
+    compile_p.add_argument('--pgo', metavar='PROFILE', help='按剖析优化编译')
+    compile_p.set_defaults(handler=cmd_compile)
+
+    dis_p = sub.add_parser('dis', help='反汇编 (源码或 .cbc)')
+    dis_p.add_argument('file', nargs='?')
+    dis_p.add_argument('--pgo', metavar='PROFILE', help='按剖析优化编译后再反汇编')
+    dis_p.set_defaults(handler=cmd_dis)
+
+    transpile_p = sub.add_parser('transpile', help='转译为 JavaScript 或 Python')
+    transpile_p.add_argument('file', nargs='?')
+    transpile_p.add_argument('--target', choices=['js', 'py'], required=True)
+    transpile_p.add_argument('-o', '--output', help='输出文件，默认标准输出')
+    transpile_p.set_defaults(handler=cmd_transpile)
+
+    # bench 的参数不经过这里的解析，见 main
+    sub.add_parser('bench', help='分阶段基准测试，参数同 python -m benchmarks.suite')
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['bench']:
+        return cmd_bench(argv[1:])
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except UsageError as e:
+        sys.stderr.write(f'cilly: {e}\n')
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        sys.stderr.write(f'cilly: {error_text(e)}\n')
+        return EXIT_ERROR
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+'''
+Cilly 常驻执行服务 (daemon.py) 的轻量客户端
+
+只导入标准库中的 json/socket/sys，启动开销远小于加载完整前端。
+
+用法:
+    python cilly_client.py --socket /tmp/cilly.sock program.cilly [--max-instructions N] [--timeout 秒]
+    python cilly_client.py --socket /tmp/cilly.sock -          # 从标准输入读取源码
+    python cilly_client.py --socket /tmp/cilly.sock --program <sha256>
+
+程序输出写到标准输出，错误写到标准错误；程序正常结束时退出码为 0。
+'''
+
+import sys
+import json
+import socket
+
+class CillyClient:
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.rfile = self.sock.makefile('rb')
+        self.next_id = 0
+
+    def request(self, **fields):
+        self.next_id += 1
+        fields.setdefault("id", self.next_id)
+        self.sock.sendall((json.dumps(fields, ensure_ascii=False) + '\n').encode('utf-8'))
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError('服务已断开')
+        return json.loads(line)
+
+    def run(self, source=None, program=None, max_instructions=None, timeout=None):
+        fields = {"source": source} if source is not None else {"program": program}
+        if max_instructions is not None:
+            fields["max_instructions"] = max_instructions
+        if timeout is not None:
+            fields["timeout"] = timeout
+        return self.request(**fields)
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Cilly 常驻执行服务客户端')
+    parser.add_argument('file', nargs='?', help='.cilly 源文件，- 表示标准输入')
+    parser.add_argument('--socket', required=True, help='服务的 Unix socket 路径')
+    parser.add_argument('--program', help='已缓存程序的 sha256')
+    parser.add_argument('--max-instructions', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=None)
+    args = parser.parse_args(argv)
+
+    source = None
+    if args.program is None:
+        if args.file is None:
+            parser.error('需要源文件或 --program')
+        if args.file == '-':
+            source = sys.stdin.read()
+        else:
+            with open(args.file, encoding='utf-8') as f:
+                source = f.read()
+
+    with CillyClient(args.socket) as client:
+        response = client.run(source, args.program, args.max_instructions, args.timeout)
+    sys.stdout.write(response.get("output") or '')
+    if response.get("error"):
+        sys.stderr.write(f'{response["status"]}: {response["error"]}\n')
+    elif response.get("status") != 'finished':
+        sys.stderr.write(f'{response["status"]}\n')
+    return 0 if response.get("status") == 'finished' else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
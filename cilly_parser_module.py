@@ -120,6 +120,15 @@ from lexer import *
 
 EOF = mk_tk('eof')
 
+class Node(list):
+    # AST 节点，line 为节点第一个 token 所在的源码行 (未知时为 None)
+    __slots__ = ('line',)
+
+def mk_node(node, line):
+    n = Node(node)
+    n.line = line
+    return n
+
 def make_token_reader(ts, err):
     pos = -1
     cur = None
@@ -148,15 +157,20 @@ def make_token_reader(ts, err):
             cur = ts[pos]
             
         return old
+
+    def line():
+        return tk_line(cur)
+
     next()
     
-    return peek, match, next
+    return peek, match, next, line
         
 def cilly_parser(tokens):
     def err(msg):
-        error('cilly parser',  msg)
+        line = cur_line()
+        error('cilly parser', msg if line is None else f'{msg} (第 {line} 行)')
         
-    peek, match, next = make_token_reader(tokens, err)
+    peek, match, next, cur_line = make_token_reader(tokens, err)
     
     def program():
         
@@ -168,6 +182,10 @@ def cilly_parser(tokens):
         return ['program', r]
     
     def statement():
+        line = cur_line()
+        return mk_node(statement_body(), line)
+
+    def statement_body():
         t = peek()
 
         if t == 'define':
@@ -417,6 +435,10 @@ def cilly_parser(tokens):
             return op2[t]
             
     def expr(bp = 0):
+        line = cur_line()
+        return mk_node(expr_body(bp), line)
+
+    def expr_body(bp = 0):
         r_bp, parser = get_op1_parser( peek() )
         left = parser(r_bp)
         
@@ -0,0 +1,141 @@
+'''
+primitive 命令缓冲区
+
+VM 不再为每次 turtle 调用发一个 Qt 信号，而是把调用追加到紧凑的缓冲区：
+
+    ops    array('H')  每条命令的 prim_id
+    args   array('d')  所有参数，按顺序排列 (参数个数由注册表中的 arity 决定)
+    kinds  array('B')  每个参数的类型：ARG_NUM 数值，ARG_STR 字符串
+    strings list       字符串参数的旁表，ARG_STR 参数在 args 中存的是下标
+
+缓冲区积累到 max_count 条命令、或距上次刷新超过 max_interval 秒时，
+把整批命令 (CommandBatch) 交给 flush 回调 —— GUI 中即一次信号发射。
+append 只在有新命令时检查时间；程序画完一段后长时间不再调用 primitive 时，
+由 ticking() 启动的后台线程定期 poll()，按时间刷新仍在缓冲区中的命令。
+'''
+
+from array import array
+from contextlib import contextmanager
+import threading
+import time
+
+from errors import error
+from primitives import PRIMITIVES
+
+ARG_NUM = 0
+ARG_STR = 1
+
+CMD_FLUSH_COUNT = 512  # 每批最多的命令数
+CMD_FLUSH_INTERVAL = 0.05  # 最长刷新间隔 (秒)，保证长时间运行的程序也能逐步显示
+
+class CommandBatch:
+    def __init__(self, ops, args, kinds, strings):
+        self.ops = ops
+        self.args = args
+        self.kinds = kinds
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __iter__(self):
+        # 依次产生 (名字, 参数元组)
+        args, kinds, strings = self.args, self.kinds, self.strings
+        i = 0
+        for prim_id in self.ops:
+            prim = PRIMITIVES[prim_id]
+            n = prim["arity"]
+            values = []
+            for j in range(i, i + n):
+                values.append(strings[int(args[j])] if kinds[j] == ARG_STR else args[j])
+            i += n
+            yield prim["name"], tuple(values)
+
+class CommandBuffer:
+    def __init__(self, flush, max_count=CMD_FLUSH_COUNT, max_interval=CMD_FLUSH_INTERVAL, clock=time.monotonic):
+        self.on_flush = flush
+        self.max_count = max_count
+        self.max_interval = max_interval
+        self.clock = clock
+        self.batch_count = 0  # 已刷新的批次数
+        self.command_count = 0  # 已刷新的命令数
+        # append / flush 可能与 ticking() 的后台线程并发，整条命令的写入和整批的取出都在锁内完成
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.ops = array('H')
+        self.args = array('d')
+        self.kinds = array('B')
+        self.strings = []
+        self.last_flush = self.clock()
+
+    def append(self, prim_id, *values):
+        for v in values:
+            # bool 是 int 的子类，true / false 按 1 / 0 存放
+            if not isinstance(v, (str, int, float)):
+                kind = 'null' if v is None else type(v).__name__
+                error('cilly vm', f'primitive {PRIMITIVES[prim_id]["name"]} 的参数只能是数值或字符串，实际为 {kind}')
+        with self.lock:
+            self.ops.append(prim_id)
+            for v in values:
+                if isinstance(v, str):
+                    self.kinds.append(ARG_STR)
+                    self.args.append(len(self.strings))
+                    self.strings.append(v)
+                else:
+                    self.kinds.append(ARG_NUM)
+                    self.args.append(v)
+            if len(self.ops) >= self.max_count or self.clock() - self.last_flush >= self.max_interval:
+                self.flush()
+
+    def flush(self):
+        # 在锁内发出批次，保证各批按写入顺序到达
+        with self.lock:
+            if not self.ops:
+                return
+            batch = CommandBatch(self.ops, self.args, self.kinds, self.strings)
+            self.batch_count += 1
+            self.command_count += len(batch)
+            self.clear()
+            self.on_flush(batch)
+
+    def poll(self):
+        # 距上次刷新超过 max_interval 时刷新积压的命令
+        with self.lock:
+            if self.ops and self.clock() - self.last_flush >= self.max_interval:
+                self.flush()
+
+    @contextmanager
+    def ticking(self, interval=None):
+        # 运行期间每隔 interval (默认 max_interval) 秒 poll() 一次；退出时停止线程并刷新剩余命令
+        stop = threading.Event()
+
+        def tick():
+            while not stop.wait(interval or self.max_interval):
+                self.poll()
+        thread = threading.Thread(target=tick, name='command-buffer-tick', daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+            self.flush()
+
+    def primitives(self, names=None):
+        # 供 CillyVM / Python 后端使用的 {名字: 可调用对象}
+        if names is None:
+            names = [prim["name"] for prim in PRIMITIVES]
+        table = {}
+        for prim in PRIMITIVES:
+            if prim["name"] in names:
+                table[prim["name"]] = self.recorder(prim["id"])
+        return table
+
+    def recorder(self, prim_id):
+        append = self.append
+
+        def record(*values):
+            append(prim_id, *values)
+        return record
@@ -1,7 +1,9 @@
 from lexer import error
+from primitives import primitive_id, get_primitive
 
+from linetable import LineTable
 from vm import (
-    mk_num,
+    mk_num, Code,
     LOAD_CONST, LOAD_NULL, LOAD_TRUE, LOAD_FALSE, LOAD_VAR, STORE_VAR,
     PRINT_ITEM, PRINT_NEWLINE, JMP, JMP_TRUE, JMP_FALSE, POP,
     ENTER_SCOPE, LEAVE_SCOPE, CALL, RETURN, RETURN_VALUE, CALL_PRIMITIVE,
@@ -10,10 +12,12 @@ from vm import (
     BINARY_EQ, BINARY_NE, BINARY_LT, BINARY_GE
 )
 
+COMPILER_VERSION = '1.1'
+
 # CillyCompiler class
 class CillyCompiler:
-    def __init__(self):
-        self.code = []
+    def __init__(self, profile=None, record_sites=False):
+        self.code = Code()
         self.consts = []
         self.scopes = [[]]  # 初始作用域
         self.all_scopes = [self.scopes[0]]
@@ -21,11 +25,24 @@ class CillyCompiler:
         self.current_function = None  # 当前正在编译的函数
         self.break_stack = []  # break语句跳转地址
         self.continue_stack = []  # continue语句跳转地址
+        self.continue_patches = []  # 旋转后的循环中 continue 的跳转，目标 (底部条件) 待回填
+        self.loop_depth = 0  # 循环体外的作用域层数，break/continue 需离开其间的块作用域
+        self.fun_nodes = {}  # func_id -> fun 节点，内联时重新编译函数体
+        self.inline_exits = None  # 正在内联的函数体中 return 的跳转，回填到展开的末尾
+        self.inline_tail = None  # 内联函数体末尾的 return，直接落到展开的末尾
+        self.profile = profile  # 剖析数据 (pgo.load_profile)，为 None 时不做剖析引导优化
+        self.record_sites = record_sites
+        self.guide = None  # pgo.ProfileGuide
+        self.sites = None  # id(AST 节点) -> 站点编号 (if / while / call)
+        self.site_kinds = None  # 站点编号 -> (类型, 行号)
+        self.site_pcs = {}  # 条件跳转或 CALL 的 pc -> 站点编号
         self.primitives = [] # 外部函数
+        self.line = None  # 当前正在编译的源码行 (来自 AST 节点的 line)
+        self.line_marks = []  # [(pc, line)]，行号变化的位置
         self.__init_visitors()
 
     def err(self, msg):
-        error('cilly vm compiler', msg)
+        error('cilly vm compiler', msg if self.line is None else f'{msg} (第 {self.line} 行)')
 
     def add_const(self, c):
         for i in range(len(self.consts)):
@@ -39,6 +56,8 @@ class CillyCompiler:
 
     def emit(self, opcode, operand1=None, operand2=None):
         addr = self.get_next_emit_addr()
+        if not self.line_marks or self.line_marks[-1][1] != self.line:
+            self.line_marks.append((addr, self.line))
         self.code.append(opcode)
         if operand1 is not None:
             self.code.append(operand1)
@@ -71,7 +90,10 @@ class CillyCompiler:
                 return -1, func_id
         
         if name in self.primitives:
-            return -2, self.primitives.index(name)
+            prim_id = primitive_id(name)
+            if prim_id is None:
+                self.err(f'未注册的 primitive: {name}')
+            return -2, prim_id
 
         self.err(f'未定义变量：{name}')
 
@@ -87,6 +109,7 @@ class CillyCompiler:
                     "entry_point": -1,
                     "id": func_id
                 })
+                self.fun_nodes[func_id] = expr
         elif node[0] == 'program' or node[0] == 'block':
             _, statements = node
             for stmt in statements:
@@ -94,10 +117,27 @@ class CillyCompiler:
 
     def compile(self, ast, primitives=[]):
         self.primitives = primitives
+        if self.profile is not None or self.record_sites:
+            from pgo import number_sites, ProfileGuide
+            self.sites, self.site_kinds = number_sites(ast)
+            if self.profile is not None:
+                self.guide = ProfileGuide(self.profile, self.sites, self.site_kinds, primitives)
         self.first_pass(ast)
         self.visit(ast)
+        if self.guide is not None and self.guide.fusions:
+            from pgo import fuse_pairs
+            self.code, self.line_marks, pc_map = fuse_pairs(
+                self.code, self.line_marks, self.functions, self.guide.fusions)
+            self.site_pcs = {pc_map[pc]: site for pc, site in self.site_pcs.items()}
+        self.code.linetable = LineTable.from_marks(self.line_marks, len(self.code))
         return self.code, self.consts, self.all_scopes, self.functions
 
+    def mark_site(self, node, addr):
+        # 记录站点对应的条件跳转或 CALL，供 pgo.record_profile 计数
+        if self.sites is not None:
+            self.site_pcs[addr] = self.sites[id(node)]
+        return addr
+
     def compile_program(self, node):
         _, statements = node
         self.visit(['block', statements])
@@ -123,7 +163,7 @@ class CillyCompiler:
         elif tag == 'false':
             self.emit(LOAD_FALSE)
         elif tag in ['num', 'str']:
-            index = self.add_const(node)
+            index = self.add_const([tag, node[1]])
             self.emit(LOAD_CONST, index)
 
     def compile_unary(self, node):
@@ -181,7 +221,16 @@ class CillyCompiler:
     def compile_if(self, node):
         _, cond, true_s, false_s = node
         self.visit(cond)
-        addr1 = self.emit(JMP_FALSE, -1)
+        if false_s is not None and self.guide is not None and self.guide.invert_if(node):
+            # then 分支更热：放到最后，热路径上不再执行跳过 else 的 JMP
+            addr1 = self.mark_site(node, self.emit(JMP_TRUE, -1))
+            self.visit(false_s)
+            addr2 = self.emit(JMP, -1)
+            self.backpatch(addr1, self.get_next_emit_addr())
+            self.visit(true_s)
+            self.backpatch(addr2, self.get_next_emit_addr())
+            return
+        addr1 = self.mark_site(node, self.emit(JMP_FALSE, -1))
         self.visit(true_s)
         if false_s == None:
             self.backpatch(addr1, self.get_next_emit_addr())
@@ -193,30 +242,66 @@ class CillyCompiler:
 
     def compile_while(self, node):
         _, cond, body = node
+        if self.guide is not None and self.guide.rotate_loop(node):
+            self.compile_rotated_while(node)
+            return
         loop_start = self.get_next_emit_addr()
         self.visit(cond)
-        exit_jmp = self.emit(JMP_FALSE, -1)
-        old_break = self.break_stack
-        old_continue = self.continue_stack
-        self.break_stack = [exit_jmp]
-        self.continue_stack = [loop_start]
+        exit_jmp = self.mark_site(node, self.emit(JMP_FALSE, -1))
+        saved = self.enter_loop(loop_start)
         self.visit(body)
         self.emit(JMP, loop_start)
+        self.leave_loop(saved, exit_jmp)
+
+    def compile_rotated_while(self, node):
+        # 热循环旋转，每轮迭代少执行一条 JMP：
+        #     cond; JMP_FALSE end; top: body; cond; JMP_TRUE top; end:
+        # continue 跳到底部的条件，其地址在循环体编译完后回填
+        _, cond, body = node
+        self.visit(cond)
+        exit_jmp = self.mark_site(node, self.emit(JMP_FALSE, -1))
+        top = self.get_next_emit_addr()
+        saved = self.enter_loop(-1)
+        self.visit(body)
+        for addr in self.continue_patches:
+            self.backpatch(addr, self.get_next_emit_addr())
+        self.visit(cond)
+        self.mark_site(node, self.emit(JMP_TRUE, top))
+        self.leave_loop(saved, exit_jmp)
+
+    def enter_loop(self, continue_target):
+        saved = self.break_stack, self.continue_stack, self.continue_patches, self.loop_depth
+        self.break_stack = []
+        self.continue_stack = [continue_target]
+        self.continue_patches = []
+        self.loop_depth = len(self.scopes)
+        return saved
+
+    def leave_loop(self, saved, exit_jmp):
         loop_end = self.get_next_emit_addr()
         self.backpatch(exit_jmp, loop_end)
-        self.break_stack = old_break
-        self.continue_stack = old_continue
+        for addr in self.break_stack:
+            self.backpatch(addr, loop_end)
+        self.break_stack, self.continue_stack, self.continue_patches, self.loop_depth = saved
+
+    def leave_loop_scopes(self):
+        # 跳出循环体前离开循环内进入的块作用域
+        for _ in range(len(self.scopes) - self.loop_depth):
+            self.emit(LEAVE_SCOPE)
 
     def compile_break(self, node):
-        if not self.break_stack:
+        if not self.continue_stack:
             self.err("break语句必须在循环内部")
-        self.emit(JMP, -1)
-        self.break_stack.append(self.get_next_emit_addr() - 1)
+        self.leave_loop_scopes()
+        self.break_stack.append(self.emit(JMP, -1))
 
     def compile_continue(self, node):
         if not self.continue_stack:
             self.err("continue语句必须在循环内部")
-        self.emit(JMP, self.continue_stack[-1])
+        self.leave_loop_scopes()
+        addr = self.emit(JMP, self.continue_stack[-1])
+        if self.continue_stack[-1] == -1:
+            self.continue_patches.append(addr)
 
     def compile_block(self, node):
         _, statements = node
@@ -245,11 +330,14 @@ class CillyCompiler:
                     "name": name, "params": params,
                     "entry_point": -1, "id": func_id
                 })
+            self.fun_nodes[func_id] = expr
             skip_addr = self.emit(JMP, -1)
             entry_point = self.get_next_emit_addr()
             self.functions[func_id]["entry_point"] = entry_point
             prev_function = self.current_function
             prev_scopes = self.scopes
+            prev_loop = self.break_stack, self.continue_stack, self.continue_patches, self.loop_depth
+            self.break_stack, self.continue_stack, self.continue_patches, self.loop_depth = [], [], [], 0
             self.current_function = func_id
             param_scope = []
             self.scopes = [param_scope]
@@ -260,6 +348,7 @@ class CillyCompiler:
             if len(self.code) == 0 or (self.code[-1] != RETURN and self.code[-1] != RETURN_VALUE):
                 self.emit(RETURN)
             self.scopes = prev_scopes
+            self.break_stack, self.continue_stack, self.continue_patches, self.loop_depth = prev_loop
             self.current_function = prev_function
             self.backpatch(skip_addr, self.get_next_emit_addr())
             index = self.define_var(name)
@@ -293,6 +382,17 @@ class CillyCompiler:
         _, expr = node
         if self.current_function is None:
             self.err("return语句必须在函数内部")
+        if self.inline_exits is not None:
+            # 内联展开中：留下返回值，离开内联的作用域，跳到展开的末尾
+            if expr is not None:
+                self.visit(expr)
+            else:
+                self.emit(LOAD_NULL)
+            for _ in self.scopes:
+                self.emit(LEAVE_SCOPE)
+            if node is not self.inline_tail:
+                self.inline_exits.append(self.emit(JMP, -1))
+            return
         if expr is not None:
             self.visit(expr)
             self.emit(RETURN_VALUE)
@@ -309,27 +409,72 @@ class CillyCompiler:
                     func_id = i
                     break
             if func_id is not None:
+                if self.guide is not None and self.guide.inline_call(node, self.fun_nodes.get(func_id)):
+                    self.compile_inline(func_id, args)
+                    return
                 for arg in reversed(args):
                     self.visit(arg)
-                self.emit(CALL, func_id)
+                self.mark_site(node, self.emit(CALL, func_id))
                 return
 
-            scope_i, prim_index = self.lookup_var(name)
+            scope_i, prim_id = self.lookup_var(name)
             if scope_i == -2:
+                arity = get_primitive(prim_id)["arity"]
+                if len(args) != arity:
+                    self.err(f'primitive {name} 需要 {arity} 个参数，实际 {len(args)} 个')
                 for arg in reversed(args):
                     self.visit(arg)
-                const_index = self.add_const(['str', name])
-                self.emit(CALL_PRIMITIVE, const_index)
+                self.emit(CALL_PRIMITIVE, prim_id, len(args))
                 return
 
         self.err(f'不支持的函数调用: {node}')
 
+    def compile_inline(self, func_id, args):
+        # 内联展开 (见 pgo.ProfileGuide.inline_call)：实参照常压栈，进入一个作用域后
+        # 按参数顺序存入；函数体的语句直接在这个作用域中编译，不再单独进入块作用域
+        _, params, body = self.fun_nodes[func_id]
+        _, statements = body
+        for arg in reversed(args):
+            self.visit(arg)
+        frame = []
+        enter = self.emit(ENTER_SCOPE, -1)
+        saved = (self.scopes, self.current_function, self.inline_exits, self.inline_tail,
+                 self.break_stack, self.continue_stack, self.continue_patches, self.loop_depth)
+        self.scopes = [frame]
+        self.all_scopes.append(frame)
+        self.current_function = func_id
+        self.break_stack, self.continue_stack, self.continue_patches, self.loop_depth = [], [], [], 0
+        self.inline_exits = []
+        self.inline_tail = statements[-1] if statements and statements[-1][0] == 'return' else None
+        for param in params:
+            self.emit(STORE_VAR, 0, self.define_var(param))
+        for s in statements:
+            self.visit(s)
+        if self.inline_tail is None:
+            self.emit(LOAD_NULL)
+            self.emit(LEAVE_SCOPE)
+        for addr in self.inline_exits:
+            self.backpatch(addr, self.get_next_emit_addr())
+        self.backpatch(enter, len(frame))
+        (self.scopes, self.current_function, self.inline_exits, self.inline_tail,
+         self.break_stack, self.continue_stack, self.continue_patches, self.loop_depth) = saved
+
     def visit(self, node):
         tag = node[0]
         if tag not in self.visitors:
             self.err(f'非法ast节点: {tag}')
         v = self.visitors[tag]
-        v(node)
+        line = getattr(node, 'line', None)
+        if line is None or line == self.line:
+            v(node)
+            return
+        # 子节点编译完后，父节点后续的指令 (例如实参之后的 CALL) 回到父节点的行
+        prev_line = self.line
+        self.line = line
+        try:
+            v(node)
+        finally:
+            self.line = prev_line
 
     def __init_visitors(self):
         self.visitors = {
@@ -347,6 +492,6 @@ class CillyCompiler:
         }
 
 # cilly_vm_compiler function
-def cilly_vm_compiler(ast, primitives=[]):
-    compiler = CillyCompiler()
+def cilly_vm_compiler(ast, primitives=[], profile=None):
+    compiler = CillyCompiler(profile)
     return compiler.compile(ast, primitives)
\ No newline at end of file
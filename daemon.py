@@ -0,0 +1,185 @@
+'''
+Cilly 常驻执行服务
+
+长期运行的进程，前端模块只导入一次，编译结果按源码 sha256 缓存。
+通过 Unix socket 或标准输入/输出接收 JSON lines 请求，每行一个：
+
+    {"id": 1, "source": "print(1);", "max_instructions": 100000, "timeout": 1.0}
+    {"id": 2, "program": "<sha256>"}          # 复用已缓存的程序，不必重发源码
+    {"id": 3, "op": "stats"}                  # 服务状态
+
+每个请求回复一行：
+
+    {"id", "status", "output", "error", "program", "cached",
+     "timing": {"compile_ms", "run_ms", "total_ms"}}
+
+status 为 finished / error / budget / timeout。
+
+max_instructions / timeout 省略或为 null 时取服务的上限，大于上限时截断到上限，
+每个请求都有指令预算和运行时限。源码表按最近使用保留最多 max_programs 个程序。
+
+用法:
+    python daemon.py --socket /tmp/cilly.sock
+    python daemon.py --stdio
+客户端见 cilly_client.py。
+'''
+
+import sys
+import os
+import json
+import time
+import threading
+import socketserver
+from collections import OrderedDict
+
+from batch import compile_cached, execute, source_hash
+from vm import ERROR
+
+DAEMON_MAX_INSTRUCTIONS = 10_000_000  # 每请求指令预算的上限，也是请求未给出时的默认值
+DAEMON_MAX_TIMEOUT = 10.0  # 每请求运行时限 (秒) 的上限，也是请求未给出时的默认值
+DAEMON_MAX_PROGRAMS = 256  # 源码表最多保留的程序数
+
+def clamp_limit(value, maximum, name):
+    # 请求中的限制：省略或 null 取上限，否则截断到上限
+    if value is None:
+        return maximum
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f'{name} 必须是非负数值')
+    return min(value, maximum)
+
+class CillyDaemon:
+    def __init__(self, max_instructions=DAEMON_MAX_INSTRUCTIONS, max_timeout=DAEMON_MAX_TIMEOUT,
+                 max_programs=DAEMON_MAX_PROGRAMS):
+        self.max_instructions = max_instructions
+        self.max_timeout = max_timeout
+        self.max_programs = max_programs
+        self.sources = OrderedDict()  # sha256 -> 源码，供 {"program": ...} 请求使用，按最近使用排序
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.started = time.time()
+
+    def handle(self, request):
+        with self.lock:
+            self.requests += 1
+            requests = self.requests
+        if request.get("op") == "stats":
+            return {"id": request.get("id"), "status": "finished", "requests": requests,
+                    "programs": len(self.sources), "uptime": time.time() - self.started,
+                    "pid": os.getpid()}
+
+        start = time.perf_counter()
+        response = {"id": request.get("id"), "status": None, "output": "", "error": None,
+                    "program": None, "cached": False}
+        compile_ms = run_ms = 0.0
+        try:
+            source = request.get("source")
+            if source is not None:
+                digest = source_hash(source)
+                with self.lock:
+                    self.sources[digest] = source
+                    self.sources.move_to_end(digest)
+                    while len(self.sources) > self.max_programs:
+                        self.sources.popitem(last=False)
+            else:
+                digest = request.get("program")
+                with self.lock:
+                    source = self.sources.get(digest)
+                    if source is not None:
+                        self.sources.move_to_end(digest)
+                if source is None:
+                    raise ValueError(f'未知的程序: {digest}')
+            response["program"] = digest
+            max_instructions = clamp_limit(request.get("max_instructions"), self.max_instructions, 'max_instructions')
+            timeout = clamp_limit(request.get("timeout"), self.max_timeout, 'timeout')
+
+            # 编译缓存自带锁，编译本身不占用 self.lock
+            compiled, response["cached"] = compile_cached(source, digest)
+            compiled_at = time.perf_counter()
+            compile_ms = (compiled_at - start) * 1000
+
+            response["status"], response["output"], response["error"], _ = \
+                execute(compiled, max_instructions, timeout)
+            run_ms = (time.perf_counter() - compiled_at) * 1000
+        except Exception as e:
+            response["status"] = ERROR
+            response["error"] = str(e)
+        response["timing"] = {
+            "compile_ms": compile_ms, "run_ms": run_ms,
+            "total_ms": (time.perf_counter() - start) * 1000,
+        }
+        return response
+
+    def handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {"id": None, "status": ERROR, "error": f'非法请求: {e}'}
+        if not isinstance(request, dict):
+            return {"id": None, "status": ERROR, "error": f'非法请求: 需要 JSON 对象，收到 {type(request).__name__}'}
+        return self.handle(request)
+
+    def serve_lines(self, lines, write):
+        for line in lines:
+            if line.strip():
+                write(json.dumps(self.handle_line(line), ensure_ascii=False) + '\n')
+
+# --- 传输 ---
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def write(s):
+            self.wfile.write(s.encode('utf-8'))
+            self.wfile.flush()
+        self.server.daemon_impl.serve_lines((l.decode('utf-8') for l in self.rfile), write)
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve_socket(path, daemon=None):
+    if os.path.exists(path):
+        os.unlink(path)
+    server = _Server(path, _Handler)
+    server.daemon_impl = daemon or CillyDaemon()
+    return server
+
+def serve_stdio(daemon=None, stdin=None, stdout=None):
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+
+    def write(s):
+        stdout.write(s)
+        stdout.flush()
+    (daemon or CillyDaemon()).serve_lines(stdin, write)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Cilly 常驻执行服务')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--socket', help='Unix socket 路径')
+    group.add_argument('--stdio', action='store_true', help='从标准输入读取请求')
+    parser.add_argument('--max-instructions', type=int, default=DAEMON_MAX_INSTRUCTIONS,
+                        help='每请求指令预算的上限 (也是默认值)')
+    parser.add_argument('--max-timeout', type=float, default=DAEMON_MAX_TIMEOUT,
+                        help='每请求运行时限的上限，单位秒 (也是默认值)')
+    parser.add_argument('--max-programs', type=int, default=DAEMON_MAX_PROGRAMS,
+                        help='源码表最多保留的程序数')
+    args = parser.parse_args(argv)
+
+    daemon = CillyDaemon(args.max_instructions, args.max_timeout, args.max_programs)
+    if args.stdio:
+        serve_stdio(daemon)
+        return 0
+
+    server = serve_socket(args.socket, daemon)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
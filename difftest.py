@@ -0,0 +1,289 @@
+'''
+差分测试：同一批 Cilly 程序分别用 CillyVM 和 cilly_to_js + Node 运行，比较输出
+
+- VM 一侧沿用 batch.py 的工作进程与编译缓存 (batch.run_chunk)
+- JS 一侧每个任务在工作进程中转译一组程序，只启动一个 node 进程，
+  在其中用 vm.runInNewContext 逐个运行 (每个程序独立的全局环境，带超时)，
+  摊薄 node 的启动开销
+- 两种任务提交到同一个进程池，交错执行
+
+比较前对两边的输出做规范化 (normalize_output)：
+- print 的分隔：VM 每项后跟一个空格，console.log 用空格连接 —— 按空白切分后重新连接
+- 数字：2.0 与 2、1e-07 与 1e-7 —— 能解析为数字的词按同一格式输出
+- True / False / None 与 true / false / null
+两边都出错时只比较状态，不比较错误信息。
+
+两个后端之间已知的差异 (例如负数取模) 会让很多程序一直不一致；
+--baseline 给出之前的报告时，只有新出现或变化了的不一致才算失败，
+用于确认对某个后端的改动没有引入新的差异。
+
+没有 Node 时 (或指定 --stub) 用本地替身代替：替身用 Python 后端 (py_transpiler)
+运行 Cilly 源码，只检验差分流水线本身，不检验 JS 转译器。
+
+用法:
+    python difftest.py <目录|清单文件|.cilly 文件>... [--generate N] [--seed S] [-j 进程数]
+                       [--node node] [--stub] [--max-instructions N] [--timeout 秒] [-o report.json]
+                       [--baseline old.json]
+'''
+
+import sys
+import json
+import time
+import shutil
+import subprocess
+from concurrent.futures import as_completed
+
+from vm import FINISHED, ERROR
+from primitives import PRIMITIVES
+from output import StringSink
+from batch import run_chunk, collect_sources, read_sources, start_pool
+
+DIFF_CHUNK = 32  # 每个任务携带的程序数
+DIFF_MAX_INSTRUCTIONS = 10_000_000
+DIFF_TIMEOUT = 10.0  # 秒，JS 一侧每个程序的超时
+
+# node 一侧的驱动：第一行是配置，之后每行一个 {"id", "js"}，每个程序输出一行结果
+NODE_DRIVER = r'''
+const vm = require('vm');
+const util = require('util');
+const readline = require('readline');
+const rl = readline.createInterface({input: process.stdin, terminal: false});
+let config = null;
+rl.on('line', line => {
+  if (config === null) { config = JSON.parse(line); return; }
+  const job = JSON.parse(line);
+  const out = [];
+  const fmt = v => typeof v === 'string' ? v : util.inspect(v);
+  const noop = () => null;
+  const context = {console: {log: (...args) => out.push(args.map(fmt).join(' ') + '\n')}};
+  context.turtle = new Proxy({}, {get: () => noop});
+  for (const name of config.primitives) context[name] = noop;
+  let status = 'finished', error = null;
+  const start = process.hrtime.bigint();
+  try {
+    vm.runInNewContext(job.js, context, {timeout: config.timeout});
+  } catch (e) {
+    status = e && e.code === 'ERR_SCRIPT_EXECUTION_TIMEOUT' ? 'timeout' : 'error';
+    error = String(e && e.message !== undefined ? e.message : e);
+  }
+  const elapsed = Number(process.hrtime.bigint() - start) / 1e9;
+  process.stdout.write(JSON.stringify({id: job.id, status, output: out.join(''), error, elapsed}) + '\n');
+});
+'''
+
+# --- 输出规范化 ---
+
+WORDS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+def normalize_word(word):
+    if word in WORDS:
+        return WORDS[word]
+    try:
+        x = float(word)
+    except ValueError:
+        return word
+    if x != x:
+        return 'nan'
+    if x in (float('inf'), float('-inf')):
+        return 'inf' if x > 0 else '-inf'
+    if x == int(x) and abs(x) < 2 ** 53:
+        return str(int(x))
+    return repr(x)
+
+def normalize_output(text):
+    return [' '.join(normalize_word(w) for w in line.split()) for line in text.splitlines()]
+
+def first_difference(a, b):
+    # -> (行号, a 的行, b 的行)，行号从 1 开始
+    for i in range(max(len(a), len(b))):
+        x = a[i] if i < len(a) else None
+        y = b[i] if i < len(b) else None
+        if x != y:
+            return i + 1, x, y
+    return None
+
+# --- JS 一侧 (在工作进程中运行) ---
+
+def js_result(path, status, output='', error=None, elapsed=0.0):
+    return {"path": path, "status": status, "output": output, "error": error, "elapsed": elapsed}
+
+def run_js_chunk(chunk, node, timeout=DIFF_TIMEOUT):
+    from lexer import cilly_lexer
+    from cilly_parser_module import cilly_parser
+    from transpiler import cilly_to_js
+    results = {}
+    jobs = []
+    for i, (path, source) in enumerate(chunk):
+        try:
+            js = cilly_to_js(cilly_parser(cilly_lexer(source)))
+        except Exception as e:
+            results[i] = js_result(path, ERROR, error=str(e))
+            continue
+        jobs.append(json.dumps({"id": i, "js": js}))
+    if jobs:
+        config = json.dumps({"timeout": int(timeout * 1000), "primitives": [p["name"] for p in PRIMITIVES]})
+        proc = subprocess.run(node + ['-e', NODE_DRIVER], input='\n'.join([config] + jobs) + '\n',
+                              capture_output=True, text=True, encoding='utf-8',
+                              timeout=timeout * len(jobs) + 30)
+        for line in proc.stdout.splitlines():
+            r = json.loads(line)
+            results[r["id"]] = js_result(chunk[r["id"]][0], r["status"], r["output"], r["error"], r["elapsed"])
+        for i, (path, _) in enumerate(chunk):
+            if i not in results:  # node 异常退出
+                results[i] = js_result(path, ERROR, error=proc.stderr.strip()[-500:] or f'node 退出码 {proc.returncode}')
+    return [results[i] for i in range(len(chunk))]
+
+def run_stub_chunk(chunk, node=None, timeout=None):
+    # 没有 Node 时的替身：用 Python 后端运行 Cilly 源码
+    from lexer import cilly_lexer
+    from cilly_parser_module import cilly_parser
+    from py_transpiler import cilly_py_run
+    primitives = {p["name"]: (lambda *args: None) for p in PRIMITIVES}
+    results = []
+    for path, source in chunk:
+        output = StringSink()
+        start = time.perf_counter()
+        try:
+            cilly_py_run(cilly_parser(cilly_lexer(source)), primitives, output=output)
+            status, error = FINISHED, None
+        except Exception as e:
+            status, error = ERROR, str(e)
+        results.append(js_result(path, status, output.getvalue(), error, time.perf_counter() - start))
+    return results
+
+def find_node(node=None):
+    # -> node 命令 (列表)，找不到时为 None
+    cmd = node or 'node'
+    path = shutil.which(cmd)
+    return [path] if path else None
+
+# --- 比较 ---
+
+def compare_results(vm_result, js_result):
+    # -> None 表示一致，否则为差异说明
+    vm_ok = vm_result["status"] == FINISHED
+    js_ok = js_result["status"] == FINISHED
+    if not vm_ok and not js_ok:
+        return None
+    if vm_ok != js_ok:
+        return {"kind": "status", "vm": vm_result["status"], "js": js_result["status"],
+                "vm_error": vm_result["error"], "js_error": js_result["error"]}
+    diff = first_difference(normalize_output(vm_result["output"]), normalize_output(js_result["output"]))
+    if diff is None:
+        return None
+    line, vm_line, js_line = diff
+    return {"kind": "output", "line": line, "vm": vm_line, "js": js_line}
+
+def run_diff(sources, pool, node=None, max_instructions=DIFF_MAX_INSTRUCTIONS,
+             timeout=DIFF_TIMEOUT, chunk_size=DIFF_CHUNK):
+    # sources: [(path, source)]；node 为 None 时使用替身。返回报告 (dict)
+    js_backend = 'js' if node is not None else 'js-stub'
+    js_run = run_js_chunk if node is not None else run_stub_chunk
+    chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), chunk_size)]
+    start = time.perf_counter()
+    futures = {}
+    for chunk in chunks:
+        futures[pool.submit(run_chunk, chunk, max_instructions)] = 'vm'
+        futures[pool.submit(js_run, chunk, node, timeout)] = js_backend
+    results = {'vm': {}, js_backend: {}}
+    backends = {name: {"wall": 0.0, "elapsed": 0.0, "finished": 0, "errors": 0} for name in results}
+    for future in as_completed(futures):
+        name = futures[future]
+        stats = backends[name]
+        for r in future.result():
+            results[name][r["path"]] = r
+            stats["elapsed"] += r["elapsed"]
+            if r["status"] == FINISHED:
+                stats["finished"] += 1
+            else:
+                stats["errors"] += 1
+        stats["wall"] = time.perf_counter() - start
+    mismatches = []
+    for path, _ in sources:
+        diff = compare_results(results['vm'][path], results[js_backend][path])
+        if diff is not None:
+            diff["path"] = path
+            mismatches.append(diff)
+    wall = time.perf_counter() - start
+    return {
+        "programs": len(sources),
+        "matched": len(sources) - len(mismatches),
+        "mismatched": len(mismatches),
+        "wall": wall,
+        "programs_per_minute": len(sources) / wall * 60 if wall > 0 else 0.0,
+        "backends": backends,
+        "mismatches": mismatches,
+    }
+
+def new_mismatches(report, baseline):
+    # 相对基线报告新出现或内容变化的不一致
+    old = {}
+    for diff in baseline["mismatches"]:
+        old[diff["path"]] = diff
+    return [diff for diff in report["mismatches"] if old.get(diff["path"]) != diff]
+
+def generated_sources(count, seed=0, **knobs):
+    from benchmarks.generator import generate
+    return [(f'<generated {seed + i}>', generate(seed + i, **knobs)) for i in range(count)]
+
+def format_report(report, show=10):
+    lines = [f'{report["programs"]} 个程序: {report["matched"]} 一致, {report["mismatched"]} 不一致, '
+             f'{report["wall"]:.2f} 秒 ({report["programs_per_minute"]:.0f} 个/分钟)']
+    for name, stats in report["backends"].items():
+        lines.append(f'  {name:8} 完成 {stats["finished"]:6}  出错 {stats["errors"]:6}  '
+                     f'墙钟 {stats["wall"]:8.2f} 秒  累计 {stats["elapsed"]:8.2f} 秒')
+    for diff in report["mismatches"][:show]:
+        if diff["kind"] == 'status':
+            lines.append(f'  {diff["path"]}: 状态 vm={diff["vm"]} js={diff["js"]} '
+                         f'({diff["vm_error"] or diff["js_error"]})')
+        else:
+            lines.append(f'  {diff["path"]}:{diff["line"]}: vm={diff["vm"]!r} js={diff["js"]!r}')
+    if report["mismatched"] > show:
+        lines.append(f'  ... 另有 {report["mismatched"] - show} 个')
+    return '\n'.join(lines) + '\n'
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='VM 与 JavaScript 后端的差分测试')
+    parser.add_argument('paths', nargs='*', help='目录、清单文件或 .cilly 文件')
+    parser.add_argument('--generate', type=int, default=0, help='另外用 benchmarks.generator 生成 N 个程序')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--statements', type=int, default=20, help='生成程序的顶层语句数')
+    parser.add_argument('--functions', type=int, default=3, help='生成程序的函数个数')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--chunk', type=int, default=DIFF_CHUNK)
+    parser.add_argument('--node', default=None, help='node 可执行文件，默认在 PATH 中查找')
+    parser.add_argument('--stub', action='store_true', help='不用 Node，使用本地替身')
+    parser.add_argument('--max-instructions', type=int, default=DIFF_MAX_INSTRUCTIONS)
+    parser.add_argument('--timeout', type=float, default=DIFF_TIMEOUT, help='JS 每个程序的超时 (秒)')
+    parser.add_argument('--show', type=int, default=10, help='最多列出的不一致程序数')
+    parser.add_argument('-o', '--output', default=None, help='报告 JSON 文件')
+    parser.add_argument('--baseline', default=None, help='之前的报告，只把新的不一致算作失败')
+    args = parser.parse_args(argv)
+
+    sources = read_sources(collect_sources(args.paths))
+    if args.generate:
+        sources += generated_sources(args.generate, args.seed, statements=args.statements,
+                                     functions=args.functions)
+    if not sources:
+        parser.error('没有要运行的程序')
+    node = None if args.stub else find_node(args.node)
+    if node is None and not args.stub:
+        sys.stderr.write('找不到 node，使用本地替身 (Python 后端)\n')
+    with start_pool(args.workers) as pool:
+        report = run_diff(sources, pool, node, args.max_instructions, args.timeout, args.chunk)
+    sys.stdout.write(format_report(report, args.show))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            fresh = new_mismatches(report, json.load(f))
+        sys.stdout.write(f'相对基线新增 {len(fresh)} 个不一致\n')
+        for diff in fresh[:args.show]:
+            sys.stdout.write(f'  {diff["path"]}\n')
+        return 1 if fresh else 0
+    return 1 if report["mismatched"] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
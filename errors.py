@@ -0,0 +1,16 @@
+'''
+Cilly 工具链公共错误函数
+'''
+
+def error(src, msg):
+    raise Exception(f'{src} : {msg}')
+
+def error_text(e):
+    # 报告错误用的消息。本工具链的错误已在消息末尾带有源码行；其它 Python 异常
+    # (如 ZeroDivisionError) 保持原类型，源码行记在 cilly_line 上，这里补到消息末尾
+    line = getattr(e, 'cilly_line', None)
+    if line is None:
+        return str(e)
+    return f'{e} (第 {line} 行)'
+
+__all__ = ['error', 'error_text']
@@ -0,0 +1,78 @@
+'''
+Cilly 示例程序 (命令行测试、GUI 测试列表与后端对比测试共用)
+
+只包含源码文本，不依赖任何 GUI 工具包。
+'''
+
+tests = {
+    "Basic Arithmetic": '''
+print(1 + 2 * 3);
+print(4 * 5);
+''',
+    "Variable Scoping": '''
+var x1 = 100;
+{
+    var x1 = 200;
+    {
+        var x1 = 300;
+        print("inner x1", x1);
+    }
+    print("middle x1", x1);
+}
+print("outer x1", x1);
+''',
+    "Conditional Statements": '''
+if(1 > 2)
+    print(3);
+else
+    print(4);
+
+if(1 > 2 && 5 > 4)
+    print(30);
+else
+    print(42);
+''',
+    "Variable Name Display": '''
+var a = 100;
+var b = 200;
+var c = a + b * 5;
+print(c);
+''',
+    "Mutual Recursion": '''
+define odd = fun(n){
+  if(n == 0)
+    return false;
+  else
+   return even(n-1);
+};
+define even = fun(n) {
+ if(n==0)
+   return true;
+ else
+   return odd(n-1);
+};
+
+print("even(3)=", even(3));
+print("odd(3)=", odd(3));
+''',
+    "Fern Turtle Graphics": '''
+define fern = fun(len) {
+    if(len > 5){
+        forward(len);
+        right(10);
+        fern(len - 10);
+        left(40);
+        fern(len - 10);
+        right(30);
+        backward(len);
+    }
+};
+
+pencolor("green");
+left(90);
+penup();
+backward(200);
+pendown();
+fern(100);
+'''
+}
@@ -6,7 +6,7 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QH
                              QSplitter, QTextBrowser, QFileDialog, QMessageBox, QGraphicsView, QGraphicsScene,
                              QTextEdit, QLabel, QFrame)
 from PyQt5.QtCore import QObject, QThread, pyqtSignal, Qt, QSize, QRect, QPointF, QLineF, QTimer, QProcess
-from PyQt5.QtGui import QFont, QPainter, QColor, QTextFormat, QPolygonF, QBrush, QPen
+from PyQt5.QtGui import QFont, QPainter, QColor, QTextFormat, QPolygonF, QBrush, QPen, QTextCursor
 from math import sin, cos
 import subprocess
 import tempfile
@@ -18,7 +18,13 @@ from cilly_parser_module import cilly_parser
 from compile import cilly_vm_compiler
 from vm import CillyVM, cilly_vm_dis # 导入 CillyVM 类
 from transpiler import cilly_to_js # 导入 Transpiler
-from yufa import tests # 导入测试用例
+from py_transpiler import cilly_to_py, load_py_module, run_py_module, raise_recursion_limit # 导入 Python 后端
+from primitives import PRIMITIVES
+from command_buffer import CommandBuffer
+from providers import load_provider
+from output import StreamingSink
+from errors import error_text
+from examples import tests # 导入测试用例
 
 class CompilerWorker(QObject):
     """
@@ -28,34 +34,19 @@ class CompilerWorker(QObject):
     results_ready = pyqtSignal(dict)
     error_occurred = pyqtSignal(str)
 
-    # 为 turtle 操作定义信号
-    forward_signal = pyqtSignal(float)
-    backward_signal = pyqtSignal(float)
-    left_signal = pyqtSignal(float)
-    right_signal = pyqtSignal(float)
-    penup_signal = pyqtSignal()
-    pendown_signal = pyqtSignal()
-    pencolor_signal = pyqtSignal(str)
-    pensize_signal = pyqtSignal(int)
-    reset_signal = pyqtSignal()
-    speed_signal = pyqtSignal(int) # 尽管是 no-op, 但为了完整性
-
-    def __init__(self, code):
+    # turtle 操作按批发送：每个信号携带一个 CommandBatch，而不是每次调用一个事件
+    batch_signal = pyqtSignal(object)
+    # 程序输出边运行边分块推送，不再替换进程全局的 sys.stdout
+    output_chunk = pyqtSignal(str)
+
+    def __init__(self, code, backend='vm'):
         super().__init__()
         self.code = code
-        # 将信号映射到名称，以便 VM 可以通过名称查找它们
-        self.signals = {
-            "forward": self.forward_signal,
-            "backward": self.backward_signal,
-            "left": self.left_signal,
-            "right": self.right_signal,
-            "penup": self.penup_signal,
-            "pendown": self.pendown_signal,
-            "pencolor": self.pencolor_signal,
-            "pensize": self.pensize_signal,
-            "reset": self.reset_signal,
-            "speed": self.speed_signal,
-        }
+        self.backend = backend # 'vm' 为字节码虚拟机，'py' 为 Python 后端
+        # VM 把 primitive 调用写入缓冲区，缓冲区按数量或时间整批刷新到画布；
+        # 运行期间由 ticking() 的后台线程按时间刷新，长时间不画图时已画的部分也能及时显示
+        self.command_buffer = CommandBuffer(self.batch_signal.emit)
+        self.output = StreamingSink(self.output_chunk.emit)
 
     def run(self):
         """
@@ -68,39 +59,47 @@ class CompilerWorker(QObject):
             # 2. 语法分析
             ast = cilly_parser(tokens)
 
-            # 3. 编译（传入 primitive 的名字，这些名字将用于在 VM 中查找信号）
-            primitive_names = list(self.signals.keys())
+            primitive_names = [prim["name"] for prim in PRIMITIVES]
+            primitives = load_provider('qt', command_buffer=self.command_buffer)
+
+            if self.backend == 'py':
+                # 3. 转换为 Python 并作为模块执行，输出写入输出端
+                py_source = cilly_to_py(ast, primitive_names)
+                with self.command_buffer.ticking():
+                    run_py_module(load_py_module(py_source, primitives, output=self.output))
+                self.results_ready.emit({
+                    "tokens": tokens,
+                    "ast": ast,
+                    "python": py_source
+                })
+                return
+
+            # 3. 编译（传入 primitive 的名字，编译器将其解析为注册表中的编号）
             bytecode, consts, scopes, functions = cilly_vm_compiler(ast, primitive_names)
 
             # 4. 反汇编
             disassembled_code = cilly_vm_dis(bytecode, consts, scopes)
 
             # 5. 虚拟机执行
-            # 重定向 stdout 以捕获输出
-            from io import StringIO
-            old_stdout = sys.stdout
-            redirected_output = sys.stdout = StringIO()
-
-            # 实例化 VM，传入 signals 字典而不是原始函数
-            vm_instance = CillyVM(bytecode, consts, scopes, functions, signals=self.signals)
-            vm_instance.run()
-
-            sys.stdout = old_stdout
-            vm_output = redirected_output.getvalue()
+            # 实例化 VM，primitive 调用写入命令缓冲区，输出经由 output_chunk 推送
+            vm_instance = CillyVM(bytecode, consts, scopes, functions, primitives=primitives, output=self.output)
+            with self.command_buffer.ticking():
+                vm_instance.run()
 
             # 准备结果
             results = {
                 "tokens": tokens,
                 "ast": ast,
-                "bytecode": disassembled_code,
-                "output": vm_output
+                "bytecode": disassembled_code
             }
             self.results_ready.emit(results)
 
         except Exception as e:
             import traceback
-            self.error_occurred.emit(f"发生错误:\n{traceback.format_exc()}")
+            self.error_occurred.emit(f"发生错误: {error_text(e)}\n\n{traceback.format_exc()}")
         finally:
+            # 出错时也把出错前已缓冲的绘图命令送到画布
+            self.command_buffer.flush()
             self.finished.emit()
 
 
@@ -205,7 +204,9 @@ class CillyGUI(QMainWindow):
         self.transpile_button = QPushButton("转译为 JS")
         self.run_js_button = QPushButton("运行 JavaScript")
         self.compare_button = QPushButton("对比结果")
+        self.run_py_button = QPushButton("运行 Python")
         self.button_layout.addWidget(self.run_button)
+        self.button_layout.addWidget(self.run_py_button)
         self.button_layout.addWidget(self.transpile_button)
         self.button_layout.addWidget(self.run_js_button)
         self.button_layout.addWidget(self.compare_button)
@@ -220,12 +221,14 @@ class CillyGUI(QMainWindow):
         self.bytecode_view = QTextBrowser()
         self.js_view = QTextBrowser() # JS 代码视图
         self.js_output_view = QTextBrowser() # JS 输出视图
+        self.py_view = QTextBrowser() # Python 代码视图
         self.compare_view = self.create_compare_view() # 对比视图
 
         self.tabs.addTab(self.code_editor, "代码编辑器")
         self.tabs.addTab(self.output_console, "Cilly 输出")
         self.tabs.addTab(self.js_view, "JavaScript 代码")
         self.tabs.addTab(self.js_output_view, "JavaScript 输出")
+        self.tabs.addTab(self.py_view, "Python 代码")
         self.tabs.addTab(self.compare_view, "对比结果")
         self.tabs.addTab(self.token_view, "词法单元")
         self.tabs.addTab(self.ast_view, "抽象语法树")
@@ -290,7 +293,7 @@ class CillyGUI(QMainWindow):
         return compare_widget
 
     def populate_test_cases(self):
-        """从 yufa.py 加载测试用例到列表中。"""
+        """从 examples.py 加载测试用例到列表中。"""
         for test_name_en in tests:
             # 使用翻译后的名称添加到列表
             test_name_cn = self.test_case_translation.get(test_name_en, test_name_en)
@@ -299,6 +302,7 @@ class CillyGUI(QMainWindow):
     def connect_signals(self):
         """连接所有信号和槽。"""
         self.run_button.clicked.connect(self.run_code)
+        self.run_py_button.clicked.connect(self.run_python)
         self.transpile_button.clicked.connect(self.transpile_code)
         self.run_js_button.clicked.connect(self.run_javascript)
         self.compare_button.clicked.connect(self.compare_results)
@@ -390,13 +394,23 @@ class CillyGUI(QMainWindow):
 
     def run_code(self):
         """触发编译和执行流程。"""
+        self.start_run('vm')
+
+    def run_python(self):
+        """使用 Python 后端运行。"""
+        self.start_run('py')
+
+    def start_run(self, backend):
+        """在工作线程中用指定后端运行编辑器中的代码。"""
         code = self.code_editor.toPlainText()
         if not code.strip():
             QMessageBox.warning(self, "警告", "代码编辑器为空。")
             return
 
         self.run_button.setEnabled(False)
+        self.run_py_button.setEnabled(False)
         self.output_console.clear()
+        self.cilly_output = ""
         self.token_view.clear()
         self.ast_view.clear()
         self.bytecode_view.clear()
@@ -413,47 +427,48 @@ class CillyGUI(QMainWindow):
 
         # 创建并启动工作线程
         self.thread = QThread()
-        self.worker = CompilerWorker(code)
+        self.worker = CompilerWorker(code, backend)
         self.worker.moveToThread(self.thread)
 
         # 连接信号到槽
         if any(keyword in code_text for keyword in turtle_keywords):
-            self.worker.forward_signal.connect(self.drawing_view.forward)
-            self.worker.backward_signal.connect(self.drawing_view.backward)
-            self.worker.left_signal.connect(self.drawing_view.left)
-            self.worker.right_signal.connect(self.drawing_view.right)
-            self.worker.penup_signal.connect(self.drawing_view.penup)
-            self.worker.pendown_signal.connect(self.drawing_view.pendown)
-            self.worker.pencolor_signal.connect(self.drawing_view.pencolor)
-            self.worker.pensize_signal.connect(self.drawing_view.pensize)
-            self.worker.reset_signal.connect(self.drawing_view.setup_turtle)
-            # self.worker.speed_signal.connect(...) # speed is a no-op
+            self.worker.batch_signal.connect(self.drawing_view.apply_batch)
 
         self.thread.started.connect(self.worker.run)
         self.worker.finished.connect(self.thread.quit)
         self.worker.finished.connect(self.worker.deleteLater)
         self.thread.finished.connect(self.thread.deleteLater)
+        self.worker.output_chunk.connect(self.on_output_chunk)
         self.worker.results_ready.connect(self.on_compilation_finished)
         self.worker.error_occurred.connect(self.on_compilation_error)
 
         self.thread.start()
 
+    def on_output_chunk(self, chunk):
+        """追加运行中推送过来的一段程序输出。"""
+        self.cilly_output += chunk  # 保存 Cilly 输出用于对比
+        self.output_console.moveCursor(QTextCursor.End)
+        self.output_console.insertPlainText(chunk)
+
     def on_compilation_finished(self, results):
         """当编译成功时更新 UI。"""
         self.token_view.setText(pprint.pformat(results["tokens"]))
         self.ast_view.setText(pprint.pformat(results["ast"]))
-        self.bytecode_view.setText(results["bytecode"])
-        self.cilly_output = results["output"]  # 保存 Cilly 输出用于对比
-        self.output_console.setText(self.cilly_output)
+        if "python" in results:
+            self.py_view.setText(results["python"])
+        else:
+            self.bytecode_view.setText(results["bytecode"])
         self.tabs.setCurrentWidget(self.output_console)
         self.run_button.setEnabled(True)
+        self.run_py_button.setEnabled(True)
 
     def on_compilation_error(self, error_message):
         """当编译出错时更新 UI。"""
-        self.cilly_output = error_message  # 保存错误信息用于对比
-        self.output_console.setText(error_message)
+        self.cilly_output += error_message  # 保留出错前已经输出的内容，保存用于对比
+        self.output_console.setText(self.cilly_output)
         self.tabs.setCurrentWidget(self.output_console)
         self.run_button.setEnabled(True)
+        self.run_py_button.setEnabled(True)
 
 
 class CodeEditor(QPlainTextEdit):
@@ -554,7 +569,9 @@ class TurtleCanvas(QGraphicsView):
         self.scene.clear()
         self.animation_queue.clear()
         self.animation_timer.stop()
+        self.create_turtle()
 
+    def create_turtle(self):
         # 创建一个三角形代表 turtle
         self.turtle = self.scene.addPolygon(
             QPolygonF([QPointF(0, -10), QPointF(5, 5), QPointF(-5, 5)]),
@@ -580,83 +597,94 @@ class TurtleCanvas(QGraphicsView):
         else:
             self.animation_timer.stop()
 
-    def forward(self, distance):
-        if not self.turtle: return
-
+    def enqueue(self, action):
         # 添加到动画队列而不是立即执行
-        def do_forward():
-            rad = self.turtle.rotation() * 3.14159 / 180.0
-            start_pos = self.turtle.pos()
-            dx = -distance * sin(rad)
-            dy = -distance * cos(rad)
-            end_pos = QPointF(start_pos.x() + dx, start_pos.y() + dy)
-            if self.pen_is_down:
-                pen = QPen(self.pen_color, self.pen_width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
-                self.scene.addLine(QLineF(start_pos, end_pos), pen)
-            self.turtle.setPos(end_pos)
-
-        self.animation_queue.append(do_forward)
+        self.animation_queue.append(action)
         if not self.animation_timer.isActive():
             self.animation_timer.start(self.drawing_speed)
 
+    # --- 立即执行的绘图操作 ---
+
+    def do_forward(self, distance):
+        rad = self.turtle.rotation() * 3.14159 / 180.0
+        start_pos = self.turtle.pos()
+        dx = -distance * sin(rad)
+        dy = -distance * cos(rad)
+        end_pos = QPointF(start_pos.x() + dx, start_pos.y() + dy)
+        if self.pen_is_down:
+            pen = QPen(self.pen_color, self.pen_width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+            self.scene.addLine(QLineF(start_pos, end_pos), pen)
+        self.turtle.setPos(end_pos)
+
+    def do_turn(self, angle):
+        self.turtle.setRotation(self.turtle.rotation() + angle)
+
+    def do_pencolor(self, color_name):
+        try:
+            self.pen_color = QColor(color_name)
+        except:
+            print(f"警告: 无效的颜色名称 '{color_name}'")
+            self.pen_color = QColor("black") # Fallback to black
+
+    def do_pensize(self, width):
+        self.pen_width = int(width)
+
+    def do_reset(self):
+        # 批内的 reset 只清空画面，不丢弃队列中后续的批次
+        self.scene.clear()
+        self.create_turtle()
+
+    # --- 批量命令 ---
+
+    def apply_batch(self, batch):
+        # 一次槽调用接收整批命令，整批作为一个动画步骤绘制
+        if not self.turtle: return
+        self.enqueue(lambda: self.run_batch(batch))
+
+    def run_batch(self, batch):
+        handlers = {
+            "forward": self.do_forward,
+            "backward": lambda distance: self.do_forward(-distance),
+            "left": lambda angle: self.do_turn(-angle),
+            "right": self.do_turn,
+            "penup": lambda: setattr(self, 'pen_is_down', False),
+            "pendown": lambda: setattr(self, 'pen_is_down', True),
+            "pencolor": self.do_pencolor,
+            "pensize": self.do_pensize,
+            "reset": self.do_reset,
+            "speed": lambda v: None, # speed is a no-op
+        }
+        for name, args in batch:
+            handlers[name](*args)
+
+    # --- 单条命令 (逐条动画) ---
+
+    def forward(self, distance):
+        if not self.turtle: return
+        self.enqueue(lambda: self.do_forward(distance))
+
     def backward(self, distance):
         self.forward(-distance)
 
     def left(self, angle):
         if not self.turtle: return
-
-        def do_left():
-            self.turtle.setRotation(self.turtle.rotation() - angle)
-
-        self.animation_queue.append(do_left)
-        if not self.animation_timer.isActive():
-            self.animation_timer.start(self.drawing_speed)
+        self.enqueue(lambda: self.do_turn(-angle))
 
     def right(self, angle):
         if not self.turtle: return
-
-        def do_right():
-            self.turtle.setRotation(self.turtle.rotation() + angle)
-
-        self.animation_queue.append(do_right)
-        if not self.animation_timer.isActive():
-            self.animation_timer.start(self.drawing_speed)
+        self.enqueue(lambda: self.do_turn(angle))
 
     def penup(self):
-        def do_penup():
-            self.pen_is_down = False
-
-        self.animation_queue.append(do_penup)
-        if not self.animation_timer.isActive():
-            self.animation_timer.start(self.drawing_speed)
+        self.enqueue(lambda: setattr(self, 'pen_is_down', False))
 
     def pendown(self):
-        def do_pendown():
-            self.pen_is_down = True
-
-        self.animation_queue.append(do_pendown)
-        if not self.animation_timer.isActive():
-            self.animation_timer.start(self.drawing_speed)
+        self.enqueue(lambda: setattr(self, 'pen_is_down', True))
 
     def pencolor(self, color_name):
-        def do_pencolor():
-            try:
-                self.pen_color = QColor(color_name)
-            except:
-                print(f"警告: 无效的颜色名称 '{color_name}'")
-                self.pen_color = QColor("black") # Fallback to black
-
-        self.animation_queue.append(do_pencolor)
-        if not self.animation_timer.isActive():
-            self.animation_timer.start(self.drawing_speed)
+        self.enqueue(lambda: self.do_pencolor(color_name))
 
     def pensize(self, width):
-        def do_pensize():
-            self.pen_width = int(width)
-
-        self.animation_queue.append(do_pensize)
-        if not self.animation_timer.isActive():
-            self.animation_timer.start(self.drawing_speed)
+        self.enqueue(lambda: self.do_pensize(width))
 
     def reset(self):
         # This is connected to the reset_signal, which calls setup_turtle
@@ -664,6 +692,8 @@ class TurtleCanvas(QGraphicsView):
 
 
 def main():
+    # Python 后端在 CompilerWorker 线程中运行，递归限制只能在主线程中调高
+    raise_recursion_limit()
     app = QApplication(sys.argv)
     gui = CillyGUI()
     gui.show()
@@ -0,0 +1,322 @@
+'''
+Cilly 热点函数 JIT
+
+CillyVM 对每个函数计数调用次数 (call_counts)，达到阈值后把该函数的字节码
+(entry_point 到函数末尾) 翻译成 Python 源码，用 compile() 编译并缓存，
+之后的 CALL 直接调用生成的 Python 函数。
+
+翻译按基本块进行：操作数栈的每个位置映射为局部变量 s0, s1 ...，
+函数内每层作用域的变量映射为 v<层>_<下标>。遇到不支持的情况
+(未知 opcode、访问函数外层作用域、跳出函数体、栈深度不一致等)
+放弃编译，该函数继续由解释器执行。
+'''
+
+from primitives import PRIMITIVES, RETURNS_VALUE
+from vm import (
+    TRUE, FALSE, NULL, OPS_NAME, mk_value,
+    LOAD_CONST, LOAD_NULL, LOAD_TRUE, LOAD_FALSE, LOAD_VAR, STORE_VAR,
+    PRINT_ITEM, PRINT_NEWLINE, JMP, JMP_TRUE, JMP_FALSE, POP,
+    ENTER_SCOPE, LEAVE_SCOPE, CALL, RETURN, RETURN_VALUE, CALL_PRIMITIVE,
+    UNARY_NEG, UNARY_NOT,
+    BINARY_ADD, BINARY_SUB, BINARY_MUL, BINARY_DIV, BINARY_MOD, BINARY_POW,
+    BINARY_EQ, BINARY_NE, BINARY_LT, BINARY_GE, BINARY_CONST, LOAD_VAR2
+)
+
+JIT_THRESHOLD = 50  # 调用多少次后编译
+JIT_MAX_DEPTH = 150  # JIT 代码之间互相调用的最大 Python 递归深度，超过后交回解释器
+
+ARITH_OPS = {
+    BINARY_ADD: '+', BINARY_SUB: '-', BINARY_MUL: '*',
+    BINARY_DIV: '/', BINARY_MOD: '%', BINARY_POW: '**',
+}
+
+COMPARE_OPS = {
+    BINARY_EQ: '==', BINARY_NE: '!=', BINARY_LT: '<', BINARY_GE: '>=',
+}
+
+BRANCH_OPS = (JMP, JMP_TRUE, JMP_FALSE)
+TERMINATORS = (JMP, RETURN, RETURN_VALUE)
+
+class Unsupported(Exception):
+    pass
+
+class CillyJIT:
+    def __init__(self, vm, threshold=None):
+        self.vm = vm
+        self.threshold = JIT_THRESHOLD if threshold is None else threshold
+        self.compiled = [None] * len(vm.functions)  # func_id -> Python 函数
+        self.failed = set()  # 无法编译的函数
+        self.sources = {}  # func_id -> 生成的源码，便于调试
+        self.depth = [0]
+
+    # --- VM 接口 ---
+
+    def call_proc(self, pc):
+        vm = self.vm
+        func_id = vm.code[pc + 1]
+        f = self.compiled[func_id] if func_id < len(self.compiled) else None
+        if f is None:
+            vm.call_counts[func_id] += 1
+            if vm.call_counts[func_id] >= self.threshold and func_id not in self.failed:
+                f = self.compile_function(func_id)
+        if f is None or self.depth[0] >= JIT_MAX_DEPTH:
+            return vm.call_proc(pc)
+
+        nparams = len(vm.functions[func_id].get("params", []))
+        args = [vm.pop() for _ in range(nparams)]
+        vm.push(f(*args))
+        return pc + 2
+
+    def call_interp(self, func_id, args):
+        self.vm.call_counts[func_id] += 1
+        return self.vm.call_function(func_id, args)
+
+    def compile_function(self, func_id):
+        try:
+            src = self.translate(func_id)
+        except Unsupported:
+            self.failed.add(func_id)
+            return None
+
+        env = {
+            'consts': self.vm.consts, 'NULL': NULL, 'TRUE': TRUE, 'FALSE': FALSE,
+            'JT': self.compiled, 'CALLI': self.call_interp, 'DEPTH': self.depth,
+            'MAXD': JIT_MAX_DEPTH, 'VM': self.vm,
+            'PT': self.vm.prim_table, 'MKV': mk_value, 'WRITE': self.vm.write,
+        }
+        name = f'<cilly jit {self.vm.functions[func_id]["name"]}>'
+        exec(compile(src, name, 'exec'), env)
+        f = env['make']()
+        self.sources[func_id] = src
+        self.compiled[func_id] = f
+        return f
+
+    # --- 翻译 ---
+
+    def function_range(self, func_id):
+        code = self.vm.code
+        entry = self.vm.functions[func_id]["entry_point"]
+        # 编译器在函数体前放一条 JMP 跳过函数体，其目标即函数末尾
+        if entry < 2 or code[entry - 2] != JMP:
+            raise Unsupported()
+        return entry, code[entry - 1]
+
+    def decode(self, start, end):
+        code = self.vm.code
+        instrs = {}
+        pc = start
+        while pc < end:
+            opcode = code[pc]
+            if opcode not in OPS_NAME:
+                raise Unsupported()
+            size = OPS_NAME[opcode][1]
+            instrs[pc] = (opcode, tuple(code[pc + 1:pc + size]), pc + size)
+            pc += size
+        return instrs
+
+    def analyze(self, entry, end, instrs):
+        # 从入口出发求每个基本块入口处的 (栈深度, 作用域深度)
+        blocks = {}
+        work = [(entry, 0, 1)]
+        while work:
+            start, sp, depth = work.pop()
+            if start in blocks:
+                if blocks[start] != (sp, depth):
+                    raise Unsupported()
+                continue
+            if start not in instrs:
+                raise Unsupported()  # 跳出函数体或跳到指令中间
+            blocks[start] = (sp, depth)
+
+            pc = start
+            while True:
+                opcode, operands, nxt = instrs[pc]
+                sp, depth = self.effect(opcode, operands, sp, depth)
+                if sp < 0 or depth < 1:
+                    raise Unsupported()
+                if opcode in BRANCH_OPS:
+                    work.append((operands[0], sp, depth))
+                if opcode in TERMINATORS:
+                    break
+                if opcode in (JMP_TRUE, JMP_FALSE):
+                    work.append((nxt, sp, depth))
+                    break
+                if nxt in self.targets:
+                    work.append((nxt, sp, depth))
+                    break
+                pc = nxt
+                if pc not in instrs:
+                    raise Unsupported()  # 从函数末尾落出
+        return blocks
+
+    def effect(self, opcode, operands, sp, depth):
+        if opcode in (LOAD_CONST, LOAD_NULL, LOAD_TRUE, LOAD_FALSE, LOAD_VAR):
+            return sp + 1, depth
+        if opcode in (STORE_VAR, PRINT_ITEM, POP, JMP_TRUE, JMP_FALSE, RETURN_VALUE):
+            return sp - 1, depth
+        if opcode == ENTER_SCOPE:
+            return sp, depth + 1
+        if opcode == LEAVE_SCOPE:
+            return sp, depth - 1
+        if opcode == CALL:
+            return sp - self.nparams(operands[0]) + 1, depth
+        if opcode == CALL_PRIMITIVE:
+            return sp - operands[1] + 1, depth
+        if opcode in ARITH_OPS or opcode in COMPARE_OPS:
+            return sp - 1, depth
+        if opcode in (UNARY_NEG, UNARY_NOT, PRINT_NEWLINE, JMP, RETURN, BINARY_CONST):
+            return sp, depth
+        if opcode == LOAD_VAR2:
+            return sp + 2, depth
+        raise Unsupported()
+
+    def nparams(self, func_id):
+        if func_id >= len(self.vm.functions):
+            raise Unsupported()
+        return len(self.vm.functions[func_id].get("params", []))
+
+    def translate(self, func_id):
+        entry, end = self.function_range(func_id)
+        instrs = self.decode(entry, end)
+
+        self.targets = set()
+        for opcode, operands, _ in instrs.values():
+            if opcode in BRANCH_OPS:
+                self.targets.add(operands[0])
+        blocks = self.analyze(entry, end, instrs)
+        self.targets.update(blocks)
+
+        nparams = self.nparams(func_id)
+        params = [f'p{i}' for i in range(nparams)]
+        lines = [
+            'def make():',
+            f'    def cilly_jit_{func_id}({", ".join(params)}):',
+            '        DEPTH[0] += 1',
+            '        try:',  # 出错 (例如除零) 时也要恢复深度，否则之后的调用都会退回解释器
+        ]
+        for i in range(nparams):
+            lines.append(f'            v0_{i} = p{i}')
+        lines.append(f'            bb = {entry}')
+        lines.append('            while True:')
+
+        for n, start in enumerate(sorted(blocks)):
+            lines.append(f'                {"if" if n == 0 else "elif"} bb == {start}:')
+            body = self.translate_block(start, blocks[start], instrs)
+            lines.extend('                    ' + l for l in body)
+        lines.append('        finally:')
+        lines.append('            DEPTH[0] -= 1')
+        lines.append(f'    return cilly_jit_{func_id}')
+        return '\n'.join(lines) + '\n'
+
+    def translate_block(self, start, state, instrs):
+        sp, depth = state
+        out = []
+        pc = start
+
+        def s(i):
+            return f's{i}'
+
+        while True:
+            opcode, operands, nxt = instrs[pc]
+
+            if opcode == LOAD_CONST:
+                out.append(f'{s(sp)} = consts[{operands[0]}]')
+                sp += 1
+            elif opcode in (LOAD_NULL, LOAD_TRUE, LOAD_FALSE):
+                out.append(f'{s(sp)} = {"NULL" if opcode == LOAD_NULL else "TRUE" if opcode == LOAD_TRUE else "FALSE"}')
+                sp += 1
+            elif opcode in (LOAD_VAR, STORE_VAR):
+                scope_i, index = operands
+                level = depth - 1 - scope_i
+                if level < 0:
+                    raise Unsupported()  # 函数外层 (调用者) 的作用域
+                if opcode == LOAD_VAR:
+                    out.append(f'{s(sp)} = v{level}_{index}')
+                    sp += 1
+                else:
+                    sp -= 1
+                    out.append(f'v{level}_{index} = {s(sp)}')
+            elif opcode == LOAD_VAR2:
+                for scope_i, index in (operands[:2], operands[2:]):
+                    level = depth - 1 - scope_i
+                    if level < 0:
+                        raise Unsupported()
+                    out.append(f'{s(sp)} = v{level}_{index}')
+                    sp += 1
+            elif opcode == ENTER_SCOPE:
+                for i in range(operands[0]):
+                    out.append(f'v{depth}_{i} = NULL')
+                depth += 1
+            elif opcode == LEAVE_SCOPE:
+                depth -= 1
+            elif opcode == PRINT_ITEM:
+                sp -= 1
+                out.append(f"WRITE(f'{{{s(sp)}[1]}} ')")
+            elif opcode == PRINT_NEWLINE:
+                out.append("WRITE('\\n')")
+            elif opcode == POP:
+                sp -= 1
+            elif opcode == UNARY_NEG:
+                out.append(f"{s(sp - 1)} = ['num', -{s(sp - 1)}[1]]")
+            elif opcode == UNARY_NOT:
+                out.append(f"{s(sp - 1)} = FALSE if {s(sp - 1)}[1] else TRUE")
+            elif opcode in ARITH_OPS:
+                sp -= 1
+                out.append(f"{s(sp - 1)} = ['num', {s(sp - 1)}[1] {ARITH_OPS[opcode]} {s(sp)}[1]]")
+            elif opcode in COMPARE_OPS:
+                sp -= 1
+                out.append(f"{s(sp - 1)} = TRUE if {s(sp - 1)}[1] {COMPARE_OPS[opcode]} {s(sp)}[1] else FALSE")
+            elif opcode == BINARY_CONST:
+                binop, index = operands
+                if binop in ARITH_OPS:
+                    out.append(f"{s(sp - 1)} = ['num', {s(sp - 1)}[1] {ARITH_OPS[binop]} consts[{index}][1]]")
+                elif binop in COMPARE_OPS:
+                    out.append(f"{s(sp - 1)} = TRUE if {s(sp - 1)}[1] {COMPARE_OPS[binop]} consts[{index}][1] else FALSE")
+                else:
+                    raise Unsupported()
+            elif opcode == CALL:
+                func_id = operands[0]
+                n = self.nparams(func_id)
+                # 栈顶是第一个实参
+                args = ', '.join(s(sp - 1 - i) for i in range(n))
+                sp -= n
+                out.append(f'f = JT[{func_id}]')
+                out.append(f'if f is not None and DEPTH[0] < MAXD:')
+                out.append(f'    {s(sp)} = f({args})')
+                out.append('else:')
+                out.append(f'    {s(sp)} = CALLI({func_id}, [{args}])')
+                sp += 1
+            elif opcode == CALL_PRIMITIVE:
+                # 直接调用 VM 加载时绑定的槽位
+                prim_id, n = operands
+                args = ', '.join(f'{s(sp - 1 - i)}[1]' for i in range(n))
+                sp -= n
+                if PRIMITIVES[prim_id]["returns"] == RETURNS_VALUE:
+                    out.append(f'{s(sp)} = MKV(PT[{prim_id}]({args}))')
+                else:
+                    out.append(f'PT[{prim_id}]({args})')
+                    out.append(f'{s(sp)} = NULL')
+                sp += 1
+            elif opcode == RETURN:
+                out.append('return NULL')
+                return out
+            elif opcode == RETURN_VALUE:
+                out.append(f'return {s(sp - 1)}')
+                return out
+            elif opcode == JMP:
+                out.append(f'bb = {operands[0]}')
+                out.append('continue')
+                return out
+            elif opcode in (JMP_TRUE, JMP_FALSE):
+                sp -= 1
+                out.append(f'bb = {operands[0]} if {s(sp)} == {"TRUE" if opcode == JMP_TRUE else "FALSE"} else {nxt}')
+                out.append('continue')
+                return out
+            else:
+                raise Unsupported()
+
+            if nxt in self.targets:
+                out.append(f'bb = {nxt}')
+                out.append('continue')
+                return out
+            pc = nxt
@@ -2,11 +2,22 @@
 Cilly Lexer
 '''
 
-def error(src, msg):
-    raise Exception(f'{src} : {msg}')
+from bisect import bisect_right
 
-def mk_tk(tag, val=None):
-    return [tag, val]
+from errors import error
+
+class Token(list):
+    # [tag, val]，另带源码位置：pos 为起始字符偏移，line 从 1 开始
+    __slots__ = ('pos', 'line')
+
+def mk_tk(tag, val=None, pos=None, line=None):
+    t = Token((tag, val))
+    t.pos = pos
+    t.line = line
+    return t
+
+def tk_line(t):
+    return getattr(t, 'line', None)
 
 def tk_tag(t):
     return t[0]
@@ -42,8 +53,23 @@ def make_str_reader(s, err):
             
         return old
     
+    def tell():
+        return pos
+
     next()
-    return peek, match, next
+    return peek, match, next, tell
+
+def line_starts(s):
+    # 每行首字符的偏移，用于 偏移 -> 行号
+    starts = [0]
+    i = s.find('\n')
+    while i >= 0:
+        starts.append(i + 1)
+        i = s.find('\n', i + 1)
+    return starts
+
+def offset_to_line(starts, pos):
+    return bisect_right(starts, pos)
 
 cilly_op1 = [
     '(',')','{','}',',',';',
@@ -66,10 +92,12 @@ cilly_keywords = [
 
 def cilly_lexer(prog):
     
+    starts = line_starts(prog)
+
     def err(msg):
-        error('cilly lexer', msg)
+        error('cilly lexer', f'{msg} (第 {offset_to_line(starts, tell())} 行)')
         
-    peek, match, next = make_str_reader(prog, err)
+    peek, match, next, tell = make_str_reader(prog, err)
     
     def program():
         r = []
@@ -79,7 +107,11 @@ def cilly_lexer(prog):
             if peek() == 'eof':
                 break
             
-            r.append( token() )
+            pos = tell()
+            t = token()
+            t.pos = pos
+            t.line = offset_to_line(starts, pos)
+            r.append(t)
         
         return r
     
@@ -163,4 +195,4 @@ def cilly_lexer(prog):
             
     return program()
 
-__all__ = ['cilly_lexer', 'mk_tk', 'tk_tag', 'tk_val', 'error']
\ No newline at end of file
+__all__ = ['cilly_lexer', 'Token', 'mk_tk', 'tk_tag', 'tk_val', 'tk_line', 'error']
\ No newline at end of file
@@ -0,0 +1,99 @@
+'''
+pc -> 源码行号表
+
+编译器为每条指令记录它来自的源码行，按行程编码 (类似 CPython 的
+co_linetable) 成紧凑的字节串，随字节码一起保存在 Code.linetable 上。
+
+编码：从 (pc=0, line=0) 开始，每个条目两个字节
+    pc_delta    u8   本段覆盖的字节码槽位数 (0..255)
+    line_delta  i8   相对上一段的行号变化 (-128..127)
+超出范围的段拆成多个条目 (pc_delta 为 0 的条目只改变行号)。
+行号 0 表示没有源码位置 (例如编译器生成的隐式 RETURN)。
+
+查找时第一次把字节串解码成 段起点/行号 两个数组，之后 bisect，O(log n)。
+'''
+
+from array import array
+from bisect import bisect_right
+
+def encode_linetable(marks, code_len):
+    # marks: [(pc, line)] 按 pc 递增，表示从 pc 开始的指令属于 line
+    bounds = [(pc, line or 0) for pc, line in marks]
+    if not bounds or bounds[0][0] > 0:
+        bounds.insert(0, (0, 0))
+    bounds.append((code_len, 0))
+    out = bytearray()
+    cur_line = 0
+    for (pc, line), (next_pc, _) in zip(bounds, bounds[1:]):
+        if next_pc > pc:
+            _emit(out, next_pc - pc, line - cur_line)
+            cur_line = line
+    return bytes(out)
+
+def _emit(out, pc_delta, line_delta):
+    while line_delta > 127 or line_delta < -128:
+        step = 127 if line_delta > 0 else -128
+        out += bytes((0, step & 0xff))
+        line_delta -= step
+    while pc_delta > 255:
+        out += bytes((255, line_delta & 0xff))
+        pc_delta -= 255
+        line_delta = 0
+    out += bytes((pc_delta, line_delta & 0xff))
+
+def decode_linetable(data):
+    # -> (starts, lines)：第 i 段从 starts[i] 开始，行号为 lines[i]
+    starts, lines = array('i'), array('i')
+    pc, line = 0, 0
+    for i in range(0, len(data), 2):
+        pc_delta, line_delta = data[i], data[i + 1]
+        line += line_delta - 256 if line_delta >= 128 else line_delta
+        if pc_delta:
+            if not lines or lines[-1] != line:  # 与上一段同行时合并
+                starts.append(pc)
+                lines.append(line)
+            pc += pc_delta
+    return starts, lines
+
+class LineTable:
+    def __init__(self, data=b''):
+        self.data = bytes(data)
+        self._decoded = None
+
+    @classmethod
+    def from_marks(cls, marks, code_len):
+        return cls(encode_linetable(marks, code_len))
+
+    def decoded(self):
+        if self._decoded is None:
+            self._decoded = decode_linetable(self.data)
+        return self._decoded
+
+    def pc_to_line(self, pc):
+        # 没有源码位置时返回 None
+        starts, lines = self.decoded()
+        i = bisect_right(starts, pc) - 1
+        if i < 0:
+            return None
+        return lines[i] or None
+
+    def lines(self):
+        # 按 pc 顺序列出 (起始 pc, 行号)
+        starts, lines = self.decoded()
+        return list(zip(starts, lines))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __eq__(self, other):
+        return isinstance(other, LineTable) and self.data == other.data
+
+    def __repr__(self):
+        return f'LineTable({len(self.data)} bytes)'
+
+def pc_to_line(code, pc):
+    # code 没有行号表 (手写或旧 .cbc 加载的字节码) 时返回 None
+    table = getattr(code, 'linetable', None)
+    return table.pc_to_line(pc) if table is not None else None
+
+__all__ = ['LineTable', 'encode_linetable', 'decode_linetable', 'pc_to_line']
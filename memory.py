@@ -0,0 +1,261 @@
+'''
+内存统计：流水线各阶段与 VM 运行的内存占用
+
+memory_report 一次调用完成 词法分析 -> 语法分析 -> 编译 -> 执行，
+在 tracemalloc 下记录每个阶段的：
+- allocated  阶段结束时比开始时多占用的字节数 (阶段产物：token 表、AST、字节码...)
+- peak       阶段内的峰值，相对阶段开始时
+- top        分配最多的源码位置 (两次 tracemalloc 快照的差)
+并按产物数量折算为 每 token / 每 AST 节点 / 每条指令 的字节数。
+执行阶段还每片采样一次 VM 的活动内存 (vm_memory)，记录各项的最大值。
+
+    report = memory_report(source, max_memory=512 << 20)
+    print(json.dumps(report, indent=2))
+
+硬上限：run_capped 每执行一片指令检查一次内存，超过 max_memory 时
+VM 以 ERROR 状态停止 (error 为 "内存超出上限")，不会等到进程被 OOM 杀掉。
+tracemalloc 开启时按其统计的当前占用判断，否则按进程 RSS 判断。
+
+用法:
+    python memory.py <file.cilly> [--max-memory 512M] [--max-instructions N] [--top 5] [-o report.json]
+
+CLI 用 headless primitive 运行，程序本身的输出不显示。
+'''
+
+import os
+import sys
+import json
+import time
+import tracemalloc
+
+from errors import error, error_text
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, RUNNING, ERROR, OPS_NAME, val
+from output import StringSink
+
+MEMORY_SLICE = 10000  # 两次内存检查之间执行的指令数
+MEMORY_TOP = 5  # 每个阶段列出的分配位置数
+
+# --- 进程与 VM 的内存 ---
+
+def rss():
+    # 进程当前的常驻内存 (字节)；没有 /proc 时退回历史峰值
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+def memory_in_use():
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return rss()
+
+def vm_memory(vm):
+    # VM 当前的活动内存：栈、作用域链、调用栈、帧池和其中字符串的字节数
+    stack = vm.stack.stack
+    scopes = vm.active_scopes
+    seen = set()
+    string_bytes = 0
+    for values in [stack, *scopes]:
+        for v in values:
+            if type(v) is list and v and v[0] == 'str' and id(v[1]) not in seen:
+                seen.add(id(v[1]))
+                string_bytes += sys.getsizeof(val(v))
+    frame_slots = sum(len(scope) for scope in scopes)
+    pooled = sum(size * len(free) for size, free in vm.frame_pool.items())
+    return {
+        "stack_depth": len(stack),
+        "max_stack_depth": vm.stack.max_depth,
+        "scope_depth": len(scopes),
+        "frame_slots": frame_slots,
+        "pooled_frame_slots": pooled,
+        "call_depth": len(vm.call_stack.stack),
+        "string_bytes": string_bytes,
+        # 容器本身的大小 (不含元素)：栈、各作用域列表、调用栈
+        "container_bytes": sys.getsizeof(stack) + sys.getsizeof(scopes)
+                           + sum(sys.getsizeof(scope) for scope in scopes)
+                           + sys.getsizeof(vm.call_stack.stack),
+    }
+
+def peak_vm_memory(peak, current):
+    for key, value in current.items():
+        peak[key] = max(peak.get(key, 0), value)
+    return peak
+
+# --- 带内存上限的执行 ---
+
+def memory_exceeded(vm, used, max_memory):
+    vm.status = ERROR
+    try:
+        error('cilly vm', f'内存超出上限: {used} > {max_memory} 字节')
+    except Exception as e:
+        vm.error = vm.locate_error(e, vm.pc)
+    return vm.status
+
+def run_capped(vm, max_memory=None, max_instructions=None, slice_size=MEMORY_SLICE, on_slice=None):
+    # 分片运行 VM，每片之后检查内存上限与指令预算；返回 VM 状态
+    # (超出指令预算时仍为 RUNNING，可以继续调用)
+    budget = max_instructions
+    status = vm.status
+    while status == RUNNING:
+        if budget is not None and budget <= 0:
+            break
+        n = slice_size if budget is None else min(slice_size, budget)
+        status = vm.run_for(n)
+        if budget is not None:
+            budget -= n
+        if on_slice is not None:
+            on_slice(vm)
+        if max_memory is not None and status == RUNNING:
+            used = memory_in_use()
+            if used > max_memory:
+                status = memory_exceeded(vm, used, max_memory)
+    return status
+
+# --- 流水线各阶段 ---
+
+def count_nodes(ast):
+    # AST 节点数：以字符串标签开头的列表 (语句、表达式、token)
+    count = 0
+    todo = [ast]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, list):
+            if node and isinstance(node[0], str):
+                count += 1
+            todo.extend(item for item in node if isinstance(item, list))
+    return count
+
+def count_instructions(code):
+    count = 0
+    pc = 0
+    while pc < len(code):
+        pc += OPS_NAME.get(code[pc], ('', 1))[1]
+        count += 1
+    return count
+
+def top_allocations(before, after, limit):
+    stats = after.compare_to(before, 'lineno')
+    return [{"where": f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+             "size": stat.size_diff, "count": stat.count_diff}
+            for stat in stats[:limit] if stat.size_diff > 0]
+
+class StageMeter:
+    # 在 tracemalloc 下记录一个阶段的增量、峰值、耗时和分配位置
+    def __init__(self, top):
+        self.top = top
+        self.stages = {}
+
+    def measure(self, name, f):
+        before = tracemalloc.take_snapshot() if self.top else None
+        tracemalloc.reset_peak()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = f()
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        stage = {"allocated": current - start_bytes, "peak": peak - start_bytes, "time": elapsed}
+        if self.top:
+            stage["top"] = top_allocations(before, tracemalloc.take_snapshot(), self.top)
+        self.stages[name] = stage
+        return result
+
+def per_item(stage, count):
+    return stage["allocated"] / count if count else 0.0
+
+def memory_report(source, primitives=None, output=None, max_memory=None,
+                  max_instructions=None, top=MEMORY_TOP, slice_size=MEMORY_SLICE):
+    # 运行整个流水线并返回内存报告 (dict)；编译错误照常抛出，运行时错误记录在报告中
+    primitives = primitives if primitives is not None else {}
+    output = output if output is not None else StringSink()
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        meter = StageMeter(top)
+        tokens = meter.measure('lexer', lambda: cilly_lexer(source))
+        ast = meter.measure('parser', lambda: cilly_parser(tokens))
+        code, consts, scopes, functions = meter.measure(
+            'compiler', lambda: cilly_vm_compiler(ast, list(primitives)))
+        vm = CillyVM(code, consts, scopes, functions, primitives, output=output)
+        vm_peak = {}
+
+        def on_slice(vm):
+            peak_vm_memory(vm_peak, vm_memory(vm))
+
+        status = meter.measure('run', lambda: run_capped(
+            vm, max_memory, max_instructions, slice_size, on_slice))
+        peak_vm_memory(vm_peak, vm_memory(vm))
+        traced, traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    counts = {
+        "chars": len(source),
+        "tokens": len(tokens),
+        "ast_nodes": count_nodes(ast),
+        "instructions": count_instructions(code),
+        "code_slots": len(code),
+        "consts": len(consts),
+    }
+    stages = meter.stages
+    return {
+        "status": status,
+        "error": error_text(vm.error) if status == ERROR else None,
+        "stages": stages,
+        "counts": counts,
+        "bytes_per": {
+            "char": per_item(stages["lexer"], counts["chars"]),
+            "token": per_item(stages["lexer"], counts["tokens"]),
+            "ast_node": per_item(stages["parser"], counts["ast_nodes"]),
+            "instruction": per_item(stages["compiler"], counts["instructions"]),
+        },
+        "vm": vm_memory(vm),
+        "vm_peak": vm_peak,
+        "traced": {"current": traced, "peak": traced_peak},
+        "rss": rss(),
+        "max_memory": max_memory,
+    }
+
+def parse_bytes(text):
+    # 512, 64K, 10M, 1G (按 1024 进位，可带 B 后缀)；内存上限和生成器的 --size 共用
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+__all__ = ['memory_report', 'run_capped', 'vm_memory', 'memory_in_use', 'rss',
+           'count_nodes', 'count_instructions', 'parse_bytes', 'MEMORY_SLICE', 'MEMORY_TOP']
+
+def main(argv=None):
+    import argparse
+    from providers import load_provider
+    parser = argparse.ArgumentParser(description='统计 Cilly 程序各阶段的内存占用')
+    parser.add_argument('path', help='.cilly 文件')
+    parser.add_argument('--max-memory', type=parse_bytes, default=None, help='内存上限 (例如 512M)')
+    parser.add_argument('--max-instructions', type=int, default=None)
+    parser.add_argument('--top', type=int, default=MEMORY_TOP, help='每个阶段列出的分配位置数')
+    parser.add_argument('-o', '--output', default=None, help='报告 JSON 文件，默认标准输出')
+    args = parser.parse_args(argv)
+
+    with open(args.path, encoding='utf-8') as f:
+        source = f.read()
+    report = memory_report(source, load_provider('headless'), max_memory=args.max_memory,
+                           max_instructions=args.max_instructions, top=args.top)
+    text = json.dumps(report, ensure_ascii=False, indent=2) + '\n'
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    return 1 if report["status"] == ERROR else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
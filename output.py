@@ -0,0 +1,68 @@
+'''
+Cilly 程序输出 (print) 的输出端
+
+虚拟机只调用输出端的 write(s) / flush()，自己从不接触 sys.stdout。
+
+- BufferedSink: 把小块文本攒在列表中，累计长度超过 threshold 时合并成
+  一块交给下游 write 回调；默认回调在调用时才取 sys.stdout
+- StreamingSink: 在 BufferedSink 基础上按时间间隔刷新，用于把输出边运行
+  边推送给 GUI (例如 pyqtSignal(str).emit)
+- StringSink: 收集到内存中，getvalue() 取回全部输出
+'''
+
+import sys
+import time
+
+OUTPUT_FLUSH_THRESHOLD = 64 * 1024  # 字符数
+OUTPUT_FLUSH_INTERVAL = 0.1  # 秒，StreamingSink 的最长刷新间隔
+
+def stdout_write(s):
+    # 在调用时才取 sys.stdout，兼容 redirect_stdout
+    sys.stdout.write(s)
+
+class BufferedSink:
+    def __init__(self, write=None, threshold=OUTPUT_FLUSH_THRESHOLD):
+        self.downstream = write if write is not None else stdout_write
+        self.threshold = threshold
+        self.chunks = []
+        self.size = 0
+
+    def write(self, s):
+        self.chunks.append(s)
+        self.size += len(s)
+        if self.size >= self.threshold:
+            self.flush()
+
+    def flush(self):
+        if not self.chunks:
+            return
+        data = ''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        self.downstream(data)
+
+class StreamingSink(BufferedSink):
+    def __init__(self, write, threshold=OUTPUT_FLUSH_THRESHOLD, interval=OUTPUT_FLUSH_INTERVAL, clock=time.monotonic):
+        super().__init__(write, threshold)
+        self.interval = interval
+        self.clock = clock
+        self.last_flush = clock()
+
+    def write(self, s):
+        self.chunks.append(s)
+        self.size += len(s)
+        if self.size >= self.threshold or self.clock() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = self.clock()
+        super().flush()
+
+class StringSink(BufferedSink):
+    def __init__(self):
+        self.parts = []
+        super().__init__(self.parts.append)
+
+    def getvalue(self):
+        self.flush()
+        return ''.join(self.parts)
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+'''
+剖析引导优化 (PGO)
+
+分两步：先用训练负载运行未优化的字节码，记录一份紧凑的执行剖析；
+再把剖析交给编译器，按热点重新安排代码。
+
+    python pgo.py record train.cilly -o prog.prof [--max-instructions N]
+    python pgo.py show prog.prof
+    python cilly.py run prog.cilly --pgo prog.prof
+
+    profile = record_profile(train_source)
+    save_profile(profile, 'prog.prof')
+    code, consts, scopes, functions = cilly_vm_compiler(ast, primitives, profile=load_profile('prog.prof'))
+
+剖析按站点记录，站点是 AST 中的 if / while / call 节点，按先序遍历编号，
+与字节码布局无关，因此可以用小规模的训练输入 (例如循环次数更少) 记录，
+再去编译结构相同的评测程序：
+- branches: 每个 if / while 条件为真、为假的次数 (在条件跳转处按栈顶的值计数)
+- calls: 每个调用站点执行 CALL 的次数
+- pairs: 顺序执行 (后一条紧接前一条，不经跳转) 的相邻 opcode 对的次数
+- signature: 站点序列 (类型, 行号) 的摘要；程序结构改变后旧剖析被拒绝
+
+编译器据此做三件事 (阈值见下方常量)：
+- 布局：then 分支更热的 if/else 反转为 JMP_TRUE，热分支放在最后，不再执行
+  跳过 else 的 JMP；热循环旋转成 cond; JMP_FALSE end; top: body; cond; JMP_TRUE top，
+  每轮少一条 JMP。JMP_TRUE 只在值为 true 时跳转，与 JMP_FALSE 不是严格的互补，
+  所以只改写条件一定是布尔值 (比较、!、true/false 及其 && / ||) 的站点。
+- 内联：热调用站点上，小的叶子函数 (不调用其它 Cilly 函数) 展开到调用处，
+  用 ENTER_SCOPE + STORE_VAR 代替 CALL / RETURN_VALUE 的调用栈操作。
+- 合并：热的相邻指令对合并为超级指令 (LOAD_CONST + 二元运算 -> BINARY_CONST，
+  LOAD_VAR + LOAD_VAR -> LOAD_VAR2)，在编译结束后对整段字节码做一遍，
+  跳转目标处不合并，跳转地址、函数入口和行号表随之重定位。
+
+内联后的函数不再出现在调用栈上，运行时错误的行号仍指向函数体内的语句。
+剖析总是从未优化的字节码记录；训练运行不开启 JIT。
+'''
+
+import sys
+import json
+import hashlib
+
+from errors import error
+from vm import (
+    OPS_NAME, Code, iter_instructions, RUN_SLICE, RUNNING, ERROR, TRUE, FALSE,
+    LOAD_CONST, LOAD_VAR, JMP, JMP_TRUE, JMP_FALSE, CALL, BINARY_CONST, LOAD_VAR2, BINARY_VALUE,
+)
+
+PROFILE_VERSION = 1
+SITE_TAGS = ('if', 'while', 'call')
+
+BRANCH_MIN = 16  # if 条件至少执行这么多次才按剖析反转
+LOOP_MIN = 16  # 循环体至少执行这么多轮才旋转
+INLINE_MIN_CALLS = 16  # 调用站点至少执行这么多次才内联
+INLINE_MAX_NODES = 40  # 可内联函数体的最大 AST 节点数
+FUSE_MIN_SHARE = 0.01  # 指令对至少占全部执行指令的这一比例才合并
+
+COMPARE_OPS = ('==', '!=', '<', '>=', '>', '<=')
+
+def err(msg):
+    error('cilly pgo', msg)
+
+# --- 站点 ---
+
+def number_sites(ast):
+    # 先序遍历给 if / while / call 节点编号 -> ({id(节点): 编号}, [(类型, 行号)])
+    sites, kinds = {}, []
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if not node:
+            continue
+        head = node[0]
+        if isinstance(head, str):
+            if head in SITE_TAGS:
+                sites[id(node)] = len(kinds)
+                kinds.append((head, getattr(node, 'line', None)))
+            children = node[2:3] if head == 'fun' else node[1:]  # 跳过参数名列表
+        else:
+            children = node  # 语句列表
+        stack.extend(c for c in reversed(children) if isinstance(c, list))
+    return sites, kinds
+
+def site_signature(kinds):
+    data = json.dumps(kinds, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()[:16]
+
+# --- 记录 ---
+
+class ProfileRecorder:
+    # 包装 vm.ops 中的处理函数计数，做法同 profiler.CillyProfiler
+    def __init__(self, vm, site_pcs, site_kinds):
+        self.vm = vm
+        self.site_pcs = site_pcs
+        self.site_kinds = site_kinds
+        self.originals = None
+        self.instructions = [0]
+        self.last = [None, -1]  # 上一条指令的 opcode 与其后一条指令的 pc
+        self.pairs = {}  # (opcode, opcode) -> 次数
+        self.branches = {}  # 站点 -> [为真, 为假]
+        self.calls = {}  # 站点 -> 次数
+
+    def enable(self):
+        if self.originals is not None:
+            return self
+        ops = self.vm.ops
+        self.originals = dict(ops)
+        for opcode, handler in self.originals.items():
+            if opcode in (JMP_TRUE, JMP_FALSE):
+                handler = self.wrap_branch(handler)
+            elif opcode == CALL:
+                handler = self.wrap_call(handler)
+            ops[opcode] = self.wrap(opcode, handler)
+        return self
+
+    def disable(self):
+        if self.originals is not None:
+            self.vm.ops.update(self.originals)
+            self.originals = None
+        return self
+
+    def wrap(self, opcode, handler):
+        size = OPS_NAME[opcode][1]
+        last, pairs, count = self.last, self.pairs, self.instructions
+
+        def op(pc):
+            if last[1] == pc:
+                key = (last[0], opcode)
+                pairs[key] = pairs.get(key, 0) + 1
+            last[0] = opcode
+            last[1] = pc + size
+            count[0] += 1
+            return handler(pc)
+        return op
+
+    def wrap_branch(self, handler):
+        site_pcs, branches, stack = self.site_pcs, self.branches, self.vm.stack.stack
+
+        def op(pc):
+            site = site_pcs.get(pc)
+            if site is not None:
+                # 与跳转方向无关：then 分支 / 循环体执行即为真
+                is_true = stack[-1] == TRUE if self.vm.code[pc] == JMP_TRUE else stack[-1] != FALSE
+                counts = branches.get(site)
+                if counts is None:
+                    counts = branches[site] = [0, 0]
+                counts[0 if is_true else 1] += 1
+            return handler(pc)
+        return op
+
+    def wrap_call(self, handler):
+        site_pcs, calls = self.site_pcs, self.calls
+
+        def op(pc):
+            site = site_pcs.get(pc)
+            if site is not None:
+                calls[site] = calls.get(site, 0) + 1
+            return handler(pc)
+        return op
+
+    def profile(self):
+        return {
+            "version": PROFILE_VERSION,
+            "signature": site_signature(self.site_kinds),
+            "instructions": self.instructions[0],
+            "branches": {site: list(c) for site, c in sorted(self.branches.items())},
+            "calls": dict(sorted(self.calls.items())),
+            "pairs": {f'{OPS_NAME[a][0]} {OPS_NAME[b][0]}': n
+                      for (a, b), n in sorted(self.pairs.items(), key=lambda kv: -kv[1])},
+        }
+
+def record_profile(source, primitives=None, max_instructions=None):
+    # 编译 (不优化) 并运行一次训练程序，返回剖析；程序输出被丢弃
+    from lexer import cilly_lexer
+    from cilly_parser_module import cilly_parser
+    from compile import CillyCompiler
+    from vm import CillyVM
+    from output import StringSink
+    if primitives is None:
+        from providers import headless_primitives
+        primitives = headless_primitives()
+    compiler = CillyCompiler(record_sites=True)
+    code, consts, scopes, functions = compiler.compile(cilly_parser(cilly_lexer(source)), list(primitives))
+    vm = CillyVM(code, consts, scopes, functions, primitives, output=StringSink())
+    recorder = ProfileRecorder(vm, compiler.site_pcs, compiler.site_kinds).enable()
+    budget = max_instructions
+    try:
+        while budget is None or budget > 0:
+            n = RUN_SLICE if budget is None else min(RUN_SLICE, budget)
+            if vm.run_for(n) != RUNNING:
+                break
+            if budget is not None:
+                budget -= n
+    finally:
+        recorder.disable()
+    if vm.status == ERROR:
+        raise vm.error
+    return recorder.profile()
+
+def merge_profiles(*profiles):
+    # 合并同一程序的多次训练运行
+    signatures = {p["signature"] for p in profiles}
+    if len(signatures) != 1:
+        err('只能合并同一程序结构的剖析')
+    merged = {"version": PROFILE_VERSION, "signature": signatures.pop(), "instructions": 0,
+              "branches": {}, "calls": {}, "pairs": {}}
+    for p in profiles:
+        merged["instructions"] += p["instructions"]
+        for site, (t, f) in p["branches"].items():
+            counts = merged["branches"].setdefault(site, [0, 0])
+            counts[0] += t
+            counts[1] += f
+        for key in ('calls', 'pairs'):
+            for k, n in p[key].items():
+                merged[key][k] = merged[key].get(k, 0) + n
+    return merged
+
+def save_profile(profile, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=1)
+
+def load_profile(path):
+    with open(path, encoding='utf-8') as f:
+        return parse_profile(json.load(f))
+
+def parse_profile(data):
+    # JSON 中的站点编号是字符串，还原为整数
+    if data.get("version") != PROFILE_VERSION:
+        err(f'剖析格式版本不匹配: {data.get("version")}, 需要 {PROFILE_VERSION}')
+    return {
+        "version": PROFILE_VERSION,
+        "signature": data["signature"],
+        "instructions": data["instructions"],
+        "branches": {int(site): list(c) for site, c in data["branches"].items()},
+        "calls": {int(site): n for site, n in data["calls"].items()},
+        "pairs": dict(data["pairs"]),
+    }
+
+# --- 编译器使用的决策 ---
+
+def is_bool_expr(node):
+    # 值一定是 true / false 的表达式
+    tag = node[0]
+    if tag in ('true', 'false'):
+        return True
+    if tag == 'unary':
+        return node[1] == '!'
+    if tag == 'binary':
+        op = node[1]
+        if op in COMPARE_OPS:
+            return True
+        if op in ('&&', '||'):
+            return is_bool_expr(node[2]) and is_bool_expr(node[3])
+    return False
+
+FUSIBLE = {(LOAD_CONST, b) for b in BINARY_VALUE} | {(LOAD_VAR, LOAD_VAR)}
+
+def hot_fusions(profile):
+    # 剖析中足够热、且有对应超级指令的相邻 opcode 对
+    names = {name: opcode for opcode, (name, _) in OPS_NAME.items()}
+    total = profile["instructions"]
+    fusions = set()
+    for key, n in profile["pairs"].items():
+        a, b = key.split()
+        pair = (names.get(a), names.get(b))
+        if pair in FUSIBLE and total and n / total >= FUSE_MIN_SHARE:
+            fusions.add(pair)
+    return fusions
+
+class ProfileGuide:
+    def __init__(self, profile, sites, kinds, primitives):
+        if profile["signature"] != site_signature(kinds):
+            err('剖析数据与程序结构不匹配，请用当前程序重新记录')
+        self.sites = sites
+        self.primitives = primitives
+        self.branches = profile["branches"]
+        self.calls = profile["calls"]
+        self.fusions = hot_fusions(profile)
+        self.inlinable = {}  # id(fun 节点) -> 是否可内联
+
+    def counts(self, node):
+        return self.branches.get(self.sites[id(node)], (0, 0))
+
+    def invert_if(self, node):
+        t, f = self.counts(node)
+        return t + f >= BRANCH_MIN and t > f and is_bool_expr(node[1])
+
+    def rotate_loop(self, node):
+        t, _ = self.counts(node)
+        return t >= LOOP_MIN and is_bool_expr(node[1])
+
+    def inline_call(self, node, fun):
+        if fun is None or self.calls.get(self.sites[id(node)], 0) < INLINE_MIN_CALLS:
+            return False
+        if len(node[2]) != len(fun[1]):
+            return False
+        key = id(fun)
+        if key not in self.inlinable:
+            self.inlinable[key] = self.can_inline(fun)
+        return self.inlinable[key]
+
+    def can_inline(self, fun):
+        # 叶子函数 (只调用 primitive)、体积小、函数体顶层的变量不与参数重名
+        _, params, body = fun
+        if not body or body[0] != 'block':
+            return False
+        statements = body[1]
+        for s in statements:
+            if s[0] == 'define' and s[1] in params:
+                return False
+        size = 0
+        stack = list(statements)
+        while stack:
+            node = stack.pop()
+            if not node:
+                continue
+            head = node[0]
+            if not isinstance(head, str):
+                stack.extend(node)
+                continue
+            size += 1
+            if head == 'fun':
+                return False
+            if head == 'call' and not (node[1][0] == 'id' and node[1][1] in self.primitives):
+                return False
+            stack.extend(c for c in node[1:] if isinstance(c, list))
+        return size <= INLINE_MAX_NODES
+
+# --- 超级指令合并 ---
+
+def fuse_pairs(code, line_marks, functions, fusions):
+    # 合并 fusions 中的相邻指令对 -> (新字节码, 新行号标记, 旧 pc -> 新 pc)
+    # 第二条指令是跳转目标或函数入口时不合并；合并后的指令取第二条指令的行号
+    instrs = list(iter_instructions(code))
+    targets = {f["entry_point"] for f in functions}
+    for _, opcode, operands in instrs:
+        if opcode in (JMP, JMP_TRUE, JMP_FALSE):
+            targets.add(operands[0])
+
+    new = Code()
+    pc_map = {}
+    i = 0
+    while i < len(instrs):
+        pc, opcode, operands = instrs[i]
+        pc_map[pc] = len(new)
+        if i + 1 < len(instrs):
+            pc2, opcode2, operands2 = instrs[i + 1]
+            if (opcode, opcode2) in fusions and pc2 not in targets:
+                pc_map[pc2] = len(new)
+                if opcode == LOAD_CONST:
+                    new.extend((BINARY_CONST, opcode2, operands[0]))
+                else:
+                    new.extend((LOAD_VAR2,) + operands + operands2)
+                i += 2
+                continue
+        new.append(opcode)
+        new.extend(operands)
+        i += 1
+    pc_map[len(code)] = len(new)
+
+    for pc, opcode, _ in iter_instructions(new):
+        if opcode in (JMP, JMP_TRUE, JMP_FALSE):
+            new[pc + 1] = pc_map[new[pc + 1]]
+    for f in functions:
+        f["entry_point"] = pc_map[f["entry_point"]]
+    marks = [(pc_map[pc], line) for pc, line in line_marks]
+    return new, marks, pc_map
+
+# --- 命令行 ---
+
+def format_profile(profile, limit=10):
+    lines = [f'signature {profile["signature"]}  instructions {profile["instructions"]}']
+    branches = sorted(profile["branches"].items(), key=lambda kv: -sum(kv[1]))
+    lines.append(f'{"branch site":>12} {"true":>10} {"false":>10}')
+    for site, (t, f) in branches[:limit]:
+        lines.append(f'{site:>12} {t:>10} {f:>10}')
+    calls = sorted(profile["calls"].items(), key=lambda kv: -kv[1])
+    lines.append(f'{"call site":>12} {"calls":>10}')
+    for site, n in calls[:limit]:
+        lines.append(f'{site:>12} {n:>10}')
+    lines.append(f'{"opcode pair":32} {"count":>10}')
+    pairs = sorted(profile["pairs"].items(), key=lambda kv: -kv[1])
+    for key, n in pairs[:limit]:
+        lines.append(f'{key:32} {n:>10}')
+    return '\n'.join(lines) + '\n'
+
+__all__ = ['record_profile', 'merge_profiles', 'save_profile', 'load_profile', 'parse_profile',
+           'number_sites', 'site_signature', 'ProfileRecorder', 'ProfileGuide', 'fuse_pairs',
+           'hot_fusions', 'is_bool_expr', 'format_profile', 'PROFILE_VERSION']
+
+def main(argv=None):
+    import os
+    import argparse
+    parser = argparse.ArgumentParser(description='剖析引导优化：记录或查看执行剖析')
+    sub = parser.add_subparsers(dest='command', required=True)
+    record_p = sub.add_parser('record', help='运行训练程序并记录剖析')
+    record_p.add_argument('files', nargs='+', help='训练程序；多个文件 (结构须相同) 的剖析会合并')
+    record_p.add_argument('-o', '--output', help='剖析文件，默认与第一个源文件同名 (.prof)')
+    record_p.add_argument('--max-instructions', type=int, default=None, help='每个训练程序的指令预算')
+    show_p = sub.add_parser('show', help='显示剖析中最热的站点与指令对')
+    show_p.add_argument('file')
+    show_p.add_argument('--top', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'show':
+            sys.stdout.write(format_profile(load_profile(args.file), args.top))
+            return 0
+        profiles = []
+        for path in args.files:
+            with open(path, encoding='utf-8') as f:
+                profiles.append(record_profile(f.read(), max_instructions=args.max_instructions))
+        profile = merge_profiles(*profiles)
+        out = args.output or os.path.splitext(args.files[0])[0] + '.prof'
+        save_profile(profile, out)
+        print(f'{out}: {len(profile["branches"])} 个分支站点, {len(profile["calls"])} 个调用站点, '
+              f'{profile["instructions"]} 条指令')
+        return 0
+    except Exception as e:
+        sys.stderr.write(f'{e}\n')
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
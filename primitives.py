@@ -0,0 +1,53 @@
+'''
+Cilly primitive 注册表
+
+每个 primitive 在这里声明一次：名字、参数个数以及返回值的处理方式。
+编号 (prim_id) 即在 PRIMITIVES 中的下标，编译器把调用翻译成
+CALL_PRIMITIVE prim_id argc，虚拟机在加载时按编号把实际的可调用对象
+(函数或 Qt 信号的 emit) 绑定到槽位表中，运行时不再按名字查找。
+
+编号写进字节码 (以及 .cbc 文件)，因此只能在末尾追加新的 primitive。
+'''
+
+from errors import error
+
+# 返回值处理
+RETURNS_NULL = 'null'    # 忽略返回值，向栈上压 NULL (turtle 命令)
+RETURNS_VALUE = 'value'  # 把 Python 返回值转换成 Cilly 值
+
+PRIMITIVES = []  # prim_id -> {name, arity, returns, id}
+PRIMITIVE_IDS = {}  # name -> prim_id
+
+def register_primitive(name, arity, returns=RETURNS_NULL):
+    if name in PRIMITIVE_IDS:
+        error('cilly primitives', f'重复注册 primitive: {name}')
+    if returns not in (RETURNS_NULL, RETURNS_VALUE):
+        error('cilly primitives', f'非法返回值类型: {returns}')
+    prim_id = len(PRIMITIVES)
+    PRIMITIVES.append({"name": name, "arity": arity, "returns": returns, "id": prim_id})
+    PRIMITIVE_IDS[name] = prim_id
+    return prim_id
+
+def primitive_id(name):
+    return PRIMITIVE_IDS.get(name)
+
+def get_primitive(prim_id):
+    if not 0 <= prim_id < len(PRIMITIVES):
+        error('cilly primitives', f'非法 primitive 编号: {prim_id}')
+    return PRIMITIVES[prim_id]
+
+def primitive_arity(name):
+    prim_id = primitive_id(name)
+    return 0 if prim_id is None else PRIMITIVES[prim_id]["arity"]
+
+# turtle 绘图命令，参数个数与 TurtleCanvas 上的信号签名一致
+register_primitive("forward", 1)
+register_primitive("backward", 1)
+register_primitive("left", 1)
+register_primitive("right", 1)
+register_primitive("penup", 0)
+register_primitive("pendown", 0)
+register_primitive("pencolor", 1)
+register_primitive("pensize", 1)
+register_primitive("reset", 0)
+register_primitive("speed", 1)
@@ -0,0 +1,200 @@
+'''
+CillyVM 执行剖析
+
+按需开启：enable_profiling() 把 vm.ops 中的每个处理函数替换为计时包装，
+disable() 换回原函数。未开启时分派表不变，解释循环没有任何额外开销。
+
+收集的数据：
+- 每个 opcode 的执行次数与累计时间 (CALL 只计调用本身，不含被调函数)
+- 每个函数 (按 functions[i]["name"]) 的调用次数、包含时间与独占时间；
+  递归调用只在最外层一次计入包含时间
+- 每个 pc 的执行次数，以及按源码行汇总的次数 (字节码带行号表时)
+
+    prof = vm.enable_profiling()
+    vm.run()
+    prof.disable()
+    print(prof.to_json())
+    print(prof.dis())      # 在 cilly_vm_dis 的反汇编上标注次数与时间
+
+开启 JIT 时应先 enable_jit() 再 enable_profiling()，剖析器包装的是 JIT 的
+CALL；被 JIT 编译的函数整体算作一次调用，没有逐条指令的数据。
+'''
+
+import json
+import time
+
+from vm import OPS_NAME, CALL, RETURN, RETURN_VALUE, cilly_vm_dis
+from linetable import pc_to_line
+
+class CillyProfiler:
+    def __init__(self, vm, clock=time.perf_counter_ns):
+        self.vm = vm
+        self.clock = clock
+        self.originals = None
+        self.op_counts = {}  # opcode -> 次数
+        self.op_times = {}  # opcode -> 纳秒
+        self.pc_counts = [0] * len(vm.code)
+        nfuncs = len(vm.functions)
+        self.func_calls = [0] * nfuncs
+        self.func_inclusive = [0] * nfuncs
+        self.func_exclusive = [0] * nfuncs
+        self.func_active = [0] * nfuncs  # 当前在调用栈上的层数，递归时只在最外层计入包含时间
+        self.frames = []  # [func_id, 开始时间, 子调用时间, 进入后的 call_stack 深度]
+        self.total = 0
+        # 作用域列表运行时会被写入变量值，反汇编用开启剖析时的名字表
+        self.scope_names = [list(scope) for scope in vm.scopes]
+
+    # --- 开关 ---
+
+    def enable(self):
+        if self.originals is not None:
+            return self
+        ops = self.vm.ops
+        self.originals = dict(ops)
+        for opcode, handler in self.originals.items():
+            if opcode == CALL:
+                ops[opcode] = self.wrap_call(handler)
+            elif opcode in (RETURN, RETURN_VALUE):
+                ops[opcode] = self.wrap_return(opcode, handler)
+            else:
+                ops[opcode] = self.wrap(opcode, handler)
+        return self
+
+    def disable(self):
+        if self.originals is not None:
+            self.vm.ops.update(self.originals)
+            self.originals = None
+        return self
+
+    # --- 包装 ---
+
+    def wrap(self, opcode, handler):
+        clock = self.clock
+        counts, times, pcs = self.op_counts, self.op_times, self.pc_counts
+        counts[opcode] = 0
+        times[opcode] = 0
+
+        def op(pc):
+            start = clock()
+            next_pc = handler(pc)
+            elapsed = clock() - start
+            counts[opcode] += 1
+            times[opcode] += elapsed
+            pcs[pc] += 1
+            self.total += elapsed
+            return next_pc
+        return op
+
+    def wrap_call(self, handler):
+        clock = self.clock
+        counts, times, pcs = self.op_counts, self.op_times, self.pc_counts
+        call_stack = self.vm.call_stack.stack
+        code = self.vm.code
+        counts[CALL] = 0
+        times[CALL] = 0
+
+        def op(pc):
+            start = clock()
+            depth = len(call_stack)
+            next_pc = handler(pc)
+            now = clock()
+            elapsed = now - start
+            counts[CALL] += 1
+            times[CALL] += elapsed
+            pcs[pc] += 1
+            self.total += elapsed
+            func_id = code[pc + 1]
+            self.func_calls[func_id] += 1
+            if len(call_stack) > depth:
+                # 进入解释执行的函数体，在对应的 RETURN 处结算
+                self.func_active[func_id] += 1
+                self.frames.append([func_id, now, 0, len(call_stack)])
+            else:
+                # JIT 编译的函数已整体执行完毕
+                self.leave(func_id, elapsed, elapsed)
+            return next_pc
+        return op
+
+    def wrap_return(self, opcode, handler):
+        clock = self.clock
+        counts, times, pcs = self.op_counts, self.op_times, self.pc_counts
+        call_stack = self.vm.call_stack.stack
+        frames = self.frames
+        counts[opcode] = 0
+        times[opcode] = 0
+
+        def op(pc):
+            depth = len(call_stack)
+            start = clock()
+            next_pc = handler(pc)
+            now = clock()
+            elapsed = now - start
+            counts[opcode] += 1
+            times[opcode] += elapsed
+            pcs[pc] += 1
+            self.total += elapsed
+            # call_function (JIT 回退) 直接进入的函数没有对应的剖析帧
+            if frames and frames[-1][3] == depth:
+                func_id, entered, child, _ = frames.pop()
+                self.func_active[func_id] -= 1
+                inclusive = now - entered
+                self.leave(func_id, inclusive, inclusive - child)
+            return next_pc
+        return op
+
+    def leave(self, func_id, inclusive, exclusive):
+        if self.func_active[func_id] == 0:
+            self.func_inclusive[func_id] += inclusive
+        self.func_exclusive[func_id] += exclusive
+        if self.frames:
+            self.frames[-1][2] += inclusive
+
+    # --- 结果 ---
+
+    def stats(self):
+        functions = {}
+        for func_id, func in enumerate(self.vm.functions):
+            if self.func_calls[func_id]:
+                functions[func["name"]] = {
+                    "calls": self.func_calls[func_id],
+                    "inclusive": self.func_inclusive[func_id] / 1e9,
+                    "exclusive": self.func_exclusive[func_id] / 1e9,
+                }
+        opcodes = {}
+        for opcode, count in self.op_counts.items():
+            if count:
+                name = OPS_NAME.get(opcode, (f'UNKNOWN {opcode}', 1))[0]
+                opcodes[name] = {"count": count, "time": self.op_times[opcode] / 1e9}
+        return {
+            "total": self.total / 1e9,
+            "opcodes": opcodes,
+            "functions": functions,
+            "pcs": {pc: count for pc, count in enumerate(self.pc_counts) if count},
+            "lines": self.line_counts(),
+        }
+
+    def line_counts(self):
+        lines = {}
+        code = self.vm.code
+        for pc, count in enumerate(self.pc_counts):
+            if count:
+                line = pc_to_line(code, pc)
+                if line is not None:
+                    lines[line] = lines.get(line, 0) + count
+        return lines
+
+    def to_json(self, indent=2):
+        return json.dumps(self.stats(), ensure_ascii=False, indent=indent)
+
+    def dis(self):
+        # 反汇编并在每行末尾标注执行次数与该 opcode 的平均耗时
+        code = self.vm.code
+        annotations = {}
+        for pc, count in enumerate(self.pc_counts):
+            if count:
+                opcode = code[pc]
+                avg = self.op_times[opcode] / self.op_counts[opcode]
+                annotations[pc] = f'{count:>10}x  ~{avg:.0f}ns'
+        return cilly_vm_dis(code, self.vm.consts, self.scope_names, annotations)
+
+__all__ = ['CillyProfiler']
@@ -0,0 +1,74 @@
+'''
+primitive 提供者
+
+词法/语法分析、编译器和虚拟机都不依赖任何 GUI 工具包；turtle 等 primitive
+的实现由提供者给出，提供者在第一次使用时才导入对应的工具包：
+
+- tk:       标准库 turtle (tkinter)
+- qt:       经 CommandBuffer 整批发送给 gui.py 的 TurtleCanvas
+- headless: 不绘图，可选地把调用记录到列表中 (无显示器的服务器、批量运行)
+
+    prims = load_provider('headless', log=calls)    # 立即构造
+    prims = lazy_primitives('tk')                    # 第一次调用 primitive 时才导入 turtle
+'''
+
+from errors import error
+from primitives import PRIMITIVES
+
+PROVIDERS = {}  # 名字 -> 工厂函数，工厂返回 {primitive 名: 可调用对象}
+
+def err(msg):
+    error('cilly providers', msg)
+
+def register_provider(name, factory):
+    PROVIDERS[name] = factory
+
+def load_provider(name, **options):
+    if name not in PROVIDERS:
+        err(f'未知的 primitive 提供者: {name} (可选 {", ".join(PROVIDERS)})')
+    return PROVIDERS[name](**options)
+
+def lazy_primitives(name, names=None, **options):
+    # 返回占位函数表，第一次被调用时才加载提供者 (及其 GUI 工具包)
+    if names is None:
+        names = [prim["name"] for prim in PRIMITIVES]
+    loaded = {}
+
+    def make(prim_name):
+        def call(*args):
+            if not loaded:
+                loaded.update(load_provider(name, **options))
+            if prim_name not in loaded:
+                err(f'提供者 {name} 不支持 primitive: {prim_name}')
+            return loaded[prim_name](*args)
+        return call
+    return {n: make(n) for n in names}
+
+# --- 内置提供者 ---
+
+def tk_primitives():
+    import turtle
+    return {prim["name"]: getattr(turtle, prim["name"])
+            for prim in PRIMITIVES if hasattr(turtle, prim["name"])}
+
+def qt_primitives(command_buffer=None, flush=None):
+    # command_buffer 由调用方持有以便运行结束时 flush；也可只给出刷新回调
+    if command_buffer is None:
+        from command_buffer import CommandBuffer
+        command_buffer = CommandBuffer(flush)
+    return command_buffer.primitives()
+
+def headless_primitives(log=None):
+    def make(name):
+        def prim(*args):
+            if log is not None:
+                log.append((name, args))
+        return prim
+    return {prim["name"]: make(prim["name"]) for prim in PRIMITIVES}
+
+register_provider('tk', tk_primitives)
+register_provider('qt', qt_primitives)
+register_provider('headless', headless_primitives)
+
+__all__ = ['PROVIDERS', 'register_provider', 'load_provider', 'lazy_primitives',
+           'tk_primitives', 'qt_primitives', 'headless_primitives']
@@ -0,0 +1,352 @@
+import sys
+import threading
+import types
+
+from errors import error
+from primitives import primitive_arity
+from output import BufferedSink
+
+# Cilly -> Python 源码转换
+#
+# 与 CillyVM 的语义保持一致：
+# - 值直接使用 Python 值 (int/float/str/True/False/None)，print 的格式与 VM 相同
+#   (每项后跟一个空格，最后换行)
+# - 块作用域、同名遮蔽、函数体只能看到参数/局部变量/函数/primitive，与 CillyCompiler 相同
+# - 只有 false 才是假值 (JMP_FALSE 只在栈顶为 FALSE 时跳转)
+# - '>' 和 '<=' 先求右操作数，函数实参从右向左求值
+# - 函数名作为值时得到函数编号，编号顺序与 CillyCompiler 的函数表一致
+# 所有函数提升到模块顶层，顶层语句放在 main() 中，变量因此都是快速的局部变量。
+#
+# 与 VM 的一处差别：Cilly 函数调用直接映射为 Python 调用，递归深度受 Python 的递归限制约束。
+# run_py_module 在主线程中把进程全局的限制调高到 PY_RECURSION_LIMIT (只调高、不调低)，
+# 超出时报告 Cilly 错误；更深的递归需使用 VM 后端。再调高会让经由 _rcall 的递归耗尽 C 栈。
+
+PY_RECURSION_LIMIT = 20000
+
+class CillyToPyTranspiler:
+    def __init__(self, primitives=[]):
+        self.primitives = list(primitives)
+        self.functions = []  # [{name, params, id, py_name}]
+        self.scopes = [{}]  # Cilly 名字 -> Python 名字
+        self.current_function = None
+        self.loop_depth = 0
+        self.indent_level = 0
+        self.counter = 0
+        self.defs = []  # 提升到顶层的函数定义
+
+    def err(self, msg):
+        error('cilly py transpiler', msg)
+
+    def fresh(self, name):
+        self.counter += 1
+        return f'{name}_{self.counter}'
+
+    def _indent(self):
+        return '    ' * self.indent_level
+
+    def transpile(self, ast):
+        self.first_pass(ast)
+        self.indent_level = 1
+        body = self.visit(ast)
+        self.indent_level = 0
+        lines = ['# Generated from Cilly source', '']
+        for d in self.defs:
+            lines.append(d)
+            lines.append('')
+        lines.append('def main():')
+        lines.append(body if body else '    pass')
+        return '\n'.join(lines) + '\n'
+
+    def first_pass(self, node):
+        if node[0] == 'define':
+            _, name, expr = node
+            if expr[0] == 'fun':
+                self.add_function(name, expr[1])
+        elif node[0] == 'program' or node[0] == 'block':
+            for stmt in node[1]:
+                self.first_pass(stmt)
+
+    def add_function(self, name, params):
+        func_id = len(self.functions)
+        self.functions.append({
+            "name": name, "params": params, "id": func_id,
+            "py_name": f'_f{func_id}_{name}'
+        })
+        return self.functions[func_id]
+
+    def find_function(self, name):
+        for func in self.functions:
+            if func["name"] == name:
+                return func
+        return None
+
+    def define_var(self, name):
+        scope = self.scopes[-1]
+        if name in scope:
+            self.err(f'已定义变量: {name}')
+        scope[name] = self.fresh(name)
+        return scope[name]
+
+    def lookup_var(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return 'var', scope[name]
+        func = self.find_function(name)
+        if func is not None:
+            return 'fun', func
+        if name in self.primitives:
+            return 'primitive', name
+        self.err(f'未定义变量：{name}')
+
+    def visit(self, node):
+        method = getattr(self, f'translate_{node[0]}', None)
+        if method is None:
+            self.err(f'非法ast节点: {node[0]}')
+        return method(node)
+
+    def statements(self, stmts):
+        lines = [self.visit(s) for s in stmts]
+        lines = [l for l in lines if l]
+        return '\n'.join(lines) if lines else self._indent() + 'pass'
+
+    # --- 语句 ---
+
+    def translate_program(self, node):
+        return self.translate_block(['block', node[1]])
+
+    def translate_block(self, node):
+        self.scopes.append({})
+        body = self.statements(node[1])
+        self.scopes.pop()
+        return body
+
+    def nested(self, stmt):
+        self.indent_level += 1
+        body = self.visit(stmt)
+        self.indent_level -= 1
+        return body or (self._indent() + '    pass')
+
+    def translate_expr_stat(self, node):
+        return self._indent() + self.visit(node[1])
+
+    def translate_print(self, node):
+        args = [self.visit(a) for a in node[1]]
+        if any(has_call(a) for a in node[1][1:]):
+            # VM 每求出一项就立即输出；后面的参数有副作用时逐项输出
+            lines = [self._indent() + f'_print_item({a})' for a in args]
+            lines.append(self._indent() + '_print()')
+            return '\n'.join(lines)
+        return self._indent() + f'_print({", ".join(args)})'
+
+    def condition(self, node):
+        # 字面量条件在编译期就能确定 (也避免 "0 is not False" 的 SyntaxWarning)
+        if node[0] in ('num', 'str', 'true', 'null'):
+            return 'True'
+        if node[0] == 'false':
+            return 'False'
+        return f'{self.visit(node)} is not False'
+
+    def translate_if(self, node):
+        _, cond, true_s, false_s = node
+        code = self._indent() + f'if {self.condition(cond)}:\n' + self.nested(true_s)
+        if false_s is not None:
+            code += '\n' + self._indent() + 'else:\n' + self.nested(false_s)
+        return code
+
+    def translate_while(self, node):
+        _, cond, body = node
+        self.loop_depth += 1
+        code = self._indent() + f'while {self.condition(cond)}:\n' + self.nested(body)
+        self.loop_depth -= 1
+        return code
+
+    def translate_break(self, node):
+        if self.loop_depth == 0:
+            self.err("break语句必须在循环内部")
+        return self._indent() + 'break'
+
+    def translate_continue(self, node):
+        if self.loop_depth == 0:
+            self.err("continue语句必须在循环内部")
+        return self._indent() + 'continue'
+
+    def translate_define(self, node):
+        _, name, expr = node
+        if expr[0] != 'fun':
+            value = self.visit(expr)
+            return self._indent() + f'{self.define_var(name)} = {value}'
+
+        _, params, body = expr
+        func = self.find_function(name)
+        if func is None:
+            func = self.add_function(name, params)
+
+        saved = (self.scopes, self.current_function, self.loop_depth, self.indent_level)
+        self.scopes = [{}]
+        self.current_function = func
+        self.loop_depth = 0
+        self.indent_level = 1
+        py_params = [self.define_var(p) for p in params]
+        body_code = self.visit(body)
+        self.scopes, self.current_function, self.loop_depth, self.indent_level = saved
+
+        self.defs.append(f'def {func["py_name"]}({", ".join(py_params)}):\n{body_code}')
+        return self._indent() + f'{self.define_var(name)} = {func["id"]}'
+
+    def translate_assign(self, node):
+        _, name, expr = node
+        value = self.visit(expr)
+        kind, target = self.lookup_var(name)
+        if kind != 'var':
+            self.err(f'不能给函数名赋值: {name}')
+        return self._indent() + f'{target} = {value}'
+
+    def translate_return(self, node):
+        _, expr = node
+        if self.current_function is None:
+            self.err("return语句必须在函数内部")
+        if expr is None:
+            return self._indent() + 'return None'
+        return self._indent() + f'return {self.visit(expr)}'
+
+    # --- 表达式 ---
+
+    def translate_num(self, node):
+        return repr(node[1])
+
+    def translate_str(self, node):
+        return repr(node[1])
+
+    def translate_true(self, node):
+        return 'True'
+
+    def translate_false(self, node):
+        return 'False'
+
+    def translate_null(self, node):
+        return 'None'
+
+    def translate_id(self, node):
+        kind, target = self.lookup_var(node[1])
+        if kind == 'fun':
+            return str(target["id"])
+        if kind != 'var':
+            self.err(f'不能把 primitive 当作值使用: {node[1]}')
+        return target
+
+    def translate_unary(self, node):
+        _, op, e = node
+        if op == '-':
+            return f'(-{self.visit(e)})'
+        if op == '!':
+            return f'(not {self.visit(e)})'
+        self.err(f'非法一元运算符：{op}')
+
+    def translate_binary(self, node):
+        _, op, e1, e2 = node
+        if op == '&&':
+            t = self.fresh('_t')
+            return f'(False if ({t} := {self.visit(e1)}) is False else {self.visit(e2)})'
+        if op == '||':
+            t = self.fresh('_t')
+            return f'(True if ({t} := {self.visit(e1)}) is True else {self.visit(e2)})'
+        if op == '>':
+            return f'({self.visit(e2)} < {self.visit(e1)})'
+        if op == '<=':
+            return f'({self.visit(e2)} >= {self.visit(e1)})'
+        if op == '^':
+            op = '**'
+        if op not in ('+', '-', '*', '/', '%', '**', '==', '!=', '<', '>='):
+            self.err(f'非法二元运算符：{op}')
+        return f'({self.visit(e1)} {op} {self.visit(e2)})'
+
+    def translate_call(self, node):
+        _, func_expr, args = node
+        if func_expr[0] != 'id':
+            self.err(f'不支持的函数调用: {node}')
+        name = func_expr[1]
+        func = self.find_function(name)
+        if func is not None:
+            target = func["py_name"]
+        elif self.lookup_var(name)[0] == 'primitive':
+            target = f'_prim_{name}'
+        else:
+            self.err(f'不支持的函数调用: {node}')
+
+        args_py = [self.visit(a) for a in args]
+        if len(args) > 1 and any(has_call(a) for a in args):
+            # VM 从右向左求值实参；有副作用时保留这个顺序
+            return f'_rcall({target}, {", ".join(reversed(args_py))})'
+        return f'{target}({", ".join(args_py)})'
+
+    def translate_fun(self, node):
+        self.err("匿名函数暂不支持")
+
+def has_call(node):
+    if not isinstance(node, list) or not node:
+        return False
+    if node[0] == 'call':
+        return True
+    return any(has_call(n) for n in node[1:] if isinstance(n, list))
+
+# --- 运行时 ---
+
+def _rcall(f, *args):
+    return f(*reversed(args))
+
+def make_print(write):
+    def _print(*items):
+        write(''.join([f'{v} ' for v in items]) + '\n')
+
+    def _print_item(v):
+        write(f'{v} ')
+    return _print, _print_item
+
+def make_primitive(name, f):
+    argc = primitive_arity(name)
+
+    def prim(*args):
+        f(*args[:argc])
+    return prim
+
+def load_py_module(source, primitives=None, write=None, name='cilly_program', output=None):
+    # 输出经由与 VM 相同的输出端；write 为下游回调，默认写到 sys.stdout
+    if output is None:
+        output = BufferedSink(write)
+    module = types.ModuleType(name)
+    _print, _print_item = make_print(output.write)
+    module.__dict__.update({
+        '_output': output,
+        '_print': _print,
+        '_print_item': _print_item,
+        '_rcall': _rcall,
+    })
+    for prim_name, f in (primitives or {}).items():
+        module.__dict__[f'_prim_{prim_name}'] = make_primitive(prim_name, f)
+    exec(compile(source, f'<{name}>', 'exec'), module.__dict__)
+    return module
+
+def raise_recursion_limit(limit=PY_RECURSION_LIMIT):
+    # 递归限制是进程全局的：只在主线程中调高，从不调低，不影响其它线程中正在运行的程序。
+    # 在工作线程中运行 Python 后端的程序 (如 GUI) 应在启动时于主线程调用一次
+    if threading.current_thread() is threading.main_thread() and sys.getrecursionlimit() < limit:
+        sys.setrecursionlimit(limit)
+
+def run_py_module(module):
+    raise_recursion_limit()
+    try:
+        module.main()
+    except RecursionError:
+        error('cilly py', f'递归层数超过 Python 后端的上限 ({sys.getrecursionlimit()} 层)，更深的递归请使用 VM 后端')
+    finally:
+        module._output.flush()
+
+# Helper function to be called from other modules
+def cilly_to_py(ast, primitives=[]):
+    transpiler = CillyToPyTranspiler(primitives)
+    return transpiler.transpile(ast)
+
+def cilly_py_run(ast, primitives=None, write=None, output=None):
+    source = cilly_to_py(ast, list(primitives or {}))
+    run_py_module(load_py_module(source, primitives, write, output=output))
+    return source
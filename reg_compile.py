@@ -0,0 +1,386 @@
+from errors import error
+from primitives import primitive_id, get_primitive
+
+from vm import mk_num, mk_code
+from reg_vm import (
+    R_LOADK, R_LOADNULL, R_LOADTRUE, R_LOADFALSE, R_MOVE,
+    R_PRINT, R_PRINTLN, R_JMP, R_JMPT, R_JMPF,
+    R_CALL, R_RET, R_RETNULL, R_CALLPRIM,
+    R_NEG, R_NOT,
+    R_ADD, R_SUB, R_MUL, R_DIV, R_MOD, R_POW, R_EQ, R_NE, R_LT, R_GE,
+)
+
+BINARY_OPS = {
+    '+': R_ADD, '-': R_SUB, '*': R_MUL, '/': R_DIV, '%': R_MOD, '^': R_POW,
+    '==': R_EQ, '!=': R_NE, '<': R_LT, '>=': R_GE,
+}
+
+# CillyRegCompiler class
+# 与 CillyCompiler 读取同一棵 AST，生成寄存器式字节码。
+# 每个函数 (以及顶层程序) 拥有一个扁平的帧：变量按块作用域分配槽位，
+# 块结束后槽位被回收；表达式的临时值占用变量之上的槽位。
+class CillyRegCompiler:
+    def __init__(self):
+        self.code = mk_code()
+        self.consts = []
+        self.scopes = [{}]  # 名字 -> 槽位
+        self.functions = []  # 函数表 [{name, params, entry_point, id, frame_size}]
+        self.current_function = None
+        self.break_stack = []  # 当前循环中待回填的 break 跳转
+        self.continue_stack = []  # 当前循环的 continue 目标
+        self.top = 0  # 下一个空闲槽位
+        self.frame_size = 0  # 当前帧使用的最大槽位数
+        self.primitives = []
+        self.__init_visitors()
+
+    def err(self, msg):
+        error('cilly reg compiler', msg)
+
+    def add_const(self, c):
+        for i in range(len(self.consts)):
+            if self.consts[i] == c:
+                return i
+        self.consts.append(c)
+        return len(self.consts) - 1
+
+    def get_next_emit_addr(self):
+        return len(self.code)
+
+    def emit(self, opcode, *operands):
+        addr = self.get_next_emit_addr()
+        self.code.append(opcode)
+        self.code.extend(operands)
+        return addr
+
+    def backpatch(self, addr, offset, value):
+        self.code[addr + offset] = value
+
+    def alloc(self):
+        slot = self.top
+        self.top += 1
+        self.frame_size = max(self.frame_size, self.top)
+        return slot
+
+    def define_var(self, name, slot):
+        scope = self.scopes[-1]
+        if name in scope:
+            self.err(f'已定义变量: {name}')
+        scope[name] = slot
+
+    def lookup_var(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return 'var', scope[name]
+        for func_id, func in enumerate(self.functions):
+            if func["name"] == name:
+                return 'fun', func_id
+        if name in self.primitives:
+            prim_id = primitive_id(name)
+            if prim_id is None:
+                self.err(f'未注册的 primitive: {name}')
+            return 'primitive', prim_id
+
+        self.err(f'未定义变量：{name}')
+
+    def find_function(self, name):
+        for i, func in enumerate(self.functions):
+            if func["name"] == name:
+                return i
+        return None
+
+    def first_pass(self, node):
+        if node[0] == 'define':
+            _, name, expr = node
+            if expr[0] == 'fun':
+                _, params, body = expr
+                self.functions.append({
+                    "name": name, "params": params,
+                    "entry_point": -1, "id": len(self.functions), "frame_size": 0
+                })
+        elif node[0] == 'program' or node[0] == 'block':
+            _, statements = node
+            for stmt in statements:
+                self.first_pass(stmt)
+
+    def compile(self, ast, primitives=[]):
+        self.primitives = primitives
+        self.first_pass(ast)
+        self.visit(ast)
+        return self.code, self.consts, self.functions, self.frame_size
+
+    # --- 语句 ---
+
+    def visit(self, node):
+        tag = node[0]
+        if tag not in self.visitors:
+            self.err(f'非法ast节点: {tag}')
+        self.visitors[tag](node)
+
+    def compile_program(self, node):
+        _, statements = node
+        self.visit(['block', statements])
+
+    def compile_expr_stat(self, node):
+        _, e = node
+        mark = self.top
+        self.expr(e)
+        self.top = mark
+
+    def compile_print(self, node):
+        _, args = node
+        for a in args:
+            mark = self.top
+            self.emit(R_PRINT, self.expr(a))
+            self.top = mark
+        self.emit(R_PRINTLN)
+
+    def compile_if(self, node):
+        _, cond, true_s, false_s = node
+        mark = self.top
+        c = self.expr(cond)
+        self.top = mark
+        addr1 = self.emit(R_JMPF, c, -1)
+        self.visit(true_s)
+        if false_s is None:
+            self.backpatch(addr1, 2, self.get_next_emit_addr())
+        else:
+            addr2 = self.emit(R_JMP, -1)
+            self.backpatch(addr1, 2, self.get_next_emit_addr())
+            self.visit(false_s)
+            self.backpatch(addr2, 1, self.get_next_emit_addr())
+
+    def compile_while(self, node):
+        _, cond, body = node
+        loop_start = self.get_next_emit_addr()
+        mark = self.top
+        c = self.expr(cond)
+        self.top = mark
+        exit_jmp = self.emit(R_JMPF, c, -1)
+        old_break, old_continue = self.break_stack, self.continue_stack
+        self.break_stack = []
+        self.continue_stack = [loop_start]
+        self.visit(body)
+        self.emit(R_JMP, loop_start)
+        loop_end = self.get_next_emit_addr()
+        self.backpatch(exit_jmp, 2, loop_end)
+        for addr in self.break_stack:
+            self.backpatch(addr, 1, loop_end)
+        self.break_stack, self.continue_stack = old_break, old_continue
+
+    def compile_break(self, node):
+        if not self.continue_stack:
+            self.err("break语句必须在循环内部")
+        self.break_stack.append(self.emit(R_JMP, -1))
+
+    def compile_continue(self, node):
+        if not self.continue_stack:
+            self.err("continue语句必须在循环内部")
+        self.emit(R_JMP, self.continue_stack[-1])
+
+    def compile_block(self, node):
+        _, statements = node
+        mark = self.top
+        self.scopes.append({})
+        for s in statements:
+            self.visit(s)
+        self.scopes.pop()
+        self.top = mark
+
+    def compile_define(self, node):
+        _, name, expr = node
+        if expr[0] == 'fun':
+            _, params, body = expr
+            func_id = self.find_function(name)
+            if func_id is None:
+                func_id = len(self.functions)
+                self.functions.append({
+                    "name": name, "params": params,
+                    "entry_point": -1, "id": func_id, "frame_size": 0
+                })
+            skip_addr = self.emit(R_JMP, -1)
+            self.functions[func_id]["entry_point"] = self.get_next_emit_addr()
+
+            saved = (self.current_function, self.scopes, self.top, self.frame_size,
+                     self.break_stack, self.continue_stack)
+            self.current_function = func_id
+            self.scopes = [{}]
+            self.top = self.frame_size = 0
+            self.break_stack, self.continue_stack = [], []
+            for param in params:
+                self.define_var(param, self.alloc())
+            self.visit(body)
+            # 末尾总是补一条 RETNULL，防止没有 return 的分支落入函数体之后的代码
+            self.emit(R_RETNULL)
+            self.functions[func_id]["frame_size"] = self.frame_size
+            (self.current_function, self.scopes, self.top, self.frame_size,
+             self.break_stack, self.continue_stack) = saved
+
+            self.backpatch(skip_addr, 1, self.get_next_emit_addr())
+            slot = self.alloc()
+            self.emit(R_LOADK, slot, self.add_const(mk_num(func_id)))
+            self.define_var(name, slot)
+        else:
+            slot = self.alloc()
+            self.expr(expr, slot)
+            self.top = slot + 1
+            self.define_var(name, slot)
+
+    def compile_assign(self, node):
+        _, name, expr = node
+        kind, slot = self.lookup_var(name)
+        if kind != 'var':
+            self.err(f'不能给函数名赋值: {name}')
+        mark = self.top
+        self.expr(expr, slot)
+        self.top = mark
+
+    def compile_return(self, node):
+        _, expr = node
+        if self.current_function is None:
+            self.err("return语句必须在函数内部")
+        if expr is not None:
+            mark = self.top
+            self.emit(R_RET, self.expr(expr))
+            self.top = mark
+        else:
+            self.emit(R_RETNULL)
+
+    # --- 表达式 ---
+    # expr() 返回保存结果的槽位；给出 dst 时结果必定写入 dst。
+
+    def expr(self, node, dst=None):
+        tag = node[0]
+        if tag not in self.expr_visitors:
+            self.err(f'非法ast节点: {tag}')
+        return self.expr_visitors[tag](node, dst)
+
+    def target(self, dst):
+        return self.alloc() if dst is None else dst
+
+    def compile_literal(self, node, dst):
+        d = self.target(dst)
+        tag = node[0]
+        if tag == 'null':
+            self.emit(R_LOADNULL, d)
+        elif tag == 'true':
+            self.emit(R_LOADTRUE, d)
+        elif tag == 'false':
+            self.emit(R_LOADFALSE, d)
+        else:
+            self.emit(R_LOADK, d, self.add_const(node))
+        return d
+
+    def compile_id(self, node, dst):
+        _, name = node
+        kind, index = self.lookup_var(name)
+        if kind == 'fun':
+            d = self.target(dst)
+            self.emit(R_LOADK, d, self.add_const(mk_num(index)))
+            return d
+        if kind != 'var':
+            self.err(f'不能把 primitive 当作值使用: {name}')
+        if dst is None:
+            return index
+        if dst != index:
+            self.emit(R_MOVE, dst, index)
+        return dst
+
+    def compile_unary(self, node, dst):
+        _, op, e = node
+        if op not in ('-', '!'):
+            self.err(f'非法一元运算符：{op}')
+        mark = self.top
+        s = self.expr(e)
+        self.top = mark
+        d = self.target(dst)
+        self.emit(R_NEG if op == '-' else R_NOT, d, s)
+        return d
+
+    def compile_binary(self, node, dst):
+        _, op, e1, e2 = node
+        if op in ('&&', '||'):
+            d = self.target(dst)
+            mark = self.top
+            s1 = self.expr(e1)
+            self.top = mark
+            addr1 = self.emit(R_JMPF if op == '&&' else R_JMPT, s1, -1)
+            self.expr(e2, d)
+            self.top = mark
+            addr2 = self.emit(R_JMP, -1)
+            self.backpatch(addr1, 2, self.get_next_emit_addr())
+            self.emit(R_LOADFALSE if op == '&&' else R_LOADTRUE, d)
+            self.backpatch(addr2, 1, self.get_next_emit_addr())
+            return d
+
+        mark = self.top
+        if op in ('>', '<='):
+            # 与栈式编译器相同：先求右操作数，再交换比较方向
+            s2 = self.expr(e2)
+            s1 = self.expr(e1)
+            s1, s2 = s2, s1
+            opcode = R_LT if op == '>' else R_GE
+        else:
+            if op not in BINARY_OPS:
+                self.err(f'非法二元运算符：{op}')
+            s1 = self.expr(e1)
+            s2 = self.expr(e2)
+            opcode = BINARY_OPS[op]
+        self.top = mark
+        d = self.target(dst)
+        self.emit(opcode, d, s1, s2)
+        return d
+
+    def compile_call(self, node, dst):
+        _, func_expr, args = node
+        if func_expr[0] == 'id':
+            _, name = func_expr
+            func_id = self.find_function(name)
+            if func_id is None:
+                kind, prim_id = self.lookup_var(name)
+                if kind != 'primitive':
+                    self.err(f'不支持的函数调用: {node}')
+                arity = get_primitive(prim_id)["arity"]
+                if len(args) != arity:
+                    self.err(f'primitive {name} 需要 {arity} 个参数，实际 {len(args)} 个')
+
+            mark = self.top
+            base = self.top
+            for _ in args:
+                self.alloc()
+            # 与栈式编译器一致，从右向左求值实参
+            for i in reversed(range(len(args))):
+                self.expr(args[i], base + i)
+            self.top = mark
+            d = self.target(dst)
+            if func_id is not None:
+                self.emit(R_CALL, d, func_id, base, len(args))
+            else:
+                self.emit(R_CALLPRIM, d, prim_id, base, len(args))
+            return d
+
+        self.err(f'不支持的函数调用: {node}')
+
+    def compile_fun(self, node, dst):
+        self.err("匿名函数暂不支持")
+
+    def __init_visitors(self):
+        self.visitors = {
+            'program': self.compile_program, 'expr_stat': self.compile_expr_stat,
+            'print': self.compile_print, 'if': self.compile_if,
+            'while': self.compile_while, 'break': self.compile_break,
+            'continue': self.compile_continue, 'define': self.compile_define,
+            'assign': self.compile_assign, 'block': self.compile_block,
+            'return': self.compile_return,
+        }
+        self.expr_visitors = {
+            'unary': self.compile_unary, 'binary': self.compile_binary,
+            'id': self.compile_id, 'fun': self.compile_fun, 'call': self.compile_call,
+            'num': self.compile_literal, 'str': self.compile_literal,
+            'true': self.compile_literal, 'false': self.compile_literal,
+            'null': self.compile_literal,
+        }
+
+# cilly_reg_compiler function
+def cilly_reg_compiler(ast, primitives=[]):
+    compiler = CillyRegCompiler()
+    return compiler.compile(ast, primitives)
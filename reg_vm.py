@@ -0,0 +1,291 @@
+from errors import error
+from output import BufferedSink
+from primitives import PRIMITIVES, RETURNS_VALUE, get_primitive
+from vm import mk_num, mk_bool, mk_value, TRUE, FALSE, NULL, val, encode_code, bind_primitives
+
+# 寄存器式字节码：三地址指令，操作数是当前函数帧中的槽位编号。
+# 与栈式 VM 使用同一套值表示 (['num', 1], TRUE, NULL ...)，
+# 因此两个后端的输出可以直接对比。
+
+# Bytecode definitions
+R_LOADK = 1
+R_LOADNULL = 2
+R_LOADTRUE = 3
+R_LOADFALSE = 4
+R_MOVE = 5
+R_PRINT = 7
+R_PRINTLN = 8
+R_JMP = 9
+R_JMPT = 10
+R_JMPF = 11
+R_CALL = 15
+R_RET = 16
+R_RETNULL = 17
+R_CALLPRIM = 18
+R_NEG = 101
+R_NOT = 102
+R_ADD = 111
+R_SUB = 112
+R_MUL = 113
+R_DIV = 114
+R_MOD = 115
+R_POW = 116
+R_EQ = 117
+R_NE = 118
+R_LT = 119
+R_GE = 120
+
+REG_OPS_NAME = {
+    R_LOADK: ('LOADK', 3),
+    R_LOADNULL: ('LOADNULL', 2),
+    R_LOADTRUE: ('LOADTRUE', 2),
+    R_LOADFALSE: ('LOADFALSE', 2),
+    R_MOVE: ('MOVE', 3),
+    R_PRINT: ('PRINT', 2),
+    R_PRINTLN: ('PRINTLN', 1),
+    R_JMP: ('JMP', 2),
+    R_JMPT: ('JMPT', 3),
+    R_JMPF: ('JMPF', 3),
+    R_CALL: ('CALL', 5),
+    R_RET: ('RET', 2),
+    R_RETNULL: ('RETNULL', 1),
+    R_CALLPRIM: ('CALLPRIM', 5),
+    R_NEG: ('NEG', 3),
+    R_NOT: ('NOT', 3),
+    R_ADD: ('ADD', 4),
+    R_SUB: ('SUB', 4),
+    R_MUL: ('MUL', 4),
+    R_DIV: ('DIV', 4),
+    R_MOD: ('MOD', 4),
+    R_POW: ('POW', 4),
+    R_EQ: ('EQ', 4),
+    R_NE: ('NE', 4),
+    R_LT: ('LT', 4),
+    R_GE: ('GE', 4),
+}
+
+class CillyRegVM:
+    def __init__(self, code, consts, functions, main_frame_size, signals=None, primitives=None, output=None):
+        self.code = encode_code(code)
+        self.consts = consts
+        self.functions = functions
+        self.signals = signals if signals is not None else {}
+        self.primitives = primitives if primitives is not None else {}
+        self.prim_table = bind_primitives(self.primitives, self.signals, self.err)
+        self.output = output if output is not None else BufferedSink()
+        self.write = self.output.write
+
+        self.frame = [NULL] * main_frame_size
+        self.call_stack = []
+        self.pc = 0
+
+        self.ops = {
+            R_LOADK: self.loadk, R_LOADNULL: self.loadnull, R_LOADTRUE: self.loadtrue,
+            R_LOADFALSE: self.loadfalse, R_MOVE: self.move,
+            R_PRINT: self.print_item, R_PRINTLN: self.print_newline,
+            R_JMP: self.jmp, R_JMPT: self.jmp_true, R_JMPF: self.jmp_false,
+            R_CALL: self.call_proc, R_RET: self.return_value_proc, R_RETNULL: self.return_proc,
+            R_CALLPRIM: self.call_primitive_proc,
+            R_NEG: self.neg, R_NOT: self.not_,
+            R_ADD: self.add, R_SUB: self.sub, R_MUL: self.mul, R_DIV: self.div,
+            R_MOD: self.mod, R_POW: self.pow, R_EQ: self.eq, R_NE: self.ne,
+            R_LT: self.lt, R_GE: self.ge,
+        }
+
+    def err(self, msg):
+        error('cilly reg vm', msg)
+
+    def loadk(self, pc):
+        code = self.code
+        self.frame[code[pc + 1]] = self.consts[code[pc + 2]]
+        return pc + 3
+
+    def loadnull(self, pc):
+        self.frame[self.code[pc + 1]] = NULL
+        return pc + 2
+
+    def loadtrue(self, pc):
+        self.frame[self.code[pc + 1]] = TRUE
+        return pc + 2
+
+    def loadfalse(self, pc):
+        self.frame[self.code[pc + 1]] = FALSE
+        return pc + 2
+
+    def move(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = frame[code[pc + 2]]
+        return pc + 3
+
+    def print_item(self, pc):
+        self.write(f'{val(self.frame[self.code[pc + 1]])} ')
+        return pc + 2
+
+    def print_newline(self, pc):
+        self.write('\n')
+        return pc + 1
+
+    def jmp(self, pc):
+        return self.code[pc + 1]
+
+    def jmp_true(self, pc):
+        code = self.code
+        return code[pc + 2] if self.frame[code[pc + 1]] == TRUE else pc + 3
+
+    def jmp_false(self, pc):
+        code = self.code
+        return code[pc + 2] if self.frame[code[pc + 1]] == FALSE else pc + 3
+
+    def neg(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_num(-val(frame[code[pc + 2]]))
+        return pc + 3
+
+    def not_(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_bool(not val(frame[code[pc + 2]]))
+        return pc + 3
+
+    def add(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_num(val(frame[code[pc + 2]]) + val(frame[code[pc + 3]]))
+        return pc + 4
+
+    def sub(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_num(val(frame[code[pc + 2]]) - val(frame[code[pc + 3]]))
+        return pc + 4
+
+    def mul(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_num(val(frame[code[pc + 2]]) * val(frame[code[pc + 3]]))
+        return pc + 4
+
+    def div(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_num(val(frame[code[pc + 2]]) / val(frame[code[pc + 3]]))
+        return pc + 4
+
+    def mod(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_num(val(frame[code[pc + 2]]) % val(frame[code[pc + 3]]))
+        return pc + 4
+
+    def pow(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_num(val(frame[code[pc + 2]]) ** val(frame[code[pc + 3]]))
+        return pc + 4
+
+    def eq(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_bool(val(frame[code[pc + 2]]) == val(frame[code[pc + 3]]))
+        return pc + 4
+
+    def ne(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_bool(val(frame[code[pc + 2]]) != val(frame[code[pc + 3]]))
+        return pc + 4
+
+    def lt(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_bool(val(frame[code[pc + 2]]) < val(frame[code[pc + 3]]))
+        return pc + 4
+
+    def ge(self, pc):
+        code, frame = self.code, self.frame
+        frame[code[pc + 1]] = mk_bool(val(frame[code[pc + 2]]) >= val(frame[code[pc + 3]]))
+        return pc + 4
+
+    def call_proc(self, pc):
+        code, frame = self.code, self.frame
+        func_id = code[pc + 2]
+        if func_id >= len(self.functions):
+            self.err(f'非法函数ID: {func_id}')
+        func = self.functions[func_id]
+        base = code[pc + 3]
+        argc = min(code[pc + 4], len(func["params"]))
+
+        callee = [NULL] * func["frame_size"]
+        callee[:argc] = frame[base:base + argc]
+
+        self.call_stack.append((pc + 5, frame, code[pc + 1]))
+        self.frame = callee
+        return func["entry_point"]
+
+    def return_value_proc(self, pc):
+        if not self.call_stack: self.err('函数返回栈为空')
+        v = self.frame[self.code[pc + 1]]
+        return_addr, self.frame, dst = self.call_stack.pop()
+        self.frame[dst] = v
+        return return_addr
+
+    def return_proc(self, pc):
+        if not self.call_stack: self.err('函数返回栈为空')
+        return_addr, self.frame, dst = self.call_stack.pop()
+        self.frame[dst] = NULL
+        return return_addr
+
+    def call_primitive_proc(self, pc):
+        code, frame = self.code, self.frame
+        prim_id = code[pc + 2]
+        base = code[pc + 3]
+        result = self.prim_table[prim_id](*[val(v) for v in frame[base:base + code[pc + 4]]])
+
+        if PRIMITIVES[prim_id]["returns"] == RETURNS_VALUE:
+            frame[code[pc + 1]] = mk_value(result)
+        else:
+            frame[code[pc + 1]] = NULL
+        return pc + 5
+
+    def get_opcode_proc(self, opcode):
+        if opcode not in self.ops:
+            self.err(f'非法opcode: {opcode}')
+        return self.ops[opcode]
+
+    def run(self):
+        try:
+            while self.pc < len(self.code):
+                opcode = self.code[self.pc]
+                proc = self.get_opcode_proc(opcode)
+                self.pc = proc(self.pc)
+        finally:
+            self.output.flush()
+
+def cilly_reg_vm(code, consts, functions, main_frame_size, signals=None, primitives=None, output=None):
+    vm = CillyRegVM(code, consts, functions, main_frame_size, signals, primitives, output)
+    vm.run()
+
+def cilly_reg_vm_dis(code, consts, functions=None):
+    code = encode_code(code)
+    entries = {}
+    for func in functions or []:
+        entries[func["entry_point"]] = func["name"]
+
+    output = []
+    pc = 0
+    while pc < len(code):
+        opcode = code[pc]
+        name, size = REG_OPS_NAME.get(opcode, (f'UNKNOWN {opcode}', 1))
+        if pc in entries:
+            output.append(f'{entries[pc]}:')
+
+        operands = list(code[pc + 1:pc + size])
+        if opcode == R_LOADK:
+            line = f'{pc:04d}\t{name} r{operands[0]} {operands[1]} ({consts[operands[1]]})'
+        elif opcode in (R_JMP,):
+            line = f'{pc:04d}\t{name} {operands[0]}'
+        elif opcode in (R_JMPT, R_JMPF):
+            line = f'{pc:04d}\t{name} r{operands[0]} {operands[1]}'
+        elif opcode == R_CALL:
+            dst, func_id, base, argc = operands
+            line = f'{pc:04d}\t{name} r{dst} {func_id} r{base} {argc}'
+        elif opcode == R_CALLPRIM:
+            dst, prim_id, base, argc = operands
+            line = f'{pc:04d}\t{name} r{dst} {prim_id} ({get_primitive(prim_id)["name"]}) r{base} {argc}'
+        else:
+            line = f'{pc:04d}\t{name}' + ''.join(f' r{o}' for o in operands)
+
+        output.append(line)
+        pc += size
+
+    return "\n".join(output)
@@ -0,0 +1,107 @@
+'''
+Cilly 采样剖析器
+
+不对每条指令或每次调用插桩：由采样器驱动 VM，每次 run_for(slice_size)
+之后检查时钟，到了采样间隔就记录一次当前 pc 和由 call_stack 重建的
+Cilly 调用栈。解释循环本身不变，开销只有每片一次的时钟读取和采样。
+
+调用栈的重建：每个函数体在字节码中是一段连续区间 (编译器在函数体前
+生成 JMP 跳过它)，据此建立 pc -> 函数 的表；call_stack 中各帧的返回地址
+属于调用方函数，当前 pc 属于栈顶函数。
+
+结果聚合为 flame graph 使用的 folded-stack 格式，每行一个调用栈和样本数：
+
+    <main>;fern;fern;fern 812
+    <main>;fern;fern:7 40          # 字节码带行号表时栈顶帧带上行号
+
+    sampler = CillySampler(vm, interval=0.001)
+    sampler.run()
+    open('out.folded', 'w').write(sampler.folded())
+'''
+
+import time
+from collections import Counter
+
+from vm import RUNNING, JMP
+
+SAMPLE_INTERVAL = 0.001  # 秒，1 kHz
+SAMPLE_SLICE = 1000  # 两次时钟检查之间执行的指令数 (远小于 1 ms)
+
+MAIN = '<main>'
+
+def function_owners(code, functions):
+    # pc -> func_id，不属于任何函数体的 pc 为 -1 (主程序)
+    owners = [-1] * len(code)
+    for func in sorted(functions, key=lambda f: f["entry_point"]):
+        entry = func["entry_point"]
+        # 函数体前是 JMP <函数体末尾>；嵌套定义的函数入口更靠后，后写覆盖外层
+        if entry >= 2 and code[entry - 2] == JMP:
+            end = code[entry - 1]
+            owners[entry:end] = [func["id"]] * (end - entry)
+    return owners
+
+class CillySampler:
+    def __init__(self, vm, interval=SAMPLE_INTERVAL, slice_size=SAMPLE_SLICE,
+                 pc_to_line=None, clock=time.perf_counter):
+        self.vm = vm
+        self.interval = interval
+        self.slice_size = slice_size
+        # pc -> 源码行号；默认使用字节码自带的行号表 (没有时不标行号)
+        if pc_to_line is None and getattr(vm.code, 'linetable', None) is not None:
+            pc_to_line = vm.code.linetable.pc_to_line
+        self.pc_to_line = pc_to_line
+        self.clock = clock
+        self.owners = function_owners(vm.code, vm.functions)
+        self.names = [func["name"] for func in vm.functions]
+        self.samples = Counter()  # 调用栈 (元组) -> 样本数
+        self.sample_count = 0
+        self.elapsed = 0.0
+
+    def function_name(self, pc):
+        owner = self.owners[pc] if 0 <= pc < len(self.owners) else -1
+        return MAIN if owner < 0 else self.names[owner]
+
+    def stack(self):
+        vm = self.vm
+        # 最外层帧的返回地址属于主程序；每帧的返回地址属于它的调用方
+        frames = [self.function_name(return_addr) for return_addr, _ in vm.call_stack.stack]
+        frames.append(self.function_name(vm.pc))
+        if frames[0] != MAIN:
+            frames.insert(0, MAIN)
+        if self.pc_to_line is not None:
+            line = self.pc_to_line(vm.pc)
+            if line is not None:
+                frames[-1] = f'{frames[-1]}:{line}'
+        return tuple(frames)
+
+    def sample(self):
+        self.samples[self.stack()] += 1
+        self.sample_count += 1
+
+    def run(self):
+        # 运行到结束 (或等待异步 primitive / 出错)，返回 VM 状态
+        vm = self.vm
+        clock, interval, slice_size = self.clock, self.interval, self.slice_size
+        start = clock()
+        next_sample = start + interval
+        status = RUNNING
+        while status == RUNNING:
+            status = vm.run_for(slice_size)
+            now = clock()
+            if now >= next_sample and status == RUNNING:
+                self.sample()
+                next_sample += interval
+                if next_sample <= now:  # 落后太多时不补采
+                    next_sample = now + interval
+        self.elapsed += clock() - start
+        return status
+
+    def folded(self):
+        lines = [f'{";".join(stack)} {count}' for stack, count in self.samples.most_common()]
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.folded())
+
+__all__ = ['CillySampler', 'SAMPLE_INTERVAL', 'SAMPLE_SLICE', 'function_owners']
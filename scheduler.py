@@ -0,0 +1,126 @@
+'''
+Cilly 多程序调度器 (asyncio)
+
+在一个事件循环中协作式地交错运行多个 CillyVM：每个程序是一个 asyncio
+任务，每次 run_for(slice_size) 执行一片指令后 await asyncio.sleep(0) 让出，
+就绪任务按 FIFO 轮转，因此每个程序每轮得到相同的指令预算 (公平调度)。
+
+primitive 可以是 async 函数：VM 在调用处暂停 (WAITING)，调度器 await
+其结果后 resume，其间其它程序继续运行。
+
+    sched = CillyScheduler(primitives={"fetch": fetch}, slice_size=1000)
+    result = await sched.run_program(source, timeout=1.0)
+    results = await sched.run_all(sources, timeout=1.0)
+
+每个程序的结果是一个字典：
+    {"id", "name", "status", "output", "error", "latency"}
+status 为 FINISHED / ERROR / TIMEOUT / CANCELLED。
+'''
+
+import asyncio
+import time
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, RUNNING, FINISHED, ERROR, WAITING
+from output import StringSink
+from errors import error_text
+
+TIMEOUT = 'timeout'
+CANCELLED = 'cancelled'
+
+SCHED_SLICE = 1000  # 每片执行的指令数
+
+class CillyScheduler:
+    def __init__(self, primitives=None, slice_size=SCHED_SLICE, max_concurrency=None):
+        self.primitives = primitives if primitives is not None else {}
+        self.slice_size = slice_size
+        # 限制同时处于运行中的 VM 个数，其余程序排队等待
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.next_id = 0
+        self.tasks = {}  # id -> asyncio.Task
+
+    def compile(self, source):
+        ast = cilly_parser(cilly_lexer(source))
+        return cilly_vm_compiler(ast, list(self.primitives))
+
+    def submit(self, source, timeout=None, name=None):
+        # 必须在事件循环中调用；返回的 asyncio.Task 的结果即程序结果字典
+        prog_id = self.next_id
+        self.next_id += 1
+        task = asyncio.get_running_loop().create_task(self.execute(prog_id, name, source, timeout))
+        self.tasks[prog_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(prog_id, None))
+        return task
+
+    def cancel(self, task):
+        return task.cancel()
+
+    def cancel_all(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
+
+    async def run_program(self, source, timeout=None, name=None):
+        return await self.submit(source, timeout, name)
+
+    async def run_all(self, sources, timeout=None):
+        tasks = [self.submit(src, timeout) for src in sources]
+        return await asyncio.gather(*tasks)
+
+    async def execute(self, prog_id, name, source, timeout):
+        start = time.perf_counter()
+        output = StringSink()
+        result = {"id": prog_id, "name": name, "status": None, "output": "", "error": None}
+        try:
+            if self.semaphore is not None:
+                async with self.semaphore:
+                    vm = await self.start(source, output, result, timeout)
+            else:
+                vm = await self.start(source, output, result, timeout)
+            if vm is not None:
+                result["status"] = vm.status
+                if vm.status == ERROR:
+                    result["error"] = error_text(vm.error)
+        except asyncio.TimeoutError:
+            result["status"] = TIMEOUT
+        except asyncio.CancelledError:
+            result["status"] = CANCELLED
+        result["output"] = output.getvalue()
+        result["latency"] = time.perf_counter() - start
+        return result
+
+    async def start(self, source, output, result, timeout):
+        try:
+            compiled = self.compile(source)
+        except Exception as e:
+            result["status"] = ERROR
+            result["error"] = str(e)
+            return None
+        vm = CillyVM(*compiled, primitives=self.primitives, output=output)
+        await asyncio.wait_for(self.drive(vm), timeout)
+        return vm
+
+    async def drive(self, vm):
+        slice_size = self.slice_size
+        try:
+            while True:
+                status = vm.run_for(slice_size)
+                if status == RUNNING:
+                    await asyncio.sleep(0)
+                elif status == WAITING:
+                    try:
+                        value = await vm.pending
+                    except Exception as e:
+                        vm.status = ERROR
+                        vm.error = e
+                        return ERROR
+                    vm.resume(value)
+                else:
+                    return status
+        finally:
+            if vm.status == WAITING:
+                vm.pending.close()  # 被取消或超时时关闭未完成的协程
+            vm.output.flush()
+
+__all__ = ['CillyScheduler', 'SCHED_SLICE', 'TIMEOUT', 'CANCELLED', 'FINISHED', 'ERROR']
@@ -0,0 +1,197 @@
+'''
+CillyVM 执行状态快照
+
+把 VM 的完整执行状态 (pc、操作数栈、调用栈、作用域链、调用计数) 序列化为
+紧凑的二进制块，之后可以在由同一程序构造的新 VM 上恢复，从初始化完成的
+状态继续运行，而不必重新执行前导代码。
+
+作用域列表在 self.scopes 与 active_scopes 之间共享同一对象；快照按对象
+身份建表，恢复后的共享关系与原 VM 相同。调用栈只保存返回地址和调用方
+作用域链的长度。帧池不保存，恢复后的 VM 从空池开始。
+快照记录程序 (code/consts/functions) 的 sha256，只能恢复到同一程序上。
+
+布局 (小端序):
+
+    magic            4s   b'\\x7fCSN'
+    format_version   H    SNAPSHOT_FORMAT_VERSION
+    bytecode_version H    vm.BYTECODE_VERSION
+    program_hash     32s
+    pc               i32
+    status           str
+    scopes           u32 个数, 每项: u32 长度 + value*
+    vm.scopes        u32 长度 + u32 scope 下标*
+    active_scopes    u32 长度 + u32 scope 下标*
+    stack            u32 长度 + value*, 3 * u32 (push/pop/max 计数)
+    call_stack       u32 长度 + (i32 返回地址, u32 作用域链长度)*, 3 * u32
+    call_counts      u32 长度 + u32*
+'''
+
+import hashlib
+import struct
+
+from errors import error
+from vm import BYTECODE_VERSION, TRUE, FALSE, NULL, WAITING, ERROR, code_to_bytes
+from cbc import _Writer, _Reader, write_const, read_const_body
+
+SNAPSHOT_MAGIC = b'\x7fCSN'
+SNAPSHOT_FORMAT_VERSION = 2
+
+# 值的类型标记，0-3 为 cbc 的常量类型 (整数/浮点/字符串/大整数)
+VALUE_NULL = 16
+VALUE_TRUE = 17
+VALUE_FALSE = 18
+VALUE_NAME = 19  # 作用域中尚未被赋值覆盖的变量名 (编译器的名字表)
+
+_HEADER = struct.Struct('<4sHH32s')
+
+def err(msg):
+    error('cilly snapshot', msg)
+
+def program_hash(code, consts, functions):
+    h = hashlib.sha256()
+    h.update(code_to_bytes(code))
+    h.update(repr(consts).encode('utf-8'))
+    h.update(repr([(f["name"], f.get("params", []), f["entry_point"]) for f in functions]).encode('utf-8'))
+    return h.digest()
+
+# --- 写入 ---
+
+def write_value(w, v):
+    if v is NULL:
+        w.u8(VALUE_NULL)
+    elif v is TRUE:
+        w.u8(VALUE_TRUE)
+    elif v is FALSE:
+        w.u8(VALUE_FALSE)
+    elif isinstance(v, str):
+        w.u8(VALUE_NAME)
+        w.text(v)
+    else:
+        write_const(w, v)
+
+class _Table:
+    # 按对象身份编号，相同对象只写一次
+    def __init__(self):
+        self.index = {}
+        self.items = []
+
+    def ref(self, obj):
+        key = id(obj)
+        if key not in self.index:
+            self.index[key] = len(self.items)
+            self.items.append(obj)
+        return self.index[key]
+
+def dump_snapshot(vm):
+    if vm.status == WAITING:
+        err('VM 正在等待异步 primitive，无法保存快照')
+    if vm.status == ERROR:
+        err('VM 已出错，无法保存快照')
+
+    scopes = _Table()
+    vm_scope_refs = [scopes.ref(s) for s in vm.scopes]
+    active_refs = [scopes.ref(s) for s in vm.active_scopes]
+
+    w = _Writer()
+    w.raw(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, BYTECODE_VERSION,
+                       program_hash(vm.code, vm.consts, vm.functions)))
+    w.i32(vm.pc)
+    w.text(vm.status)
+
+    w.u32(len(scopes.items))
+    for scope in scopes.items:
+        w.u32(len(scope))
+        for v in scope:
+            write_value(w, v)
+
+    for refs in (vm_scope_refs, active_refs):
+        w.u32(len(refs))
+        for i in refs:
+            w.u32(i)
+
+    w.u32(len(vm.stack.stack))
+    for v in vm.stack.stack:
+        write_value(w, v)
+    write_counts(w, vm.stack)
+
+    w.u32(len(vm.call_stack.stack))
+    for return_addr, depth in vm.call_stack.stack:
+        w.i32(return_addr)
+        w.u32(depth)
+    write_counts(w, vm.call_stack)
+
+    w.u32(len(vm.call_counts))
+    for c in vm.call_counts:
+        w.u32(c)
+    return w.getvalue()
+
+def write_counts(w, stack):
+    w.u32(stack.push_count)
+    w.u32(stack.pop_count)
+    w.u32(stack.max_depth)
+
+# --- 读取 ---
+
+def read_value(r):
+    tag = r.u8()
+    if tag == VALUE_NULL:
+        return NULL
+    if tag == VALUE_TRUE:
+        return TRUE
+    if tag == VALUE_FALSE:
+        return FALSE
+    if tag == VALUE_NAME:
+        return r.text()
+    return read_const_body(r, tag)
+
+def read_counts(r):
+    return r.u32(), r.u32(), r.u32()
+
+def set_counts(stack, counts):
+    stack.push_count, stack.pop_count, stack.max_depth = counts
+
+def load_snapshot(vm, data):
+    if len(data) < _HEADER.size:
+        err('不是快照文件')
+    r = _Reader(data)
+    magic, fmt, bc_version, digest = r.unpack(_HEADER)
+    if magic != SNAPSHOT_MAGIC:
+        err('不是快照文件')
+    if fmt != SNAPSHOT_FORMAT_VERSION:
+        err(f'不支持的快照格式版本: {fmt}')
+    if bc_version != BYTECODE_VERSION:
+        err(f'字节码版本不匹配: 快照 {bc_version}, 虚拟机 {BYTECODE_VERSION}')
+    if digest != program_hash(vm.code, vm.consts, vm.functions):
+        err('快照与当前程序不一致')
+
+    pc = r.i32()
+    status = r.text()
+
+    scopes = []
+    for _ in range(r.u32()):
+        scopes.append([read_value(r) for _ in range(r.u32())])
+    vm_scopes = [scopes[r.u32()] for _ in range(r.u32())]
+    active = [scopes[r.u32()] for _ in range(r.u32())]
+
+    stack = [read_value(r) for _ in range(r.u32())]
+    stack_counts = read_counts(r)
+    frames = []
+    for _ in range(r.u32()):
+        return_addr = r.i32()
+        frames.append((return_addr, r.u32()))
+    call_stack_counts = read_counts(r)
+    call_counts = [r.u32() for _ in range(r.u32())]
+
+    vm.pc = pc
+    vm.status = status
+    vm.error = None
+    vm.scopes = vm_scopes
+    vm.active_scopes = active
+    vm.stack.stack = stack
+    set_counts(vm.stack, stack_counts)
+    vm.call_stack.stack = frames
+    set_counts(vm.call_stack, call_stack_counts)
+    vm.call_counts = call_counts
+    return vm
+
+__all__ = ['SNAPSHOT_MAGIC', 'SNAPSHOT_FORMAT_VERSION', 'program_hash', 'dump_snapshot', 'load_snapshot']
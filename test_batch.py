@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+测试批量运行器：清单/目录收集、编译缓存、预算与 JSON lines 输出
+"""
+
+import sys
+import os
+import json
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from batch import run_source, collect_sources, read_sources, start_pool, run_batch, BUDGET, WARM_UP_SOURCE
+from vm import FINISHED, ERROR
+
+def write_corpus(tmp_path):
+    files = {
+        "a.cilly": 'var x = 1; x = x + 1; print("a", x);',
+        "b.cilly": 'var x = 1; x = x + 1; print("a", x);',  # 与 a 相同的源码
+        "sub/turtle.cilly": 'forward(10); left(90); print("t");',
+        "sub/bad.cilly": 'print(nope);',
+        "spin.cilly": 'while (true) { }',
+    }
+    for name, src in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(src, encoding='utf-8')
+    (tmp_path / "list.txt").write_text("# 清单\na.cilly\n\nsub/turtle.cilly\n", encoding='utf-8')
+    return files
+
+def test_collect(tmp_path):
+    write_corpus(tmp_path)
+    found = [os.path.relpath(p, tmp_path) for p in collect_sources([str(tmp_path)])]
+    assert sorted(found) == sorted(["a.cilly", "b.cilly", "spin.cilly", "sub/bad.cilly", "sub/turtle.cilly"])
+    listed = collect_sources([str(tmp_path / "list.txt")])
+    assert [os.path.basename(p) for p in listed] == ["a.cilly", "turtle.cilly"]
+
+def test_run_source_cache_and_isolation():
+    src = 'var n = 0; n = n + 5; print(n);'
+    first = run_source("x", src)
+    second = run_source("y", src)
+    assert first["output"] == second["output"] == "5 \n"
+    assert second["cached"] and second["hash"] == first["hash"]
+    assert run_source("t", 'forward(1); right(2);')["primitive_calls"] == 2
+    assert run_source("s", 'while (true) { }', max_instructions=1000)["status"] == BUDGET
+
+def warmed(_):
+    import batch
+    return os.getpid(), batch.source_hash(WARM_UP_SOURCE) in batch._compiled_cache
+
+def test_every_worker_is_warmed():
+    with start_pool(3) as pool:
+        results = list(pool.map(warmed, range(30)))
+    assert all(ok for _, ok in results)
+    assert len({pid for pid, _ in results}) <= 3
+
+def test_pool_json_lines(tmp_path):
+    write_corpus(tmp_path)
+    sources = read_sources(collect_sources([str(tmp_path)]))
+    with start_pool(2) as pool:
+        results = run_batch(sources, pool, max_instructions=5000, chunk_size=2)
+    by_name = {os.path.relpath(r["path"], tmp_path): r for r in results}
+    assert by_name["a.cilly"]["output"] == by_name["b.cilly"]["output"] == "a 2 \n"
+    assert by_name["sub/bad.cilly"]["status"] == ERROR
+    assert by_name["spin.cilly"]["status"] == BUDGET
+    assert by_name["sub/turtle.cilly"]["status"] == FINISHED
+
+    out = tmp_path / "out.jsonl"
+    cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch.py"),
+           str(tmp_path / "list.txt"), "-j", "1", "-o", str(out)]
+    assert subprocess.run(cmd).returncode == 0
+    lines = [json.loads(l) for l in out.read_text(encoding='utf-8').splitlines()]
+    assert sorted(r["output"] for r in lines) == ["a 2 \n", "t \n"]
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+测试基准测试套件：分阶段计时、JSON 结果与回退比较
+"""
+
+import sys
+import os
+import json
+import copy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.corpus import CORPUS, fib, turtle_fern
+from benchmarks.suite import run_suite, compare, main, STAGES
+
+SMALL = {"fib": fib(8), "turtle_fern": turtle_fern(25)}
+
+def test_corpus_programs_compile_and_run():
+    data = run_suite(corpus=SMALL, repeat=1, warmup=0)
+    assert set(data["results"]) == set(SMALL)
+    for stages in data["results"].values():
+        assert list(stages) == STAGES
+        assert all(s["runs"] == 1 and s["min"] <= s["median"] for s in stages.values())
+    assert {"tight_loop", "fib", "mutual_recursion", "heavy_print", "deep_nesting",
+            "many_definitions", "turtle_fern"} <= set(CORPUS)
+
+def test_compare_flags_regressions(tmp_path):
+    old = {"meta": {}, "results": {"p": {s: {"median": 0.1} for s in STAGES}}}
+    new = copy.deepcopy(old)
+    new["results"]["p"]["run"]["median"] = 0.2
+    new["results"]["p"]["lexer"]["median"] = 0.05
+    new["results"]["p"]["dis"]["median"] = 0.105
+    status = {r["stage"]: r["status"] for r in compare(old, new)}
+    assert status == {"lexer": "improvement", "parser": "ok", "compiler": "ok", "dis": "ok", "run": "regression"}
+
+    # 都很短的阶段只有计时噪声，不算回退
+    tiny = {"meta": {}, "results": {"p": {"run": {"median": 0.0001}}}}
+    tiny_new = {"meta": {}, "results": {"p": {"run": {"median": 0.0005}}}}
+    assert compare(tiny, tiny_new)[0]["status"] == "ok"
+
+    a, b = tmp_path / "a.json", tmp_path / "b.json"
+    a.write_text(json.dumps(old), encoding='utf-8')
+    b.write_text(json.dumps(new), encoding='utf-8')
+    assert main(["compare", str(a), str(a)]) == 0
+    assert main(["compare", str(a), str(b)]) == 1
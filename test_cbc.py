@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+测试 .cbc 字节码文件的写入与加载
+"""
+
+import sys
+import os
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler, COMPILER_VERSION
+from cbc import dump_cbc, load_cbc, write_cbc, cbc_info, load_vm
+from output import StringSink
+
+PROGRAM = '''
+var big = 123456789012345678901234567890;
+define add = fun(a, b) { return a + b; };
+print("add", add(1, 2.5), big);
+'''
+
+def compile_source(src):
+    return cilly_vm_compiler(cilly_parser(cilly_lexer(src)))
+
+def test_roundtrip():
+    code, consts, scopes, functions = compile_source(PROGRAM)
+    data = dump_cbc(code, consts, scopes, functions)
+    assert cbc_info(data)["compiler_version"] == COMPILER_VERSION
+    code2, consts2, scopes2, functions2 = load_cbc(data)
+    assert list(code2) == list(code)
+    assert consts2 == consts
+    assert scopes2 == scopes
+    assert functions2 == functions
+
+def test_bad_magic():
+    try:
+        load_cbc(b'not a cbc file')
+    except Exception as e:
+        assert 'cbc' in str(e)
+    else:
+        assert False, '应当拒绝非法文件'
+
+def test_load_without_front_end(tmp_path):
+    path = str(tmp_path / 'prog.cbc')
+    write_cbc(path, *compile_source(PROGRAM))
+    script = (
+        "import sys; from cbc import load_vm; load_vm(sys.argv[1]).run();"
+        "assert not {'lexer', 'cilly_parser_module', 'compile'} & set(sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', script, path],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith('add 3.5 123456789012345678901234567890 \n')
+
+def test_load_vm_with_output_sink(tmp_path):
+    path = str(tmp_path / 'prog.cbc')
+    write_cbc(path, *compile_source(PROGRAM))
+    out = StringSink()
+    load_vm(path, output=out).run(show_stats=False)
+    assert out.getvalue() == 'add 3.5 123456789012345678901234567890 \n'
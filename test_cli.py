@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试 cilly 命令行：各子命令、标准输入、退出码，以及不画图时不导入 GUI 工具包
+"""
+
+import sys
+import os
+import io
+import json
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from cilly import main, EXIT_OK, EXIT_ERROR, EXIT_USAGE, EXIT_BUDGET
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PROGRAM = '''define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+print("fib", fib(10));
+'''
+
+@pytest.fixture
+def prog(tmp_path):
+    path = tmp_path / 'fib.cilly'
+    path.write_text(PROGRAM, encoding='utf-8')
+    return path
+
+def set_stdin(monkeypatch, text):
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(text.encode('utf-8'))))
+
+def test_run_file(prog, capsys):
+    assert main(['run', str(prog), '--no-stats', '--provider', 'headless']) == EXIT_OK
+    assert capsys.readouterr().out == 'fib 55 \n'
+    assert main(['run', str(prog)]) == EXIT_OK
+    assert 'Stack Statistics' in capsys.readouterr().out
+
+def test_run_time_and_profile(prog, capsys):
+    assert main(['run', str(prog), '--no-stats', '--time', '--profile']) == EXIT_OK
+    captured = capsys.readouterr()
+    assert captured.out == 'fib 55 \n'
+    for stage in ('lexer', 'parser', 'compiler', 'run', 'total'):
+        assert stage in captured.err
+    assert '--- profile ---' in captured.err and 'fib' in captured.err
+
+def test_run_stdin_and_backends(monkeypatch, capsys):
+    set_stdin(monkeypatch, 'print(1 + 2);')
+    assert main(['run', '--no-stats']) == EXIT_OK
+    assert capsys.readouterr().out == '3 \n'
+    set_stdin(monkeypatch, PROGRAM)
+    assert main(['run', '-', '--backend', 'py']) == EXIT_OK
+    assert capsys.readouterr().out == 'fib 55 \n'
+
+def test_py_backend_rejects_vm_only_options(prog, capsys):
+    for extra in (['--max-instructions', '100'], ['--max-memory', '1M'], ['--profile'], ['--jit'],
+                  ['--no-stats'], ['--pgo', 'x.prof']):
+        assert main(['run', str(prog), '--backend', 'py'] + extra) == EXIT_USAGE
+        assert f'{extra[0]} 只能用于 --backend vm' in capsys.readouterr().err
+    assert main(['run', str(prog), '--backend', 'py', '--time']) == EXIT_OK
+    assert capsys.readouterr().out == 'fib 55 \n'
+
+def test_exit_codes(prog, tmp_path, monkeypatch, capsys):
+    assert main(['run', str(prog), '--max-instructions', '100', '--no-stats']) == EXIT_BUDGET
+    assert '指令预算' in capsys.readouterr().err
+    assert main(['run', str(prog), '--max-instructions', '100000', '--no-stats']) == EXIT_OK
+    set_stdin(monkeypatch, 'print(1 +);')
+    assert main(['run']) == EXIT_ERROR
+    assert 'cilly parser' in capsys.readouterr().err
+    set_stdin(monkeypatch, 'print(1 / 0);')
+    assert main(['run']) == EXIT_ERROR
+    assert main(['run', str(tmp_path / 'missing.cilly')]) == EXIT_USAGE
+    with pytest.raises(SystemExit) as e:
+        main(['transpile', str(prog)])  # 缺少 --target
+    assert e.value.code == EXIT_USAGE
+
+def test_compile_then_run_and_dis(prog, tmp_path, capsys):
+    assert main(['compile', str(prog)]) == EXIT_OK
+    cbc = tmp_path / 'fib.cbc'
+    assert cbc.exists()
+    assert main(['run', str(cbc), '--no-stats']) == EXIT_OK
+    assert capsys.readouterr().out == 'fib 55 \n'
+    assert main(['dis', str(cbc)]) == EXIT_OK
+    assert 'CALL' in capsys.readouterr().out
+    assert main(['dis', str(prog)]) == EXIT_OK
+    assert 'RETURN_VALUE' in capsys.readouterr().out
+    assert main(['transpile', str(cbc), '--target', 'js']) == EXIT_USAGE
+
+def test_transpile(prog, tmp_path, capsys):
+    assert main(['transpile', str(prog), '--target', 'js']) == EXIT_OK
+    assert 'console.log("fib", fib(10))' in capsys.readouterr().out
+    out = tmp_path / 'fib.py'
+    assert main(['transpile', str(prog), '--target', 'py', '-o', str(out)]) == EXIT_OK
+    compile(out.read_text(encoding='utf-8'), str(out), 'exec')
+
+def test_bench(tmp_path, capsys):
+    out = tmp_path / 'bench.json'
+    assert main(['bench', 'fib', '-n', '1', '-w', '0', '-o', str(out)]) == EXIT_OK
+    assert list(json.loads(out.read_text(encoding='utf-8'))["results"]) == ['fib']
+
+def test_startup_skips_gui_toolkits(prog):
+    script = ('import sys, cilly; rc = cilly.main(["run", sys.argv[1], "--no-stats"]); '
+              'print(rc, [m for m in ("turtle", "tkinter", "PyQt5") if m in sys.modules])')
+    result = subprocess.run([sys.executable, '-c', script, str(prog)], cwd=HERE,
+                            capture_output=True, text=True, timeout=60)
+    assert result.stdout.splitlines()[-1] == '0 []'
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+测试 primitive 命令缓冲区：批量刷新后重放的命令序列与逐条信号一致
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, RUNNING
+from command_buffer import CommandBuffer
+from primitives import primitive_id
+from test_reg_vm import TURTLE_NAMES, run_stack_vm
+from test_primitives import FERN
+
+def run_buffered(src, **kwargs):
+    batches = []
+    buffer = CommandBuffer(batches.append, **kwargs)
+    code, consts, scopes, functions = cilly_vm_compiler(cilly_parser(cilly_lexer(src)), TURTLE_NAMES)
+    CillyVM(code, consts, scopes, functions, primitives=buffer.primitives()).run(show_stats=False)
+    buffer.flush()
+    return batches, buffer
+
+def replay(batches):
+    return [(name,) + args for batch in batches for name, args in batch]
+
+def test_batches_match_signals():
+    _, log = run_stack_vm(FERN)
+    batches, buffer = run_buffered(FERN, max_count=10)
+    assert replay(batches) == log
+    assert buffer.command_count == len(log)
+    assert len(batches) == buffer.batch_count == (len(log) + 9) // 10
+    assert all(len(b) <= 10 for b in batches)
+
+def test_strings_and_numbers():
+    batches = []
+    buffer = CommandBuffer(batches.append)
+    record = buffer.primitives(["pencolor", "forward", "penup"])
+    record["pencolor"]("red")
+    record["forward"](2.5)
+    record["penup"]()
+    record["pencolor"]("blue")
+    assert not batches
+    buffer.flush()
+    buffer.flush()  # 空缓冲区不产生批次
+    assert replay(batches) == [("pencolor", "red"), ("forward", 2.5), ("penup",), ("pencolor", "blue")]
+    assert list(batches[0].ops) == [primitive_id(n) for n in ("pencolor", "forward", "penup", "pencolor")]
+
+def test_flush_by_time():
+    now = [0.0]
+    batches = []
+    buffer = CommandBuffer(batches.append, max_count=1000, max_interval=1.0, clock=lambda: now[0])
+    forward = buffer.primitives(["forward"])["forward"]
+    forward(1)
+    now[0] = 0.5
+    forward(2)
+    assert not batches
+    now[0] = 1.5
+    forward(3)
+    assert replay(batches) == [("forward", 1), ("forward", 2), ("forward", 3)]
+
+def test_wrong_typed_argument_is_a_cilly_error():
+    batches = []
+    buffer = CommandBuffer(batches.append)
+    src = 'forward(1); forward(true); forward(null);'
+    code, consts, scopes, functions = cilly_vm_compiler(cilly_parser(cilly_lexer(src)), TURTLE_NAMES)
+    vm = CillyVM(code, consts, scopes, functions, primitives=buffer.primitives())
+    with pytest.raises(Exception, match='primitive forward 的参数只能是数值或字符串，实际为 null'):
+        vm.run(show_stats=False)
+    assert vm.error_line == 1
+    # 出错的命令没有写入缓冲区
+    buffer.flush()
+    assert replay(batches) == [("forward", 1), ("forward", 1)]
+    with pytest.raises(Exception, match='实际为 list'):
+        buffer.append(primitive_id("forward"), [1])
+
+def test_poll_flushes_pending_commands_without_new_calls():
+    now = [0.0]
+    batches = []
+    buffer = CommandBuffer(batches.append, max_count=1000, max_interval=1.0, clock=lambda: now[0])
+    buffer.primitives(["forward"])["forward"](1)
+    buffer.poll()
+    assert not batches
+    now[0] = 1.5
+    buffer.poll()
+    assert replay(batches) == [("forward", 1)]
+    buffer.poll()  # 空缓冲区不产生批次
+    assert len(batches) == 1
+
+def test_ticking_flushes_during_long_non_drawing_stretch():
+    src = 'forward(1); var i = 0; while (i < 100000000) { i = i + 1; }'
+    batches = []
+    buffer = CommandBuffer(batches.append, max_interval=0.01)
+    code, consts, scopes, functions = cilly_vm_compiler(cilly_parser(cilly_lexer(src)), TURTLE_NAMES)
+    vm = CillyVM(code, consts, scopes, functions, primitives=buffer.primitives())
+    with buffer.ticking():
+        # 在画了一笔之后的长循环中，后台线程按时间把这一笔刷新出去
+        while not batches and vm.run_for(1000) == RUNNING:
+            pass
+    assert replay(batches) == [("forward", 1)]
+
+def test_ticking_flushes_on_error():
+    batches = []
+    buffer = CommandBuffer(batches.append, max_interval=60)
+    src = 'forward(1); forward(2); print(1 / 0);'
+    code, consts, scopes, functions = cilly_vm_compiler(cilly_parser(cilly_lexer(src)), TURTLE_NAMES)
+    vm = CillyVM(code, consts, scopes, functions, primitives=buffer.primitives())
+    with pytest.raises(ZeroDivisionError):
+        with buffer.ticking():
+            vm.run(show_stats=False)
+    assert replay(batches) == [("forward", 1), ("forward", 2)]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+测试常驻执行服务：JSON lines 请求、程序缓存、预算限制与 socket 客户端
+"""
+
+import sys
+import os
+import io
+import json
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import batch
+from daemon import CillyDaemon, serve_socket, serve_stdio
+from cilly_client import CillyClient
+from batch import BUDGET
+from vm import FINISHED, ERROR
+
+def test_handle_source_and_program_id():
+    d = CillyDaemon()
+    first = d.handle({"id": 1, "source": 'var x = 2; print(x * 21);'})
+    assert first["status"] == FINISHED and first["output"] == "42 \n"
+    assert set(first["timing"]) == {"compile_ms", "run_ms", "total_ms"}
+
+    again = d.handle({"id": 2, "program": first["program"]})
+    assert again["output"] == "42 \n" and again["cached"]
+
+    unknown = d.handle({"id": 3, "program": "0" * 64})
+    assert unknown["status"] == ERROR and "未知的程序" in unknown["error"]
+    assert d.handle({"source": 'print(nope);'})["status"] == ERROR
+    assert d.handle({"source": 'while (true) { }', "max_instructions": 1000})["status"] == BUDGET
+
+def test_null_and_oversized_limits_use_daemon_maximum():
+    d = CillyDaemon(max_instructions=5000, max_timeout=5.0)
+    # null 与省略相同：取服务的上限，不会无预算地运行
+    r = d.handle({"source": 'while (true) { }', "max_instructions": None, "timeout": None})
+    assert r["status"] == BUDGET
+    assert d.handle({"source": 'while (true) { }', "max_instructions": 10 ** 12})["status"] == BUDGET
+    slow = CillyDaemon(max_instructions=10 ** 12, max_timeout=0.05)
+    assert slow.handle({"source": 'while (true) { }', "timeout": 1e9})["status"] == "timeout"
+    assert slow.handle({"source": 'while (true) { }', "timeout": None})["status"] == "timeout"
+    bad = d.handle({"source": 'print(1);', "max_instructions": "many"})
+    assert bad["status"] == ERROR and 'max_instructions' in bad["error"]
+
+def test_program_table_and_compiled_cache_are_bounded(monkeypatch):
+    monkeypatch.setattr(batch, 'COMPILED_CACHE_SIZE', 3)
+    monkeypatch.setattr(batch, '_compiled_cache', batch.OrderedDict())
+    d = CillyDaemon(max_programs=2)
+    ids = [d.handle({"source": f'print({i});'})["program"] for i in range(3)]
+    assert list(d.sources) == ids[1:]
+    assert d.handle({"program": ids[0]})["status"] == ERROR
+    # 使用过的程序移到最近端，淘汰的是最久未用的
+    d.handle({"program": ids[1]})
+    d.handle({"source": 'print(3);'})
+    assert ids[1] in d.sources and ids[2] not in d.sources
+    assert len(batch._compiled_cache) == 3
+
+def test_compile_does_not_block_other_requests(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    compiler = batch.cilly_vm_compiler
+
+    def slow_compiler(*args):
+        started.set()
+        release.wait(5)
+        return compiler(*args)
+    monkeypatch.setattr(batch, 'cilly_vm_compiler', slow_compiler)
+    d = CillyDaemon()
+    results = []
+    thread = threading.Thread(target=lambda: results.append(d.handle({"source": 'print("slow");'})))
+    thread.start()
+    try:
+        assert started.wait(5)
+        # 编译进行中，stats 与其它程序的请求照常完成
+        assert d.handle({"op": "stats"})["requests"] == 2
+        monkeypatch.setattr(batch, 'cilly_vm_compiler', compiler)
+        assert d.handle({"source": 'print("fast");'})["output"] == 'fast \n'
+    finally:
+        release.set()
+        thread.join()
+    assert results[0]["output"] == 'slow \n'
+
+def test_stdio():
+    requests = '{"id": "a", "source": "print(1);"}\nnot json\n\n{"id": "b", "op": "stats"}\n'
+    out = io.StringIO()
+    serve_stdio(CillyDaemon(), io.StringIO(requests), out)
+    lines = [json.loads(l) for l in out.getvalue().splitlines()]
+    assert [l["id"] for l in lines] == ["a", None, "b"]
+    assert lines[0]["output"] == "1 \n"
+    assert lines[1]["status"] == ERROR
+    assert lines[2]["requests"] == 2
+
+def test_non_object_requests_are_rejected():
+    requests = '[1]\n"x"\n3\n{"id": "ok", "source": "print(1);"}\n'
+    out = io.StringIO()
+    serve_stdio(CillyDaemon(), io.StringIO(requests), out)
+    lines = [json.loads(l) for l in out.getvalue().splitlines()]
+    assert [l["status"] for l in lines] == [ERROR, ERROR, ERROR, FINISHED]
+    assert '需要 JSON 对象' in lines[0]["error"]
+
+def test_socket_client(tmp_path):
+    path = str(tmp_path / "cilly.sock")
+    server = serve_socket(path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with CillyClient(path) as client:
+            r = client.run('forward(10); print("ok");')
+            assert r["status"] == FINISHED and r["output"] == "ok \n"
+            assert client.run(program=r["program"])["cached"]
+            assert client.run('while (true) { }', timeout=0.05)["status"] == "timeout"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+测试差分测试：输出规范化、结果比较、VM 与 JS (或本地替身) 的整批运行
+"""
+
+import sys
+import os
+import json
+import shutil
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from batch import start_pool
+from difftest import (normalize_output, compare_results, run_diff, run_js_chunk, find_node,
+                      new_mismatches, main)
+
+FIB = '''define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+print("fib", fib(12), 7 / 2, 4 / 2, true, null);
+'''
+
+NEG_MOD = 'print(-7 % 3);'
+
+needs_node = pytest.mark.skipif(shutil.which('node') is None, reason='没有 node')
+
+@pytest.fixture(scope='module')
+def pool():
+    with start_pool(2) as pool:
+        yield pool
+
+def result(status, output='', error=None):
+    return {"status": status, "output": output, "error": error, "elapsed": 0.0}
+
+def test_normalize_output():
+    assert normalize_output('fib 144 3.5 2.0 True None \n') == ['fib 144 3.5 2 true null']
+    assert normalize_output('fib 144 3.5 2 true null\n') == ['fib 144 3.5 2 true null']
+    assert normalize_output('1e-07 1e+21 -0.0\n') == normalize_output('1e-7 1e21 -0\n')
+    assert normalize_output('inf -inf nan\n') == normalize_output('Infinity -Infinity NaN\n')
+    assert normalize_output('a  b\n\nc') == ['a b', '', 'c']
+
+def test_compare_results():
+    assert compare_results(result('finished', '1 2 \n'), result('finished', '1 2\n')) is None
+    diff = compare_results(result('finished', 'a\n1 \n'), result('finished', 'a\n2\n'))
+    assert diff == {"kind": "output", "line": 2, "vm": '1', "js": '2'}
+    diff = compare_results(result('finished', '1\n'), result('error', error='boom'))
+    assert diff["kind"] == 'status' and diff["js_error"] == 'boom'
+    # 两边都出错只比较状态
+    assert compare_results(result('error', error='x'), result('timeout', error='y')) is None
+    assert compare_results(result('finished', '1\n'), result('finished', '1\n2\n'))["line"] == 2
+
+def test_stub_backend_runs_whole_corpus(pool):
+    sources = [('fib', FIB), ('neg_mod', NEG_MOD), ('bad', 'print(1 +);')]
+    sources += [(f'p{i}', f'var x = {i}; print(x * 2, "ok");') for i in range(20)]
+    report = run_diff(sources, pool, node=None, chunk_size=4)
+    assert report["programs"] == 23
+    assert report["mismatched"] == 0, report["mismatches"]
+    assert set(report["backends"]) == {'vm', 'js-stub'}
+    assert report["backends"]["vm"]["errors"] == 1 and report["backends"]["js-stub"]["errors"] == 1
+    assert report["backends"]["vm"]["wall"] > 0
+
+@needs_node
+def test_node_backend_finds_semantic_differences(pool):
+    report = run_diff([('fib', FIB), ('neg_mod', NEG_MOD)], pool, node=find_node())
+    assert report["backends"]["js"]["finished"] == 2
+    assert [d["path"] for d in report["mismatches"]] == ['neg_mod']
+    assert report["mismatches"][0]["vm"] == '2' and report["mismatches"][0]["js"] == '-1'
+
+@needs_node
+def test_node_chunk_isolates_programs_and_times_out():
+    chunk = [('a', 'var x = 1; print(x);'), ('b', 'print(x);'), ('loop', 'while (true) { }'),
+             ('turtle', 'forward(10); penup(); print("drawn");')]
+    results = run_js_chunk(chunk, find_node(), timeout=0.5)
+    assert [r["status"] for r in results] == ['finished', 'error', 'timeout', 'finished']
+    assert results[0]["output"] == '1\n' and results[3]["output"] == 'drawn\n'
+
+def test_baseline_only_fails_on_new_mismatches(tmp_path):
+    old = {"mismatches": [{"kind": "output", "line": 1, "vm": '2', "js": '-1', "path": 'neg_mod'}]}
+    same = {"mismatches": [dict(old["mismatches"][0])]}
+    assert new_mismatches(same, old) == []
+    changed = {"mismatches": [dict(old["mismatches"][0], js='-2'),
+                              {"kind": "status", "path": 'other'}]}
+    assert [d["path"] for d in new_mismatches(changed, old)] == ['neg_mod', 'other']
+
+def test_cli_with_stub(tmp_path, capsys):
+    (tmp_path / 'fib.cilly').write_text(FIB, encoding='utf-8')
+    out = tmp_path / 'report.json'
+    assert main([str(tmp_path), '--generate', '3', '--statements', '3', '--stub', '-j', '1',
+                 '-o', str(out)]) == 0
+    report = json.loads(out.read_text(encoding='utf-8'))
+    assert report["programs"] == 4
+    assert main([str(tmp_path), '--generate', '3', '--statements', '3', '--stub', '-j', '1',
+                 '--baseline', str(out)]) == 0
+    assert '相对基线新增 0 个不一致' in capsys.readouterr().out
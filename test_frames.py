@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+测试帧池：函数帧与块作用域的复用、从块内 return 时的作用域链截断
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, FINISHED, NULL, TRUE, FALSE
+from output import StringSink
+
+PROGRAM = '''
+define find = fun(n) {
+    var i = 0;
+    while (true) {
+        var doubled = i * 2;
+        if (doubled >= n) return i;
+        i = i + 1;
+    }
+};
+define sum = fun(n) {
+    if (n == 0) return 0;
+    return n + sum(n - 1);
+};
+var k = 0;
+while (k < 50) {
+    var t = find(10) + sum(20);
+    k = k + 1;
+}
+print(find(10), sum(20));
+'''
+
+def run(src):
+    out = StringSink()
+    vm = CillyVM(*cilly_vm_compiler(cilly_parser(cilly_lexer(src))), output=out)
+    vm.run(show_stats=False)
+    return vm, out.getvalue()
+
+def test_frames_are_reused():
+    vm, out = run(PROGRAM)
+    assert vm.status == FINISHED
+    assert out == "5 210 \n"
+    # 作用域链恢复到初始长度，调用栈为空
+    assert len(vm.active_scopes) == len(vm.scopes)
+    assert vm.call_stack.empty()
+    # 空闲表中最多保留递归最深时的帧数，而不是调用总次数
+    assert sum(len(free) for free in vm.frame_pool.values()) < 50
+
+def test_reused_frame_is_reset():
+    vm, _ = run('print(1);')
+    depth = len(vm.active_scopes)
+    frame = vm.acquire_frame(3)
+    frame[:] = [TRUE, FALSE, TRUE]
+    vm.active_scopes.append(frame)
+    vm.release_frames(depth)
+    assert len(vm.active_scopes) == depth
+    again = vm.acquire_frame(3)
+    assert again is frame and again == [NULL, NULL, NULL]
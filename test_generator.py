@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+测试合成程序生成器：按种子确定、生成的程序能编译并运行结束、按大小流式输出
+"""
+
+import sys
+import os
+import io
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, FINISHED
+from output import StringSink
+from providers import load_provider
+from benchmarks.generator import ProgramGenerator, generate, write_program, main
+from benchmarks.suite import run_scaling, STAGES
+
+def run_source(src, budget=5_000_000):
+    primitives = load_provider('headless')
+    code, consts, scopes, functions = cilly_vm_compiler(cilly_parser(cilly_lexer(src)), list(primitives))
+    out = StringSink()
+    vm = CillyVM(code, consts, scopes, functions, primitives=primitives, output=out)
+    assert vm.run_for(budget) == FINISHED, vm.error
+    return out.getvalue()
+
+def test_same_seed_same_program():
+    assert generate(3) == generate(3)
+    assert generate(3) != generate(4)
+    assert generate(3, statements=10) != generate(3, statements=20)
+
+@pytest.mark.parametrize("knobs", [
+    {},
+    {"statements": 40, "functions": 20, "block_depth": 5, "expr_depth": 6, "loop_trips": 3, "loop_depth": 2},
+    {"statements": 30, "functions": 0, "identifiers": 0},
+    {"statements": 50, "loop_trips": 0, "string_size": 100},
+])
+def test_generated_programs_run_to_completion(knobs):
+    for seed in range(5):
+        run_source(generate(seed, **knobs))
+
+def test_knobs_shape_the_program():
+    src = generate(1, statements=5, functions=3, identifiers=4, string_size=30)
+    assert src.count('define f') == 3
+    assert all(f'var g{i} = ' in src for i in range(4))
+    assert 'var g4 ' not in src
+    deep = generate(1, statements=20, expr_depth=8)
+    assert '(' * 8 in deep
+    with pytest.raises(ValueError):
+        ProgramGenerator(0, nesting=3)
+    with pytest.raises(ValueError):
+        ProgramGenerator(0, statements=-1)
+
+def test_write_program_by_size():
+    buf = io.StringIO()
+    written = write_program(buf.write, seed=2, size=20000)
+    src = buf.getvalue()
+    assert written == len(src) >= 20000
+    assert len(src) < 20000 + 5000  # 最后一条顶层语句不会太长
+    run_source(src, budget=50_000_000)
+
+def test_cli_writes_file(tmp_path, capsys):
+    path = tmp_path / 'gen.cilly'
+    assert main(['-o', str(path), '--seed', '5', '--statements', '12', '--functions', '2']) == 0
+    assert path.read_text(encoding='utf-8') == generate(5, statements=12, functions=2)
+
+def test_break_continue_leave_block_scopes():
+    src = '''
+var s = 0;
+var i = 0;
+while (i < 10) {
+    i = i + 1;
+    var k = i * 2;
+    { var j = 0; if (i == 3) continue; }
+    if (i == 7) break;
+    s = s + k;
+}
+print(s, i);
+'''
+    assert run_source(src).split() == ['36', '7']
+
+def test_scaling_curve():
+    data = run_scaling([5, 20], seed=1, repeat=1, warmup=0)
+    assert list(data["results"]) == ['generated_5', 'generated_20']
+    assert all(list(stages) == STAGES for stages in data["results"].values())
+    assert data["meta"]["generator"]["seed"] == 1
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+JIT 与解释器的对照测试
+"""
+
+import sys
+import os
+from io import StringIO
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM
+from jit import CillyJIT, Unsupported, JIT_MAX_DEPTH
+from test_reg_vm import corpus, make_signals, TURTLE_NAMES
+
+
+def run(src, threshold=None):
+    signals, log = make_signals()
+    code, consts, scopes, functions = cilly_vm_compiler(cilly_parser(cilly_lexer(src)), TURTLE_NAMES)
+    vm = CillyVM(code, consts, scopes, functions, signals=signals)
+    if threshold is not None:
+        vm.enable_jit(threshold)
+    out = StringIO()
+    with redirect_stdout(out):
+        vm.run(show_stats=False)
+    return vm, out.getvalue(), log
+
+
+def test_jit_matches_interpreter():
+    for name, src in corpus().items():
+        _, expected, expected_log = run(src)
+        for threshold in (1, 3):
+            _, out, log = run(src, threshold)
+            assert (out, log) == (expected, expected_log), (name, threshold)
+
+
+def test_hot_functions_compiled():
+    vm, _, _ = run(corpus()["Fib"], threshold=10)
+    fib_id = [f["name"] for f in vm.functions].index("fib")
+    assert vm.jit.compiled[fib_id] is not None
+    assert vm.call_counts[fib_id] >= 10
+
+
+def test_deep_recursion_falls_back():
+    src = '''
+define down = fun(n) {
+    if (n == 0) return 0;
+    return down(n - 1) + 1;
+};
+print(down(%d));
+''' % (JIT_MAX_DEPTH * 4)
+    _, expected, _ = run(src)
+    _, out, _ = run(src, threshold=1)
+    assert out == expected == f'{JIT_MAX_DEPTH * 4} \n'
+
+
+def test_unsupported_function_stays_interpreted(monkeypatch):
+    def reject(self, func_id):
+        raise Unsupported()
+    monkeypatch.setattr(CillyJIT, 'translate', reject)
+
+    src = corpus()["Fib"]
+    vm, out, _ = run(src, threshold=1)
+    _, expected, _ = run(src)
+    assert out == expected
+    assert vm.jit.compiled == [None] and vm.jit.failed == {0}
+
+
+def test_depth_restored_after_error():
+    src = '''
+define inv = fun(x) { return 1 / x; };
+define g = fun(x) { return inv(x) + 1; };
+var i = 5;
+while (i > -1) {
+    print(g(i));
+    i = i - 1;
+}
+'''
+    code, consts, scopes, functions = cilly_vm_compiler(cilly_parser(cilly_lexer(src)))
+    vm = CillyVM(code, consts, scopes, functions)
+    vm.enable_jit(1)
+    with redirect_stdout(StringIO()):
+        try:
+            vm.run(show_stats=False)
+        except ZeroDivisionError:
+            pass
+        else:
+            raise AssertionError('应当除零出错')
+    # JIT 编译的 g 因异常退出，深度计数仍回到 0
+    assert vm.jit.compiled[1] is not None
+    assert vm.jit.depth == [0]
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+测试 pc -> 源码行号表：行程编码、词法/语法分析的位置信息、反汇编与运行时错误的行号
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, ERROR, cilly_vm_dis
+from linetable import LineTable, decode_linetable, pc_to_line
+from output import StringSink
+
+PROGRAM = '''var a = 1;
+define f = fun(n) {
+    return n * 2;
+};
+print(f(a));
+print(f(a) / 0);
+'''
+
+def compile_source(src):
+    return cilly_vm_compiler(cilly_parser(cilly_lexer(src)))
+
+def test_roundtrip_large_deltas():
+    marks = [(0, 1), (3, 1), (5, 300), (600, 2), (700, 0)]
+    table = LineTable.from_marks(marks, 710)
+    assert table.lines() == [(0, 1), (5, 300), (600, 2), (700, 0)]
+    assert [table.pc_to_line(pc) for pc in (0, 4, 5, 599, 600, 699, 700)] == [1, 1, 300, 300, 2, 2, None]
+    assert decode_linetable(table.data) == table.decoded()
+
+def test_tokens_and_nodes_carry_lines():
+    tokens = cilly_lexer('var x = 1;\nprint(x,\n  "s");')
+    assert [t.line for t in tokens] == [1, 1, 1, 1, 1, 2, 2, 2, 2, 3, 3, 3]
+    assert tokens[0] == ['var', None]
+    ast = cilly_parser(tokens)
+    assert [stmt.line for stmt in ast[1]] == [1, 2]
+    with pytest.raises(Exception, match="第 2 行"):
+        cilly_parser(cilly_lexer('var x = 1;\nprint(x;'))
+
+def test_compile_error_line():
+    with pytest.raises(Exception, match="未定义变量：b \\(第 2 行\\)"):
+        compile_source('var a = 1;\nprint(b);')
+
+def test_compiled_lines():
+    code, consts, scopes, functions = compile_source(PROGRAM)
+    lines = {pc_to_line(code, pc) for pc in range(len(code))}
+    assert lines == {None, 1, 2, 3, 5, 6}
+    entry = functions[0]["entry_point"]
+    assert pc_to_line(code, entry + 2) == 3
+    listing = cilly_vm_dis(code, consts, scopes)
+    assert any(l.lstrip().startswith("3 ") and "LOAD_VAR" in l for l in listing.splitlines())
+
+def test_runtime_error_line():
+    vm = CillyVM(*compile_source(PROGRAM), output=StringSink())
+    with pytest.raises(ZeroDivisionError) as info:
+        vm.run(show_stats=False)
+    assert vm.status == ERROR and vm.error_line == 6
+    assert "第 6 行" in info.value.__notes__[0]
+
+    # 工具链自身的错误把行号加在消息末尾
+    ast = cilly_parser(cilly_lexer('var a = 1;\n\nforward(a);'))
+    vm = CillyVM(*cilly_vm_compiler(ast, ["forward"]), output=StringSink())
+    assert vm.run_for(100) == ERROR
+    assert vm.error_line == 3 and str(vm.error).endswith("(第 3 行)")
+
+def test_reported_runtime_errors_carry_the_line(tmp_path, capsys):
+    from errors import error_text
+    from batch import execute
+    from cilly import main
+    vm = CillyVM(*compile_source(PROGRAM), output=StringSink())
+    assert vm.run_for(1000) == ERROR
+    assert isinstance(vm.error, ZeroDivisionError)
+    assert error_text(vm.error) == 'division by zero (第 6 行)'
+    # 工具链自身的错误不重复行号
+    assert error_text(Exception('cilly vm : x (第 3 行)')) == 'cilly vm : x (第 3 行)'
+
+    status, _, error, _ = execute(compile_source(PROGRAM))
+    assert status == ERROR and error == 'division by zero (第 6 行)'
+    path = tmp_path / 'div.cilly'
+    path.write_text('var x = 1;\nprint(x / 0);\n', encoding='utf-8')
+    assert main(['run', str(path), '--no-stats']) == 1
+    assert capsys.readouterr().err == 'cilly: division by zero (第 2 行)\n'
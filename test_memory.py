@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试内存统计：各阶段报告、VM 活动内存与内存硬上限
+"""
+
+import sys
+import os
+import json
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, FINISHED, ERROR, RUNNING
+from output import StringSink
+from memory import memory_report, run_capped, vm_memory, count_nodes, count_instructions, parse_bytes, main
+
+PROGRAM = '''
+define f = fun(n, s) {
+    if (n < 1) return s;
+    return f(n - 1, s);
+};
+var i = 0;
+var t = "";
+while (i < 50) {
+    t = f(20, "hello");
+    i = i + 1;
+}
+print(t, i);
+'''
+
+# 无限递归：帧和调用栈不断增长，只能靠内存上限停下
+RUNAWAY = '''
+define f = fun(n) {
+    return f(n + 1);
+};
+f(0);
+'''
+
+def make_vm(src):
+    code, consts, scopes, functions = cilly_vm_compiler(cilly_parser(cilly_lexer(src)))
+    return CillyVM(code, consts, scopes, functions, output=StringSink())
+
+def test_report_covers_every_stage():
+    out = StringSink()
+    report = memory_report(PROGRAM, output=out, top=3)
+    assert report["status"] == FINISHED and report["error"] is None
+    assert out.getvalue().split() == ['hello', '50']
+    assert list(report["stages"]) == ['lexer', 'parser', 'compiler', 'run']
+    for stage in report["stages"].values():
+        assert stage["peak"] >= stage["allocated"]
+        assert len(stage["top"]) <= 3
+    assert report["stages"]["lexer"]["allocated"] > 0
+    counts = report["counts"]
+    assert counts["tokens"] == len(cilly_lexer(PROGRAM))
+    assert 0 < counts["instructions"] < counts["code_slots"]
+    assert report["bytes_per"]["token"] > 0 and report["bytes_per"]["ast_node"] > 0
+    # 递归 21 层：调用栈深度的峰值被采样到
+    assert report["vm_peak"]["call_depth"] >= 1
+    assert report["vm"]["call_depth"] == 0
+    json.dumps(report)
+    assert not tracemalloc.is_tracing()
+
+def test_vm_memory_counts_live_state():
+    vm = make_vm('var s = "abcdefgh"; var n = 1; { var k = s; print(k, n); }')
+    vm.run_for(4)
+    live = vm_memory(vm)
+    assert live["string_bytes"] == sys.getsizeof("abcdefgh")
+    assert live["frame_slots"] >= 2 and live["call_depth"] == 0
+
+def test_memory_cap_stops_runaway_recursion():
+    vm = make_vm(RUNAWAY)
+    tracemalloc.start()
+    try:
+        limit = tracemalloc.get_traced_memory()[0] + (2 << 20)
+        status = run_capped(vm, max_memory=limit, slice_size=1000)
+    finally:
+        tracemalloc.stop()
+    assert status == ERROR and vm.status == ERROR
+    assert '内存超出上限' in str(vm.error)
+    assert vm.error_line == 3
+    assert len(vm.call_stack.stack) > 1000
+
+def test_report_with_cap_and_budget():
+    report = memory_report(RUNAWAY, max_memory=1 << 20, top=0)
+    assert report["status"] == ERROR and '内存超出上限' in report["error"]
+    assert "top" not in report["stages"]["run"]
+    report = memory_report(RUNAWAY, max_instructions=5000, top=0)
+    assert report["status"] == RUNNING
+
+def test_counters():
+    ast = cilly_parser(cilly_lexer('var a = 1 + 2;'))
+    assert count_nodes(ast) == 5  # program, define, binary, num, num
+    code, _, _, _ = cilly_vm_compiler(ast)
+    assert count_instructions(code) == 6  # ENTER_SCOPE, LOAD_CONST x2, BINARY_ADD, STORE_VAR, LEAVE_SCOPE
+    assert parse_bytes('512') == 512 and parse_bytes('64K') == 65536 and parse_bytes('1.5M') == 3 << 19
+    assert parse_bytes('10MB') == 10 << 20
+
+def test_cli(tmp_path):
+    src = tmp_path / 'p.cilly'
+    src.write_text(PROGRAM, encoding='utf-8')
+    out = tmp_path / 'report.json'
+    assert main([str(src), '--top', '1', '-o', str(out)]) == 0
+    assert json.loads(out.read_text(encoding='utf-8'))["status"] == FINISHED
+    src.write_text(RUNAWAY, encoding='utf-8')
+    assert main([str(src), '--max-memory', '1M', '--top', '0', '-o', str(out)]) == 1
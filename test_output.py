@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试输出端：缓冲/流式刷新，以及虚拟机不再接触 sys.stdout
+"""
+
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM
+from reg_compile import cilly_reg_compiler
+from reg_vm import CillyRegVM
+from py_transpiler import cilly_py_run
+from output import BufferedSink, StreamingSink, StringSink
+
+PROGRAM = '''
+define show = fun(n) { print("n", n); };
+var i = 0;
+while (i < 30) {
+    show(i);
+    i = i + 1;
+}
+'''
+
+EXPECTED = ''.join(f'n {i} \n' for i in range(30))
+
+class NoStdout:
+    def write(self, s):
+        raise AssertionError('sys.stdout used')
+
+    def flush(self):
+        pass
+
+def compile_source(src):
+    return cilly_vm_compiler(cilly_parser(cilly_lexer(src)), ["forward"])
+
+def test_buffered_threshold():
+    chunks = []
+    sink = BufferedSink(chunks.append, threshold=10)
+    sink.write('abcd')
+    sink.write('efgh')
+    assert chunks == []
+    sink.write('ij')
+    assert chunks == ['abcdefghij']
+    sink.write('k')
+    sink.flush()
+    sink.flush()
+    assert chunks == ['abcdefghij', 'k']
+
+def test_streaming_interval():
+    now = [0.0]
+    chunks = []
+    sink = StreamingSink(chunks.append, threshold=1000, interval=1.0, clock=lambda: now[0])
+    sink.write('a')
+    now[0] = 0.5
+    sink.write('b')
+    assert chunks == []
+    now[0] = 1.2
+    sink.write('c')
+    assert chunks == ['abc']
+
+def test_backends_never_touch_stdout():
+    old = sys.stdout
+    sys.stdout = NoStdout()
+    try:
+        vm_out = StringSink()
+        CillyVM(*compile_source(PROGRAM), output=vm_out).run(show_stats=False)
+
+        jit_out = StringSink()
+        vm = CillyVM(*compile_source(PROGRAM), output=jit_out)
+        vm.enable_jit(threshold=1)
+        vm.run(show_stats=False)
+
+        reg_out = StringSink()
+        code, consts, functions, frame_size = cilly_reg_compiler(cilly_parser(cilly_lexer(PROGRAM)))
+        CillyRegVM(code, consts, functions, frame_size, output=reg_out).run()
+
+        py_out = StringSink()
+        cilly_py_run(cilly_parser(cilly_lexer(PROGRAM)), output=py_out)
+    finally:
+        sys.stdout = old
+    assert vm.jit.compiled[0] is not None
+    assert vm_out.getvalue() == jit_out.getvalue() == reg_out.getvalue() == py_out.getvalue() == EXPECTED
+
+def test_overlapping_runs():
+    # 多个线程中的虚拟机各自写自己的输出端，互不干扰
+    sinks = [StringSink() for _ in range(4)]
+    vms = [CillyVM(*compile_source(PROGRAM), output=sink) for sink in sinks]
+    threads = [threading.Thread(target=vm.run, args=(False,)) for vm in vms]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(sink.getvalue() == EXPECTED for sink in sinks)
+
+def test_output_flushed_on_error():
+    sink = StringSink()
+    vm = CillyVM(*compile_source('print(1); forward(1);'), output=sink)
+    try:
+        vm.run(show_stats=False)
+    except Exception:
+        pass
+    assert sink.getvalue() == '1 \n'
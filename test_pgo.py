@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+测试剖析引导优化：剖析记录、按剖析的布局/内联/合并，以及优化前后行为一致
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, cilly_vm_dis, iter_instructions, CALL, JMP
+from output import StringSink
+from pgo import record_profile, save_profile, load_profile, merge_profiles, main
+
+PROGRAM = '''
+define sq = fun(x) { return x * x; };
+define clamp = fun(v, hi) {
+    if (v >= hi) return hi;
+    var w = v;
+    while (w < 0) {
+        w = w + 1;
+        if (w == -2) break;
+    }
+    return w;
+};
+define touch = fun(a) { var t = a; };
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+var i = 0;
+var s = 0;
+while (i < %d) {
+    s = s + sq(i) %% 97 + clamp(i %% 13 - 5, 4);
+    touch(i);
+    if (i %% 10 != 0) { s = s + 1; } else { s = s - 1; }
+    i = i + 1;
+    if (i == 3) continue;
+    if (1) { s = s + 2; } else { s = s - 2; }
+}
+print(s, touch(1), sq(3), fib(10));
+'''
+
+def compile_src(src, profile=None):
+    return cilly_vm_compiler(cilly_parser(cilly_lexer(src)), [], profile)
+
+def run(compiled, jit=False):
+    # -> (输出, 执行的指令数)
+    vm = CillyVM(*compiled, output=StringSink())
+    if jit:
+        vm.enable_jit(1)
+    count = [0]
+    for opcode, handler in list(vm.ops.items()):
+        def op(pc, handler=handler):
+            count[0] += 1
+            return handler(pc)
+        vm.ops[opcode] = op
+    vm.run(show_stats=False)
+    return vm.output.getvalue(), count[0]
+
+@pytest.fixture(scope='module')
+def profile():
+    return record_profile(PROGRAM % 50)
+
+def test_profile_counts_sites(profile):
+    p = record_profile('var i = 0; while (i < 5) { if (i < 1) { print(i); } i = i + 1; }')
+    assert p["branches"] == {0: [5, 1], 1: [1, 4]}  # while 站点先于 if
+    assert p["calls"] == {}
+    assert p["pairs"]["LOAD_VAR LOAD_CONST"] > 0
+    assert sum(p["pairs"].values()) < p["instructions"]  # 跳转后的指令不成对
+    # 训练规模不同，结构相同的程序签名相同
+    assert record_profile(PROGRAM % 5)["signature"] == profile["signature"]
+    assert max(profile["calls"].values()) >= 50
+
+def test_profile_file_roundtrip_and_merge(profile, tmp_path):
+    path = tmp_path / 'p.prof'
+    save_profile(profile, path)
+    assert load_profile(path) == profile
+    merged = merge_profiles(profile, profile)
+    assert merged["instructions"] == 2 * profile["instructions"]
+    site, (t, f) = next(iter(profile["branches"].items()))
+    assert merged["branches"][site] == [2 * t, 2 * f]
+    with pytest.raises(Exception, match='同一程序结构'):
+        merge_profiles(profile, record_profile('print(1);'))
+
+def test_pgo_preserves_behaviour_and_runs_fewer_instructions(profile):
+    src = PROGRAM % 300
+    base_out, base_count = run(compile_src(src))
+    pgo_out, pgo_count = run(compile_src(src, profile))
+    assert pgo_out == base_out
+    assert pgo_count < base_count * 0.85
+    # JIT 能编译含超级指令与旋转循环的函数
+    assert run(compile_src(src, profile), jit=True)[0] == base_out
+
+def called_functions(code, functions):
+    return sorted(functions[operands[0]]["name"] for _, opcode, operands in iter_instructions(code)
+                  if opcode == CALL)
+
+def test_layout_inlining_and_fusion(profile):
+    code, consts, scopes, functions = compile_src(PROGRAM % 300, profile)
+    dis = cilly_vm_dis(code, consts, scopes)
+    assert 'JMP_TRUE' in dis and 'BINARY_CONST' in dis and 'LOAD_VAR2' in dis
+    base_code, _, _, base_functions = compile_src(PROGRAM % 300)
+    assert called_functions(base_code, base_functions) == ['clamp', 'fib', 'fib', 'fib', 'sq', 'sq', 'touch', 'touch']
+    # 热站点上的叶子函数 (含分支、循环和多个 return 的 clamp) 被内联；
+    # 递归函数和只执行一次的站点保留 CALL
+    assert called_functions(code, functions) == ['fib', 'fib', 'fib', 'sq', 'touch']
+    # 函数入口前仍是跳过函数体的 JMP (JIT 依赖这个布局)
+    for f in functions:
+        assert code[f["entry_point"] - 2] == JMP
+
+def test_non_bool_conditions_keep_their_meaning():
+    src = 'var i = 0; var s = 0; while (i < %d) { if (i + 1) { s = s + 1; } else { s = s - 1; } i = i + 1; } print(s);'
+    profile = record_profile(src % 40)
+    code, consts, scopes, _ = compile_src(src % 100, profile)
+    assert run((code, consts, scopes, []))[0] == '100 \n'
+
+def test_runtime_error_in_inlined_function_reports_its_line():
+    src = '''define inv = fun(x) {
+    return 1 / x;
+};
+var i = 20;
+while (i > -1) { i = i - 1; inv(i + 1); }
+'''
+    profile = record_profile(src.replace('-1', '0'))
+    vm = CillyVM(*compile_src(src, profile), output=StringSink())
+    with pytest.raises(ZeroDivisionError):
+        vm.run(show_stats=False)
+    assert vm.error_line == 2
+
+def test_stale_profile_is_rejected(profile):
+    with pytest.raises(Exception, match='剖析数据与程序结构不匹配'):
+        compile_src('print(1);', profile)
+
+def test_cli_record_and_run(tmp_path, capsys):
+    from cilly import main as cilly_main
+    train = tmp_path / 'train.cilly'
+    train.write_text(PROGRAM % 50, encoding='utf-8')
+    prog = tmp_path / 'prog.cilly'
+    prog.write_text(PROGRAM % 200, encoding='utf-8')
+    assert main(['record', str(train)]) == 0
+    prof = tmp_path / 'train.prof'
+    assert prof.exists()
+    assert main(['show', str(prof), '--top', '3']) == 0
+    capsys.readouterr()
+    assert cilly_main(['run', str(prog), '--no-stats', '--pgo', str(prof)]) == 0
+    pgo_out = capsys.readouterr().out
+    assert cilly_main(['run', str(prog), '--no-stats']) == 0
+    assert capsys.readouterr().out == pgo_out
+    assert cilly_main(['dis', str(prog), '--pgo', str(prof)]) == 0
+    assert 'BINARY_CONST' in capsys.readouterr().out
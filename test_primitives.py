@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+测试 primitive 注册表与预解析的 CALL_PRIMITIVE prim_id argc
+"""
+
+import sys
+import os
+from io import StringIO
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, CALL_PRIMITIVE, cilly_vm_dis, iter_instructions
+from reg_compile import cilly_reg_compiler
+from reg_vm import CillyRegVM
+from primitives import PRIMITIVES, PRIMITIVE_IDS, RETURNS_VALUE, register_primitive, primitive_id
+from test_reg_vm import TURTLE_NAMES, make_signals
+
+FERN = '''
+define fern = fun(len) {
+    if(len > 5){
+        forward(len);
+        right(10);
+        fern(len - 10);
+        left(40);
+        fern(len - 10);
+        right(30);
+        backward(len);
+    }
+};
+pencolor("green");
+fern(30);
+'''
+
+def compile_source(src, names=TURTLE_NAMES):
+    return cilly_vm_compiler(cilly_parser(cilly_lexer(src)), names)
+
+def test_call_primitive_operands():
+    code, consts, scopes, functions = compile_source('pencolor("red"); penup();')
+    calls = [ops for _, opcode, ops in iter_instructions(code) if opcode == CALL_PRIMITIVE]
+    assert calls == [(primitive_id("pencolor"), 1), (primitive_id("penup"), 0)]
+    assert ['str', 'pencolor'] not in consts
+    assert '(pencolor)' in cilly_vm_dis(code, consts, scopes)
+
+def test_callables_and_signals_agree():
+    # 直接传入函数 (命令行 turtle) 与传入信号 (GUI) 应得到相同的调用序列
+    signals, signal_log = make_signals()
+    CillyVM(*compile_source(FERN), signals=signals).run(show_stats=False)
+
+    call_log = []
+    primitives = {name: (lambda *args, name=name: call_log.append((name,) + args)) for name in TURTLE_NAMES}
+    CillyVM(*compile_source(FERN), primitives=primitives).run(show_stats=False)
+
+    assert call_log == signal_log
+    assert signal_log[:2] == [("pencolor", "green"), ("forward", 30)]
+
+def test_arity_checked_at_compile_time():
+    try:
+        compile_source('forward(1, 2);')
+    except Exception as e:
+        assert 'forward' in str(e)
+    else:
+        assert False, 'expected compile error'
+
+def test_missing_binding():
+    vm = CillyVM(*compile_source('forward(1);'))
+    try:
+        vm.run(show_stats=False)
+    except Exception as e:
+        assert 'forward' in str(e)
+    else:
+        assert False, 'expected runtime error'
+
+def test_value_returning_primitive():
+    register_primitive("twice", 1, RETURNS_VALUE)
+    try:
+        src = 'print(twice(21), twice("ab"));'
+        primitives = {"twice": lambda v: v * 2}
+        out = StringIO()
+        with redirect_stdout(out):
+            CillyVM(*compile_source(src, ["twice"]), primitives=primitives).run(show_stats=False)
+            code, consts, functions, frame_size = cilly_reg_compiler(cilly_parser(cilly_lexer(src)), ["twice"])
+            CillyRegVM(code, consts, functions, frame_size, primitives=primitives).run()
+        assert out.getvalue() == '42 abab \n' * 2
+    finally:
+        PRIMITIVES.pop()
+        del PRIMITIVE_IDS["twice"]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+测试执行剖析：opcode/函数/pc 统计、JSON 导出、标注反汇编与关闭后恢复分派表
+"""
+
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, CALL
+from output import StringSink
+
+PROGRAM = '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+define top = fun() {
+    return fib(10);
+};
+print(top());
+'''
+
+def make_vm(src=PROGRAM):
+    out = StringSink()
+    return CillyVM(*cilly_vm_compiler(cilly_parser(cilly_lexer(src))), output=out), out
+
+def test_profile_counts():
+    vm, out = make_vm()
+    original = dict(vm.ops)
+    prof = vm.enable_profiling()
+    assert vm.ops[CALL] is not original[CALL]
+    vm.run(show_stats=False)
+    prof.disable()
+    assert all(vm.ops[op] is handler for op, handler in original.items())
+    assert out.getvalue() == "55 \n"
+
+    stats = json.loads(prof.to_json())
+    assert stats["functions"]["fib"]["calls"] == 177
+    assert stats["functions"]["top"]["calls"] == 1
+    top, fib = stats["functions"]["top"], stats["functions"]["fib"]
+    # top 的独占时间不含 fib，fib 的包含时间不超过 top 的包含时间
+    assert top["exclusive"] < top["inclusive"]
+    assert fib["inclusive"] <= top["inclusive"]
+    assert stats["opcodes"]["CALL"]["count"] == 178
+    assert sum(o["count"] for o in stats["opcodes"].values()) == sum(stats["pcs"].values())
+
+    listing = prof.dis()
+    assert "(fib)" in listing
+    assert any("0000\t" in line and "1x" in line for line in listing.splitlines())
+    # 按源码行汇总：fib 的函数体在第 3、4 行
+    assert stats["lines"]["3"] > stats["lines"]["9"]
+
+def test_profile_with_jit():
+    vm, out = make_vm()
+    vm.enable_jit(threshold=5)
+    prof = vm.enable_profiling()
+    vm.run(show_stats=False)
+    assert out.getvalue() == "55 \n"
+    stats = prof.stats()
+    assert stats["functions"]["top"]["calls"] == 1
+    assert not prof.frames
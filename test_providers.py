@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+测试 primitive 提供者与无 GUI 依赖的启动路径
+"""
+
+import sys
+import os
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM
+from output import StringSink
+from providers import load_provider, lazy_primitives, register_provider, PROVIDERS
+from primitives import PRIMITIVES
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def test_toolchain_imports_without_gui():
+    code = ("import sys, yufa, compile, vm, cbc, batch, daemon, reg_vm, jit\n"
+            "print(sorted(m for m in ('turtle', 'tkinter', 'PyQt5', 'inspect') if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == '[]'
+
+def test_headless_log():
+    calls = []
+    prims = load_provider('headless', log=calls)
+    assert set(prims) == {prim["name"] for prim in PRIMITIVES}
+    src = 'pencolor("red"); forward(10); left(90); print("done");'
+    code, consts, scopes, functions = cilly_vm_compiler(cilly_parser(cilly_lexer(src)), list(prims))
+    out = StringSink()
+    CillyVM(code, consts, scopes, functions, prims, output=out).run(show_stats=False)
+    assert calls == [("pencolor", ("red",)), ("forward", (10,)), ("left", (90,))]
+    assert out.getvalue().startswith("done \n")
+
+def test_lazy_loads_on_first_call():
+    loads = []
+
+    def factory():
+        loads.append(1)
+        return {"forward": lambda d: d * 2}
+    register_provider('fake', factory)
+    try:
+        prims = lazy_primitives('fake', ["forward", "left"])
+        assert loads == []
+        assert prims["forward"](3) == 6
+        assert prims["forward"](4) == 8
+        assert loads == [1]
+        with pytest.raises(Exception, match="不支持"):
+            prims["left"](1)
+        with pytest.raises(Exception, match="未知的 primitive 提供者"):
+            load_provider('nope')
+    finally:
+        del PROVIDERS['fake']
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Python 后端与 CillyVM 的输出对照测试
+"""
+
+import sys
+import os
+import threading
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from py_transpiler import cilly_py_run, cilly_to_py, PY_RECURSION_LIMIT
+from test_reg_vm import corpus, make_signals, run_stack_vm
+
+
+def run_py(src):
+    signals, log = make_signals()
+    primitives = {name: sig.emit for name, sig in signals.items()}
+    out = StringIO()
+    cilly_py_run(cilly_parser(cilly_lexer(src)), primitives, out.write)
+    return out.getvalue(), log
+
+
+def test_py_backend_matches_vm():
+    for name, src in corpus().items():
+        assert run_py(src) == run_stack_vm(src), name
+
+
+def test_evaluation_order():
+    src = '''
+define show = fun(x) { print("arg", x); return x; };
+define pair = fun(a, b) { return a - b; };
+print(show(1), show(2));
+print(pair(show(10), show(3)));
+print(show(1) > show(2), show(5) <= show(4));
+if (0) print("zero is true");
+if (null) print("null is true");
+'''
+    assert run_py(src) == run_stack_vm(src)
+
+
+def test_deep_recursion():
+    src = '''
+define down = fun(n) {
+    if (n == 0) return 0;
+    return down(n - 1) + 1;
+};
+print(down(5000));
+'''
+    assert run_py(src)[0] == '5000 \n'
+
+
+def test_recursion_beyond_limit_is_a_cilly_error():
+    src = 'define f = fun(n) { if (n < 1) return 0; return f(n - 1) + 1; }; print(f(%d));'
+    with pytest.raises(Exception, match='递归层数超过 Python 后端的上限'):
+        run_py(src % (PY_RECURSION_LIMIT * 2))
+    assert run_py(src % 100)[0] == '100 \n'
+
+
+def test_worker_thread_does_not_change_recursion_limit():
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(1000)
+    try:
+        results = []
+        thread = threading.Thread(target=lambda: results.append(run_py('print(1);')))
+        thread.start()
+        thread.join()
+        assert results[0][0] == '1 \n'
+        assert sys.getrecursionlimit() == 1000
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def test_generated_source_is_module():
+    src = cilly_to_py(cilly_parser(cilly_lexer('var x = 1; print(x + 1);')))
+    compile(src, '<test>', 'exec')
+    assert 'def main():' in src
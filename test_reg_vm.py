@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+寄存器式后端与栈式后端的对照测试：同一语料库在两个 VM 上的输出必须一致
+"""
+
+import sys
+import os
+from io import StringIO
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, FINISHED
+from reg_compile import cilly_reg_compiler
+from reg_vm import CillyRegVM
+from examples import tests
+from output import StringSink
+
+TURTLE_NAMES = ["forward", "backward", "left", "right", "penup", "pendown",
+                "pencolor", "pensize", "reset", "speed"]
+
+EXTRA_PROGRAMS = {
+    "Loop Sum": '''
+var i = 0;
+var s = 0;
+while (i < 100) {
+    s = s + i * 2 - 1;
+    i = i + 1;
+}
+print("sum", s, s / 4, s % 7);
+''',
+    "Fib": '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+print(fib(15));
+''',
+    "Logic": '''
+var a = 3;
+var b = 5;
+print(a > b, a <= b, !(a == b), a != b, -a);
+print(a < b && b > 4, a > b || b >= 5, a > b && b > 4, null, true);
+''',
+}
+
+
+class RecordingSignal:
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    def emit(self, *args):
+        self.log.append((self.name,) + args)
+
+
+def make_signals():
+    log = []
+    return {name: RecordingSignal(name, log) for name in TURTLE_NAMES}, log
+
+
+def run_stack_vm(src):
+    signals, log = make_signals()
+    code, consts, scopes, functions = cilly_vm_compiler(cilly_parser(cilly_lexer(src)), TURTLE_NAMES)
+    out = StringIO()
+    with redirect_stdout(out):
+        CillyVM(code, consts, scopes, functions, signals=signals).run(show_stats=False)
+    return out.getvalue(), log
+
+
+def run_reg_vm(src):
+    signals, log = make_signals()
+    code, consts, functions, frame_size = cilly_reg_compiler(cilly_parser(cilly_lexer(src)), TURTLE_NAMES)
+    out = StringIO()
+    with redirect_stdout(out):
+        CillyRegVM(code, consts, functions, frame_size, signals).run()
+    return out.getvalue(), log
+
+
+def corpus():
+    programs = dict(tests)
+    programs.update(EXTRA_PROGRAMS)
+    return programs
+
+
+def test_backends_agree():
+    for name, src in corpus().items():
+        assert run_reg_vm(src) == run_stack_vm(src), name
+
+
+def test_break_continue():
+    src = '''
+var i = 0;
+while (i < 10) {
+    i = i + 1;
+    if (i == 3) continue;
+    if (i == 6) break;
+    print(i);
+}
+'''
+    out, _ = run_reg_vm(src)
+    assert out == "1 \n2 \n4 \n5 \n"
+
+
+# break / continue 离开循环体内进入的块作用域；forward(0) 作为探针记录作用域链长度
+LOOP_EXITS = '''
+forward(0);
+var i = 0;
+var s = 0;
+while (i < 10) {
+    i = i + 1;
+    { var a = i; { var b = a; if (b % 2 == 0) continue; if (b == 7) break; } }
+    s = s + i;
+}
+forward(0);
+var j = 0;
+while (j < 4) {
+    j = j + 1;
+    var k = 0;
+    while (true) {
+        k = k + 1;
+        { var c = k; { if (c >= j) break; } }
+        if (k == 2) { { continue; } }
+        s = s + 100;
+    }
+    forward(0);
+    { if (j == 3) { continue; } }
+    s = s + k;
+}
+forward(0);
+define f = fun(n) {
+    var t = 0;
+    while (true) {
+        { var u = t; t = u + 1; { if (t == n) break; } }
+    }
+    return t;
+};
+print(s, i, j, f(5));
+forward(0);
+'''
+
+
+def test_break_continue_leave_block_scopes():
+    depths = []
+    vm = None
+
+    def forward(_):
+        depths.append(len(vm.active_scopes))
+
+    compiled = cilly_vm_compiler(cilly_parser(cilly_lexer(LOOP_EXITS)), ['forward'])
+    out = StringSink()
+    vm = CillyVM(*compiled, primitives={'forward': forward}, output=out)
+    vm.run(show_stats=False)
+    assert vm.status == FINISHED
+    # 第一个循环累加 1 3 5 后在 7 处 break (s = 9)；嵌套循环中 k == 2 时 continue
+    # 跳过加 100，j == 3 时 continue 跳过加 k
+    assert out.getvalue() == '416 7 4 5 \n'
+    assert run_reg_vm(LOOP_EXITS)[0] == out.getvalue()
+    # 顶层循环前后、每轮内层循环之后，作用域链长度都相同
+    assert len(depths) == 8 and len(set(depths[:2] + depths[-2:])) == 1
+    assert len(set(depths[2:6])) == 1 and depths[2] == depths[0] + 1
+    assert vm.call_stack.empty()
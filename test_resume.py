@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+测试可恢复执行：run_for / run_until / steps 在函数调用与循环中途暂停后继续
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, RUNNING, FINISHED, ERROR
+from output import StringSink
+
+PROGRAM = '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+var i = 0;
+while (i < 12) {
+    print(i, fib(i));
+    i = i + 1;
+}
+'''
+
+def make_vm(src=PROGRAM):
+    sink = StringSink()
+    return CillyVM(*cilly_vm_compiler(cilly_parser(cilly_lexer(src)), ["forward"]), output=sink), sink
+
+def expected_output():
+    vm, sink = make_vm()
+    vm.run(show_stats=False)
+    return sink.getvalue()
+
+def test_run_for_slices():
+    expected = expected_output()
+    for n in (1, 3, 7, 100):
+        vm, sink = make_vm()
+        slices = 0
+        while vm.run_for(n) == RUNNING:
+            slices += 1
+        assert vm.status == FINISHED
+        assert sink.getvalue() == expected
+        assert slices > 0
+        assert vm.run_for(n) == FINISHED
+
+def test_pause_inside_call_and_loop():
+    expected = expected_output()
+    vm, sink = make_vm()
+    # 停在递归调用内部
+    while not vm.call_stack.stack:
+        assert vm.run_for(1) == RUNNING
+    while len(vm.call_stack.stack) < 3:
+        assert vm.run_for(1) == RUNNING
+    depth, pc, partial = len(vm.call_stack.stack), vm.pc, sink.getvalue()
+    assert vm.run_for(0) == RUNNING
+    assert (len(vm.call_stack.stack), vm.pc, sink.getvalue()) == (depth, pc, partial)
+    # 停在循环中途 (已输出几行之后)
+    while sink.getvalue().count('\n') < 5:
+        vm.run_for(2)
+    assert vm.status == RUNNING
+    assert expected.startswith(sink.getvalue())
+    assert vm.run_for(10 ** 9) == FINISHED
+    assert sink.getvalue() == expected
+
+def test_steps_generator():
+    vm, sink = make_vm()
+    statuses = list(vm.steps(50))
+    assert statuses[-1] == FINISHED
+    assert set(statuses[:-1]) == {RUNNING}
+    assert sink.getvalue() == expected_output()
+
+def test_run_until_infinite_loop():
+    vm, _ = make_vm('var i = 0; while (true) { i = i + 1; }')
+    start = time.monotonic()
+    assert vm.run_until(start + 0.05, 1000) == RUNNING
+    assert vm.run_until(time.monotonic() + 0.05, 1000) == RUNNING
+    assert time.monotonic() - start < 2
+
+def test_error_status():
+    vm, sink = make_vm('print("before"); forward(1);')
+    assert vm.run_for(100) == ERROR
+    assert 'forward' in str(vm.error)
+    assert sink.getvalue() == 'before \n'
+    assert vm.run_for(100) == ERROR
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+测试采样剖析器：pc -> 函数 表、调用栈重建与 folded-stack 输出
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, FINISHED, RUNNING
+from output import StringSink
+from sampler import CillySampler, function_owners, MAIN
+
+PROGRAM = '''
+define leaf = fun(n) {
+    var i = 0;
+    while (i < n) { i = i + 1; }
+    return i;
+};
+define mid = fun(n) {
+    return leaf(n);
+};
+var k = 0;
+while (k < 30) {
+    mid(2000);
+    k = k + 1;
+}
+print(k);
+'''
+
+def make_vm():
+    out = StringSink()
+    return CillyVM(*cilly_vm_compiler(cilly_parser(cilly_lexer(PROGRAM))), output=out), out
+
+def test_function_owners():
+    vm, _ = make_vm()
+    owners = function_owners(vm.code, vm.functions)
+    for func in vm.functions:
+        assert owners[func["entry_point"]] == func["id"]
+    assert owners[0] == -1 and owners[-1] == -1
+
+def test_stack_reconstruction():
+    vm, _ = make_vm()
+    sampler = CillySampler(vm)
+    while len(vm.call_stack.stack) < 2:
+        assert vm.run_for(1) == RUNNING
+    vm.run_for(5)
+    # 默认用字节码的行号表标注栈顶帧：leaf 的循环在第 4 行
+    assert sampler.stack() == (MAIN, "mid", "leaf:4")
+    named = CillySampler(vm, pc_to_line=lambda pc: None)
+    assert named.stack() == (MAIN, "mid", "leaf")
+
+def test_folded_output():
+    vm, out = make_vm()
+    # 每片都采样，结果与时钟无关
+    sampler = CillySampler(vm, interval=0, slice_size=50)
+    assert sampler.run() == FINISHED
+    assert out.getvalue() == "30 \n"
+    assert sampler.sample_count > 100
+    lines = sampler.folded().splitlines()
+    first_stack, first_count = lines[0].rsplit(' ', 1)
+    assert first_stack == f"{MAIN};mid;leaf:4"
+    assert sum(int(l.rsplit(' ', 1)[1]) for l in lines) == sampler.sample_count
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+测试 asyncio 多程序调度器：交错执行、异步 primitive、超时、取消与公平性
+"""
+
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scheduler import CillyScheduler, TIMEOUT, CANCELLED, FINISHED, ERROR
+from primitives import PRIMITIVES, PRIMITIVE_IDS, RETURNS_VALUE, register_primitive
+
+COUNT = '''
+var i = 0;
+while (i < %d) { i = i + 1; }
+print("%s", i);
+'''
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_many_programs():
+    async def main():
+        sched = CillyScheduler(slice_size=50)
+        return await sched.run_all([COUNT % (100 + k, f"p{k}") for k in range(20)])
+    results = run(main())
+    assert [r["status"] for r in results] == [FINISHED] * 20
+    assert [r["output"] for r in results] == [f"p{k} {100 + k} \n" for k in range(20)]
+
+def test_async_primitive():
+    register_primitive("fetch", 1, RETURNS_VALUE)
+    try:
+        order = []
+
+        async def fetch(n):
+            order.append(("start", n))
+            await asyncio.sleep(0.01 * (3 - n))
+            order.append(("done", n))
+            return n * 10
+
+        async def main():
+            sched = CillyScheduler(primitives={"fetch": fetch})
+            return await sched.run_all([f'print("got", fetch({n}));' for n in range(3)])
+        results = run(main())
+        assert [r["output"] for r in results] == ["got 0 \n", "got 10 \n", "got 20 \n"]
+        # 三个程序的 I/O 同时进行，先完成的是等待最短的
+        assert order[:3] == [("start", 0), ("start", 1), ("start", 2)]
+        assert order[3] == ("done", 2)
+    finally:
+        PRIMITIVES.pop()
+        del PRIMITIVE_IDS["fetch"]
+
+def test_timeout_and_cancel():
+    async def main():
+        sched = CillyScheduler(slice_size=100)
+        spin = sched.submit('while (true) { }', timeout=0.05)
+        victim = sched.submit('var i = 0; while (true) { i = i + 1; }')
+        quick = sched.submit(COUNT % (10, "q"))
+        await asyncio.sleep(0.01)
+        sched.cancel(victim)
+        return await asyncio.gather(spin, victim, quick)
+    spin, victim, quick = run(main())
+    assert spin["status"] == TIMEOUT
+    assert victim["status"] == CANCELLED
+    assert quick["status"] == FINISHED and quick["output"] == "q 10 \n"
+
+def test_errors_are_isolated():
+    async def main():
+        sched = CillyScheduler()
+        return await sched.run_all(['print(undefined_name);', 'print(1 +);', COUNT % (5, "ok")])
+    bad_name, bad_syntax, ok = run(main())
+    assert bad_name["status"] == ERROR and bad_syntax["status"] == ERROR
+    assert ok["output"] == "ok 5 \n"
+
+def test_fair_slices():
+    # 两个同样长的程序轮流执行，短程序不会被长程序饿死
+    finished = []
+
+    async def main():
+        sched = CillyScheduler(slice_size=100)
+        long = sched.submit(COUNT % (20000, "long"))
+        short = sched.submit(COUNT % (200, "short"))
+        for t in (long, short):
+            t.add_done_callback(lambda t: finished.append(t.result()["output"].split()[0]))
+        await asyncio.gather(long, short)
+    run(main())
+    assert finished == ["short", "long"]
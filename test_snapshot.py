@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+测试 VM 快照：在递归调用中途保存，恢复到新 VM 后继续运行得到相同输出
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lexer import cilly_lexer
+from cilly_parser_module import cilly_parser
+from compile import cilly_vm_compiler
+from vm import CillyVM, RUNNING, FINISHED
+from output import StringSink
+
+PROGRAM = '''
+var total = 0;
+var big = 123456789012345678901234567890;
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+var i = 0;
+while (i < 10) {
+    total = total + fib(i) * 1.5;
+    i = i + 1;
+}
+print("total", total, big, "ok", i < 20, null);
+'''
+
+def make_vm(src=PROGRAM):
+    sink = StringSink()
+    return CillyVM(*cilly_vm_compiler(cilly_parser(cilly_lexer(src))), output=sink), sink
+
+def test_snapshot_inside_call():
+    expected_vm, expected = make_vm()
+    expected_vm.run(show_stats=False)
+
+    vm, sink = make_vm()
+    while len(vm.call_stack.stack) < 4:
+        assert vm.run_for(1) == RUNNING
+    blob = vm.snapshot()
+
+    restored, restored_sink = make_vm()
+    restored.restore(blob)
+    assert restored.pc == vm.pc
+    assert len(restored.call_stack.stack) == len(vm.call_stack.stack)
+    # 调用栈记录调用方作用域链的长度，当前链与 vm.scopes 共享全局作用域对象
+    assert restored.call_stack.stack == vm.call_stack.stack
+    assert restored.scopes[0] is restored.active_scopes[0]
+
+    restored.run(show_stats=False)
+    vm.run(show_stats=False)
+    assert restored_sink.getvalue() == sink.getvalue() == expected.getvalue()
+    assert restored.stack.get_stats() == vm.stack.get_stats()
+    assert restored.status == FINISHED
+
+def test_snapshot_roundtrip_is_stable():
+    vm, _ = make_vm()
+    vm.run_for(200)
+    blob = vm.snapshot()
+    restored, _ = make_vm()
+    assert restored.restore(blob).snapshot() == blob
+
+def test_wrong_program_rejected():
+    vm, _ = make_vm()
+    vm.run_for(10)
+    other, _ = make_vm('print(1);')
+    for data in (vm.snapshot(), b'garbage'):
+        try:
+            other.restore(data)
+        except Exception as e:
+            assert 'snapshot' in str(e)
+        else:
+            assert False, 'expected restore error'
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+测试 Chrome trace 导出：流水线区间、函数调用的 B/E 配对与环形缓冲区
+"""
+
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tracer import CillyTracer, traced_run
+from output import StringSink
+from vm import CALL
+
+PROGRAM = '''
+define fib = fun(n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+};
+print(fib(6));
+'''
+
+def test_pipeline_and_calls(tmp_path):
+    tracer = CillyTracer()
+    out = StringSink()
+    vm = traced_run(PROGRAM, tracer, output=out, dis=True)
+    assert out.getvalue() == "8 \n"
+    assert vm.ops[CALL] == vm.call_proc
+
+    path = tmp_path / "trace.json"
+    tracer.write(str(path))
+    events = json.loads(path.read_text(encoding='utf-8'))["traceEvents"]
+    spans = [e["name"] for e in events if e["ph"] == "X"]
+    assert spans == ["cilly_lexer", "cilly_parser", "cilly_vm_compiler", "cilly_vm_dis", "run"]
+    begins = [e for e in events if e["ph"] == "B"]
+    ends = [e for e in events if e["ph"] == "E"]
+    assert len(begins) == len(ends) == 25
+    assert all(e["name"] == "fib" for e in begins)
+    run = next(e for e in events if e["name"] == "run")
+    assert all(run["ts"] <= e["ts"] <= run["ts"] + run["dur"] for e in begins)
+
+def test_ring_buffer_drops_orphan_ends():
+    tracer = CillyTracer(maxlen=10)
+    traced_run(PROGRAM, tracer, output=StringSink())
+    assert len(tracer.events) == 10 and tracer.dropped > 0
+    depth = 0
+    for e in tracer.trace_events():
+        depth += {"B": 1, "E": -1}.get(e["ph"], 0)
+        assert depth >= 0
+
+def test_jit_calls_are_complete_events():
+    tracer = CillyTracer()
+    from lexer import cilly_lexer
+    from cilly_parser_module import cilly_parser
+    from compile import cilly_vm_compiler
+    from vm import CillyVM
+    from tracer import enable_tracing
+    vm = CillyVM(*cilly_vm_compiler(cilly_parser(cilly_lexer(PROGRAM))), output=StringSink())
+    vm.enable_jit(threshold=3)
+    enable_tracing(vm, tracer)
+    vm.run(show_stats=False)
+    events = tracer.trace_events()
+    assert any(e["ph"] == "X" and e.get("args", {}).get("jit") for e in events)
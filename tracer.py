@@ -0,0 +1,189 @@
+'''
+Chrome trace-event 格式的执行跟踪 (可在 Perfetto / chrome://tracing 中打开)
+
+记录两类事件：
+- 流水线各阶段的区间 (cilly_lexer / cilly_parser / cilly_vm_compiler /
+  cilly_vm_dis / VM 执行)，为完整事件 "X"
+- 每次 Cilly 函数调用的进入/退出，为 "B" / "E" 事件；被 JIT 编译的调用
+  整体记为一个 "X" 事件。字节码带行号表时 args.line 为调用处的源码行
+
+事件存放在有界的环形缓冲区 (deque(maxlen)) 中，跟踪很长的运行时只保留
+最近的事件；导出时丢弃起点已被挤出缓冲区的 "E" 事件。
+
+    tracer = CillyTracer()
+    vm = traced_run(source, tracer)          # 各阶段 + 函数调用
+    tracer.write('trace.json')
+
+函数调用的跟踪与 profiler.py 一样通过替换 vm.ops 中 CALL / RETURN /
+RETURN_VALUE 的处理函数实现，disable_tracing 后恢复。
+'''
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from vm import CALL, RETURN, RETURN_VALUE
+from linetable import pc_to_line
+
+TRACE_BUFFER = 1_000_000  # 环形缓冲区最多保留的事件数
+
+class CillyTracer:
+    def __init__(self, maxlen=TRACE_BUFFER, clock=time.perf_counter_ns):
+        self.events = deque(maxlen=maxlen)
+        self.clock = clock
+        self.pid = os.getpid()
+        self.dropped = 0  # 被挤出缓冲区的事件数
+
+    def tid(self):
+        return threading.get_ident()
+
+    def emit(self, event):
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+
+    def now(self):
+        return self.clock() / 1000  # trace-event 的时间单位是微秒
+
+    # --- 区间 ---
+
+    def complete(self, name, start, end, cat='pipeline', args=None):
+        event = {"name": name, "cat": cat, "ph": "X", "ts": start, "dur": end - start,
+                 "pid": self.pid, "tid": self.tid()}
+        if args:
+            event["args"] = args
+        self.emit(event)
+
+    @contextmanager
+    def span(self, name, cat='pipeline', **args):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.complete(name, start, self.now(), cat, args)
+
+    def traced(self, f, name=None, cat='pipeline'):
+        # 包装一个函数，每次调用记为一个区间
+        name = name or f.__name__
+
+        def call(*args, **kwargs):
+            with self.span(name, cat):
+                return f(*args, **kwargs)
+        return call
+
+    def begin(self, name, cat='call'):
+        self.emit({"name": name, "cat": cat, "ph": "B", "ts": self.now(), "pid": self.pid, "tid": self.tid()})
+
+    def end(self, name, cat='call'):
+        self.emit({"name": name, "cat": cat, "ph": "E", "ts": self.now(), "pid": self.pid, "tid": self.tid()})
+
+    # --- 导出 ---
+
+    def trace_events(self):
+        # 丢弃 "B" 已被挤出缓冲区的 "E" 事件，保证每个线程的 B/E 配对
+        open_spans = {}
+        events = []
+        for event in self.events:
+            if event["ph"] == "B":
+                open_spans[event["tid"]] = open_spans.get(event["tid"], 0) + 1
+            elif event["ph"] == "E":
+                if not open_spans.get(event["tid"]):
+                    continue
+                open_spans[event["tid"]] -= 1
+            events.append(event)
+        return events
+
+    def to_json(self):
+        return json.dumps({
+            "traceEvents": self.trace_events(),
+            "displayTimeUnit": "ns",
+            "otherData": {"dropped_events": self.dropped},
+        }, ensure_ascii=False)
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+
+# --- VM 函数调用 ---
+
+def enable_tracing(vm, tracer):
+    # 替换 CALL / RETURN / RETURN_VALUE 的处理函数；返回原处理函数供 disable_tracing 恢复
+    ops = vm.ops
+    originals = {op: ops[op] for op in (CALL, RETURN, RETURN_VALUE)}
+    call_stack = vm.call_stack.stack
+    code = vm.code
+    names = [func["name"] for func in vm.functions]
+    frames = []  # 进入函数后的 call_stack 深度 -> 函数名
+
+    call = originals[CALL]
+
+    def traced_call(pc):
+        depth = len(call_stack)
+        start = tracer.now()
+        next_pc = call(pc)
+        name = names[code[pc + 1]]
+        line = pc_to_line(code, pc)
+        if len(call_stack) > depth:
+            event = {"name": name, "cat": "call", "ph": "B", "ts": start,
+                     "pid": tracer.pid, "tid": tracer.tid()}
+            if line is not None:
+                event["args"] = {"line": line}
+            tracer.emit(event)
+            frames.append((len(call_stack), name))
+        else:
+            args = {"jit": True}
+            if line is not None:
+                args["line"] = line
+            tracer.complete(name, start, tracer.now(), 'call', args)
+        return next_pc
+
+    def make_return(handler):
+        def traced_return(pc):
+            depth = len(call_stack)
+            next_pc = handler(pc)
+            # call_function (JIT 回退) 直接进入的函数没有对应的进入事件
+            if frames and frames[-1][0] == depth:
+                tracer.end(frames.pop()[1])
+            return next_pc
+        return traced_return
+
+    ops[CALL] = traced_call
+    ops[RETURN] = make_return(originals[RETURN])
+    ops[RETURN_VALUE] = make_return(originals[RETURN_VALUE])
+    return originals
+
+def disable_tracing(vm, originals):
+    vm.ops.update(originals)
+
+# --- 流水线 ---
+
+def traced_run(source, tracer, primitives=None, output=None, dis=False, show_stats=False):
+    # 在跟踪下完成 词法分析 -> 语法分析 -> 编译 -> (反汇编) -> 执行，返回 VM
+    from lexer import cilly_lexer
+    from cilly_parser_module import cilly_parser
+    from compile import cilly_vm_compiler
+    from vm import CillyVM, cilly_vm_dis
+
+    primitives = primitives if primitives is not None else {}
+    with tracer.span('cilly_lexer', chars=len(source)):
+        tokens = cilly_lexer(source)
+    with tracer.span('cilly_parser'):
+        ast = cilly_parser(tokens)
+    with tracer.span('cilly_vm_compiler'):
+        code, consts, scopes, functions = cilly_vm_compiler(ast, list(primitives))
+    if dis:
+        with tracer.span('cilly_vm_dis'):
+            cilly_vm_dis(code, consts, scopes)
+    vm = CillyVM(code, consts, scopes, functions, primitives, output=output)
+    originals = enable_tracing(vm, tracer)
+    try:
+        with tracer.span('run', instructions=len(code)):
+            vm.run(show_stats)
+    finally:
+        disable_tracing(vm, originals)
+    return vm
+
+__all__ = ['CillyTracer', 'TRACE_BUFFER', 'enable_tracing', 'disable_tracing', 'traced_run']
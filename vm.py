@@ -1,4 +1,11 @@
-from lexer import error
+from array import array
+import sys
+import time
+
+from errors import error
+from primitives import PRIMITIVES, RETURNS_VALUE, get_primitive
+from output import BufferedSink
+from linetable import pc_to_line
 
 # --- Migrated from cilly_parser_module.py (via compile.py) ---
 
@@ -25,9 +32,22 @@ NULL = ['null', None]
 def val(v):
     return v[1]
 
+def mk_value(v):
+    # Python 值 -> Cilly 值 (primitive 的返回值)
+    if v is None:
+        return NULL
+    if isinstance(v, bool):
+        return mk_bool(v)
+    if isinstance(v, str):
+        return mk_str(v)
+    return mk_num(v)
+
 # --- Migrated from compile.py & yufa.py ---
 
 # Bytecode definitions
+# 指令集版本：修改 opcode 编号或操作数布局时递增
+BYTECODE_VERSION = 3
+
 LOAD_CONST = 1
 LOAD_NULL = 2
 LOAD_TRUE = 3
@@ -58,6 +78,9 @@ BINARY_EQ = 117
 BINARY_NE = 118
 BINARY_LT = 119
 BINARY_GE = 120
+# 超级指令：只由剖析引导优化合并热点相邻指令对生成 (见 pgo.py)
+BINARY_CONST = 130  # LOAD_CONST k; BINARY_x  ->  BINARY_CONST x k
+LOAD_VAR2 = 131  # LOAD_VAR a b; LOAD_VAR c d  ->  LOAD_VAR2 a b c d
 
 # OPS_NAME dictionary
 OPS_NAME = {
@@ -78,7 +101,7 @@ OPS_NAME = {
     CALL: ('CALL', 2),
     RETURN: ('RETURN', 1),
     RETURN_VALUE: ('RETURN_VALUE', 1),
-    CALL_PRIMITIVE: ('CALL_PRIMITIVE', 2),
+    CALL_PRIMITIVE: ('CALL_PRIMITIVE', 3),
     UNARY_NEG: ('UNARY_NEG', 1),
     UNARY_NOT: ('UNARY_NOT', 1),
     BINARY_ADD: ('BINARY_ADD', 1),
@@ -91,8 +114,136 @@ OPS_NAME = {
     BINARY_NE: ('BINARY_NE', 1),
     BINARY_LT: ('BINARY_LT', 1),
     BINARY_GE: ('BINARY_GE', 1),
+    BINARY_CONST: ('BINARY_CONST', 3),
+    LOAD_VAR2: ('LOAD_VAR2', 5),
 }
 
+# BINARY_CONST 按操作数中的二元 opcode 取运算
+BINARY_VALUE = {
+    BINARY_ADD: lambda a, b: mk_num(a + b),
+    BINARY_SUB: lambda a, b: mk_num(a - b),
+    BINARY_MUL: lambda a, b: mk_num(a * b),
+    BINARY_DIV: lambda a, b: mk_num(a / b),
+    BINARY_MOD: lambda a, b: mk_num(a % b),
+    BINARY_POW: lambda a, b: mk_num(a ** b),
+    BINARY_EQ: lambda a, b: mk_bool(a == b),
+    BINARY_NE: lambda a, b: mk_bool(a != b),
+    BINARY_LT: lambda a, b: mk_bool(a < b),
+    BINARY_GE: lambda a, b: mk_bool(a >= b),
+}
+
+# 可恢复执行的状态 (run_for / run_until / steps 的返回值)
+RUNNING = 'running'
+FINISHED = 'finished'
+ERROR = 'error'
+WAITING = 'waiting'  # 停在异步 primitive 上，等待 resume(结果)
+
+RUN_SLICE = 10000  # run_until / steps 每片执行的指令数
+FRAME_POOL_LIMIT = 4096  # 每种帧大小最多保留的空闲帧数
+
+# call_function 使用的返回地址：被调函数返回到这里时结束内层循环
+CALL_SENTINEL = -1
+
+# --- Bytecode container ---
+
+# 字节码存放在定长 32 位有符号整数槽中 (array('i'))，
+# 每条指令占 OPS_NAME 中给出的槽数：opcode 之后紧跟操作数。
+# 相比 Python list (每槽 8 字节指针 + int 对象)，每槽固定 4 字节，
+# 并且可以直接以 bytes/memoryview 的形式共享或映射。
+CODE_TYPECODE = 'i'
+
+def mk_code(slots=()):
+    return array(CODE_TYPECODE, slots)
+
+class Code(array):
+    # 编译器输出的字节码：与 array('i') 相同，另带 pc -> 行号表 (linetable.LineTable)
+    __slots__ = ('linetable',)
+
+    def __new__(cls, slots=(), linetable=None):
+        self = super().__new__(cls, CODE_TYPECODE, slots)
+        self.linetable = linetable
+        return self
+
+def encode_code(code):
+    if isinstance(code, array) and code.typecode == CODE_TYPECODE:
+        return code
+    if isinstance(code, (bytes, bytearray, memoryview)):
+        return code_from_bytes(code)
+    try:
+        return mk_code(code)
+    except OverflowError:
+        error('cilly bytecode', '操作数超出 32 位范围')
+
+def decode_code(code):
+    return list(encode_code(code))
+
+def code_to_bytes(code):
+    # 统一使用小端序，保证跨平台一致
+    code = encode_code(code)
+    if sys.byteorder != 'little':
+        code = mk_code(code)
+        code.byteswap()
+    return code.tobytes()
+
+def code_from_bytes(b):
+    code = mk_code()
+    code.frombytes(b)
+    if sys.byteorder != 'little':
+        code.byteswap()
+    return code
+
+def iter_instructions(code):
+    pc = 0
+    while pc < len(code):
+        opcode = code[pc]
+        name, size = OPS_NAME.get(opcode, (f'UNKNOWN {opcode}', 1))
+        yield pc, opcode, tuple(code[pc + 1:pc + size])
+        pc += size
+
+def instruction_count(code):
+    return sum(1 for _ in iter_instructions(code))
+
+# --- Primitive binding ---
+
+CO_COROUTINE = 0x80  # inspect.CO_COROUTINE；不导入 inspect 以缩短启动时间
+
+def is_coroutine_function(f):
+    # async def 定义的函数 (含绑定方法)
+    code = getattr(f, '__code__', None)
+    return code is not None and bool(code.co_flags & CO_COROUTINE)
+
+def bind_primitives(primitives, signals, err):
+    # 加载时按 prim_id 绑定：优先使用直接传入的函数，其次是信号的 emit
+    table = []
+    for prim in PRIMITIVES:
+        name = prim["name"]
+        if name in primitives and is_coroutine_function(primitives[name]):
+            table.append(_suspending_primitive(primitives[name]))
+        elif name in primitives:
+            table.append(primitives[name])
+        elif name in signals:
+            table.append(signals[name].emit)
+        else:
+            table.append(_missing_primitive(name, err))
+    return table
+
+class PrimitiveSuspend(Exception):
+    # 异步 primitive 被调用时抛出，run_for 捕获后暂停 VM
+    def __init__(self, awaitable):
+        super().__init__('primitive suspended')
+        self.awaitable = awaitable
+
+def _suspending_primitive(f):
+    # 同步 primitive 不经过这里，热路径上没有额外判断
+    def call(*args):
+        raise PrimitiveSuspend(f(*args))
+    return call
+
+def _missing_primitive(name, err):
+    def missing(*args):
+        err(f"未知的 primitive 信号: {name}")
+    return missing
+
 # --- Migrated from yufa.py ---
 
 class Stack:
@@ -126,18 +277,34 @@ class Stack:
         }
 
 class CillyVM:
-    def __init__(self, code, consts, scopes, functions=None, primitives=None, signals=None):
-        self.code = code
+    def __init__(self, code, consts, scopes, functions=None, primitives=None, signals=None, output=None):
+        self.code = encode_code(code)
         self.consts = consts
         self.scopes = list(scopes) # Get a mutable copy
         self.functions = functions if functions is not None else []
         self.primitives = primitives if primitives is not None else {}
         self.signals = signals if signals is not None else {}
+        self.output = output if output is not None else BufferedSink()
+        self.write = self.output.write
         
         self.stack = Stack()
         self.call_stack = Stack()
         self.active_scopes = list(scopes)
         self.pc = 0
+        self.status = RUNNING
+        self.error = None
+        self.error_line = None  # 出错指令对应的源码行
+        self.pending = None  # WAITING 时等待的 awaitable
+        self.pending_prim = None
+
+        self.prim_table = bind_primitives(self.primitives, self.signals, self.err)  # prim_id -> 可调用对象
+        self.prim_returns = [p["returns"] == RETURNS_VALUE for p in PRIMITIVES]
+        self.call_counts = [0] * len(self.functions)  # 每个函数的调用次数，JIT 用来发现热点
+        self.frame_layouts = [None] * len(self.functions)  # func_id -> (入口, 参数个数, 帧大小)
+        self.frame_pool = {}  # 帧大小 -> 空闲的作用域列表
+        self.blank_frames = {}  # 帧大小 -> 全 NULL 元组，复用时用来重置
+        self.jit = None
+        self.profiler = None
 
         self.ops = {
             LOAD_CONST: self.load_const, LOAD_NULL: self.load_null, LOAD_TRUE: self.load_true,
@@ -151,6 +318,7 @@ class CillyVM:
             BINARY_SUB: self.binary_op, BINARY_MUL: self.binary_op, BINARY_DIV: self.binary_op,
             BINARY_MOD: self.binary_op, BINARY_POW: self.binary_op, BINARY_EQ: self.binary_op,
             BINARY_NE: self.binary_op, BINARY_LT: self.binary_op, BINARY_GE: self.binary_op,
+            BINARY_CONST: self.binary_const, LOAD_VAR2: self.load_var2,
         }
 
     def err(self, msg):
@@ -191,6 +359,19 @@ class CillyVM:
         self.push(scope[index])
         return pc + 3
 
+    def load_var2(self, pc):
+        code, scopes = self.code, self.active_scopes
+        try:
+            v1 = scopes[-code[pc + 1] - 1][code[pc + 2]]
+            v2 = scopes[-code[pc + 3] - 1][code[pc + 4]]
+        except IndexError:
+            # 越界时按两条 LOAD_VAR 执行，报告同样的错误
+            self.load_var(pc)
+            return self.load_var(pc + 2)
+        self.push(v1)
+        self.push(v2)
+        return pc + 5
+
     def store_var(self, pc):
         scope_i = self.code[pc + 1]
         if scope_i >= len(self.active_scopes):
@@ -203,22 +384,58 @@ class CillyVM:
         return pc + 3
 
     def enter_scope(self, pc):
-        var_count = self.code[pc + 1]
-        scope = [NULL for _ in range(var_count)]
-        self.active_scopes.append(scope)
+        self.active_scopes.append(self.acquire_frame(self.code[pc + 1]))
         return pc + 2
 
     def leave_scope(self, pc):
-        self.active_scopes.pop()
+        self.release_frames(len(self.active_scopes) - 1)
         return pc + 1
 
+    # --- 帧池 ---
+    # 函数帧和块作用域都是定长的 NULL 列表；离开时按大小放回空闲表，
+    # 再次进入时重置后复用，稳态递归中不再分配新的列表。
+
+    def acquire_frame(self, size):
+        free = self.frame_pool.get(size)
+        if free:
+            frame = free.pop()
+            frame[:] = self.blank_frames[size]
+            return frame
+        if size not in self.blank_frames:
+            self.blank_frames[size] = (NULL,) * size
+            self.frame_pool[size] = []
+        return [NULL] * size
+
+    def release_frames(self, depth):
+        # 把作用域链截断到 depth，截下的帧放回空闲表
+        scopes = self.active_scopes
+        pool = self.frame_pool
+        for frame in scopes[depth:]:
+            free = pool.get(len(frame))
+            if free is not None and len(free) < FRAME_POOL_LIMIT:
+                free.append(frame)
+        del scopes[depth:]
+
+    def frame_layout(self, func_id):
+        func = self.functions[func_id]
+        params = func.get("params", [])
+        func_scope_names = None
+        for s in self.scopes:
+             if set(s) == set(params):
+                 func_scope_names = s
+                 break
+        if func_scope_names is None:
+            self.err(f'找不到函数 {func["name"]} 的作用域')
+        layout = (func["entry_point"], len(params), len(func_scope_names))
+        self.frame_layouts[func_id] = layout
+        return layout
+
     def print_item(self, pc):
-        v = val(self.pop())
-        print(v, end=' ')
+        self.write(f'{val(self.pop())} ')
         return pc + 1
 
     def print_newline(self, pc):
-        print('')
+        self.write('\n')
         return pc + 1
 
     def pop_proc(self, pc):
@@ -261,107 +478,226 @@ class CillyVM:
         else: self.err(f'非法二元opcode:{opcode}')
         return pc + 1
 
+    def binary_const(self, pc):
+        code = self.code
+        v1 = val(self.pop())
+        self.push(BINARY_VALUE[code[pc + 1]](v1, val(self.consts[code[pc + 2]])))
+        return pc + 3
+
     def call_proc(self, pc):
         func_id = self.code[pc + 1]
+        return self.enter_function(func_id, pc + 2)
+
+    def enter_function(self, func_id, return_addr):
         if self.functions is None or func_id >= len(self.functions):
             self.err(f'非法函数ID: {func_id}')
-        func = self.functions[func_id]
-        params = func.get("params", [])
-        
-        func_scope_names = None
-        for s in self.scopes:
-             if set(s) == set(params):
-                 func_scope_names = s
-                 break
-        
-        func_scope = [NULL] * len(func_scope_names)
-        for i in range(len(params)):
-             param_value = self.pop()
-             func_scope[i] = param_value
+        layout = self.frame_layouts[func_id] or self.frame_layout(func_id)
+        entry, nparams, size = layout
 
-        self.call_stack.push((pc + 2, self.active_scopes))
-        self.active_scopes = self.active_scopes + [func_scope]
-        return func["entry_point"]
+        func_scope = self.acquire_frame(size)
+        pop = self.stack.pop
+        for i in range(nparams):
+             func_scope[i] = pop()
+
+        # 调用栈只记录返回地址和调用方作用域链的长度，返回时截断即可恢复
+        scopes = self.active_scopes
+        self.call_stack.push((return_addr, len(scopes)))
+        scopes.append(func_scope)
+        return entry
 
     def return_proc(self, pc):
         if self.call_stack.empty(): self.err('函数返回栈为空')
-        return_addr, prev_scopes = self.call_stack.pop()
-        self.active_scopes = prev_scopes
+        return_addr, depth = self.call_stack.pop()
+        self.release_frames(depth)
         self.push(NULL)
         return return_addr
 
     def return_value_proc(self, pc):
         if self.call_stack.empty(): self.err('函数返回栈为空')
         return_value = self.pop()
-        return_addr, prev_scopes = self.call_stack.pop()
-        self.active_scopes = prev_scopes
+        return_addr, depth = self.call_stack.pop()
+        self.release_frames(depth)
         self.push(return_value)
         return return_addr
 
-    def call_primitive_proc(self, pc):
-        const_i = self.code[pc + 1]
-        prim_name = val(self.consts[const_i])
-
-        if prim_name not in self.signals:
-            self.err(f"未知的 primitive 信号: {prim_name}")
-
-        signal = self.signals[prim_name]
-
-        # 从 PyQt 文档中获取参数数量的方法不如 inspect 直观，
-        # 我们假设信号的签名与预期的 turtle 函数匹配。
-        # 这是一个基于约定的方法，比运行时反射更简单。
-        # 例如，forward_signal = pyqtSignal(float) 将有一个参数。
-        # 我们将根据函数名硬编码参数数量。
-        arg_counts = {
-            "forward": 1, "backward": 1, "left": 1, "right": 1,
-            "penup": 0, "pendown": 0, "pencolor": 1, "pensize": 1,
-            "reset": 0, "speed": 1
-        }
-        num_args = arg_counts.get(prim_name, 0)
+    def call_function(self, func_id, args):
+        """在解释器中完成一次完整的函数调用并返回结果，供 JIT 代码回调。"""
+        for v in reversed(args):
+            self.push(v)
+        pc = self.enter_function(func_id, CALL_SENTINEL)
+        code, ops = self.code, self.ops
+        while pc != CALL_SENTINEL:
+            pc = ops[code[pc]](pc)
+        return self.pop()
+
+    def snapshot(self):
+        # 完整执行状态 -> bytes，见 snapshot.py
+        from snapshot import dump_snapshot
+        self.output.flush()
+        return dump_snapshot(self)
+
+    def restore(self, data):
+        # 在由同一程序构造的 VM 上恢复 snapshot() 保存的状态
+        from snapshot import load_snapshot
+        return load_snapshot(self, data)
+
+    def enable_jit(self, threshold=None):
+        from jit import CillyJIT
+        self.jit = CillyJIT(self, threshold)
+        self.ops[CALL] = self.jit.call_proc
+
+    def enable_profiling(self):
+        # 替换分派表中的处理函数；profiler.disable() 恢复，见 profiler.py
+        from profiler import CillyProfiler
+        self.profiler = CillyProfiler(self).enable()
+        return self.profiler
 
-        args = [val(self.pop()) for _ in range(num_args)]
-        args.reverse()
+    def call_primitive_proc(self, pc):
+        code = self.code
+        prim_id = code[pc + 1]
+        pop = self.stack.pop
 
-        # 发出信号而不是直接调用函数
-        signal.emit(*args)
+        # 栈顶是第一个实参，依次弹出即为参数顺序
+        result = self.prim_table[prim_id](*[val(pop()) for _ in range(code[pc + 2])])
 
-        # Primitive 调用在我们的模型中不返回值到 VM 栈上
-        self.push(NULL)
-
-        return pc + 2
+        self.push(mk_value(result) if self.prim_returns[prim_id] else NULL)
+        return pc + 3
 
     def get_opcode_proc(self, opcode):
         if opcode not in self.ops:
             self.err(f'非法opcode: {opcode}')
         return self.ops[opcode]
 
-    def run(self):
-        while self.pc < len(self.code):
-            opcode = self.code[self.pc]
-            proc = self.get_opcode_proc(opcode)
-            self.pc = proc(self.pc)
-        
+    def run(self, show_stats=True):
+        while self.run_for(RUN_SLICE) == RUNNING:
+            pass
+        if self.status == WAITING:
+            self.pending.close()
+            self.err('run() 不能等待异步 primitive，请使用 CillyScheduler')
+        if self.status == ERROR:
+            raise self.error
+        self.report(show_stats)
+        self.output.flush()
+
+    def run_for(self, n):
+        # 最多执行 n 条指令后返回状态；状态为 RUNNING 时可再次调用以继续。
+        # call_function 的内层循环 (JIT 回退到解释器) 整体算作一条 CALL。
+        if self.status != RUNNING:
+            return self.status
+        code, ops = self.code, self.ops
+        end = len(code)
+        pc = self.pc
+        try:
+            for _ in range(n):
+                if pc >= end:
+                    break
+                pc = ops[code[pc]](pc)
+        except PrimitiveSuspend as suspend:
+            return self.suspend(pc, suspend.awaitable)
+        except Exception as e:
+            if code[pc] not in ops:
+                try:
+                    self.get_opcode_proc(code[pc])
+                except Exception as opcode_error:
+                    e = opcode_error
+            self.pc = pc
+            self.status = ERROR
+            self.error = self.locate_error(e, pc)
+            self.output.flush()
+            return self.status
+        self.pc = pc
+        if pc >= end:
+            self.status = FINISHED
+        self.output.flush()
+        return self.status
+
+    def locate_error(self, e, pc):
+        # 给运行时错误附上源码行：本工具链的错误 (Exception) 直接加在消息末尾，
+        # 其它 Python 异常保持类型不变，行号记在 cilly_line 上 (errors.error_text 把它加进消息)
+        # 并作为 note
+        line = pc_to_line(self.code, pc)
+        self.error_line = line
+        if line is None:
+            return e
+        if type(e) is Exception:
+            located = Exception(f'{e} (第 {line} 行)')
+            located.__cause__ = e.__cause__
+            return located.with_traceback(e.__traceback__)
+        e.cilly_line = line
+        e.add_note(f'Cilly 源码第 {line} 行 (pc {pc})')
+        return e
+
+    def suspend(self, pc, awaitable):
+        code = self.code
+        if code[pc] != CALL_PRIMITIVE:
+            # 在 call_function 的内层循环或 JIT 代码中无法保存现场
+            awaitable.close()
+            self.pc = pc
+            self.status = ERROR
+            try:
+                self.err('异步 primitive 只能在解释执行的顶层循环中调用')
+            except Exception as e:
+                self.error = e
+        else:
+            self.pc = pc + OPS_NAME[CALL_PRIMITIVE][1]
+            self.status = WAITING
+            self.pending = awaitable
+            self.pending_prim = code[pc + 1]
+        self.output.flush()
+        return self.status
+
+    def resume(self, value=None):
+        # 异步 primitive 完成后把结果放回栈上，继续执行
+        if self.status != WAITING:
+            self.err(f'VM 没有在等待异步 primitive: {self.status}')
+        self.push(mk_value(value) if self.prim_returns[self.pending_prim] else NULL)
+        self.pending = None
+        self.pending_prim = None
+        self.status = RUNNING
+
+    def run_until(self, deadline, slice_size=RUN_SLICE):
+        # deadline 为 time.monotonic() 时间；至少执行一片，保证每次调用都有进展
+        while True:
+            status = self.run_for(slice_size)
+            if status != RUNNING or time.monotonic() >= deadline:
+                return status
+
+    def steps(self, slice_size=RUN_SLICE):
+        # 生成器接口：每执行一片产出一次状态，直到结束或出错
+        while True:
+            status = self.run_for(slice_size)
+            yield status
+            if status != RUNNING:
+                return
+
+    def report(self, show_stats):
+        write = self.write
         if not self.stack.empty():
-            print("\nValues left on stack:")
+            write("\nValues left on stack:\n")
             while not self.stack.empty():
-                print(val(self.stack.pop()), end=' ')
-            print()
+                write(f'{val(self.stack.pop())} ')
+            write('\n')
+
+        if not show_stats:
+            return
             
         stats = self.stack.get_stats()
-        print("\nStack Statistics:")
-        print(f"Push operations: {stats['push_count']}")
-        print(f"Pop operations: {stats['pop_count']}")
-        print(f"Current stack depth: {stats['current_depth']}")
-        print(f"Maximum stack depth: {stats['max_depth']}")
-
-def cilly_vm(code, consts, scopes, functions=None, primitives=None, signals=None):
-    vm = CillyVM(code, consts, scopes, functions, primitives, signals)
+        write("\nStack Statistics:\n")
+        write(f"Push operations: {stats['push_count']}\n")
+        write(f"Pop operations: {stats['pop_count']}\n")
+        write(f"Current stack depth: {stats['current_depth']}\n")
+        write(f"Maximum stack depth: {stats['max_depth']}\n")
+
+def cilly_vm(code, consts, scopes, functions=None, primitives=None, signals=None, output=None):
+    vm = CillyVM(code, consts, scopes, functions, primitives, signals, output)
     vm.run()
 
-def cilly_vm_dis(code, consts, all_scopes):
+def cilly_vm_dis(code, consts, all_scopes, annotations=None):
+    # annotations: pc -> 附加在该行末尾的说明 (例如剖析数据)
     def err(msg):
         error('cilly vm disassembler', msg)
     
+    code = encode_code(code)
     output = []
     pc = 0
     
@@ -372,11 +708,31 @@ def cilly_vm_dis(code, consts, all_scopes):
     
     next_scope_ptr = 1
 
+    def var_operand(at):
+        relative_scope_i = code[at]
+        var_i = code[at + 1]
+        var_name = "???"
+        try:
+            target_scope = dis_scopes[-relative_scope_i - 1]
+            var_name = target_scope[var_i]
+        except IndexError:
+            var_name = "Error:OOB"
+        return f' {relative_scope_i} {var_i} ({var_name})'
+
+    has_lines = getattr(code, 'linetable', None) is not None
+    prev_line = None
+
     while pc < len(code):
         opcode = code[pc]
         name, size = OPS_NAME.get(opcode, (f'UNKNOWN {opcode}', 1))
         
         line = f'{pc:04d}\t{name}'
+        if has_lines:
+            # 与 CPython dis 相同，只在每个源码行的第一条指令前标出行号
+            src_line = pc_to_line(code, pc)
+            mark = str(src_line) if src_line != prev_line and src_line is not None else ''
+            prev_line = src_line
+            line = f'{mark:>4}  {line}'
 
         if opcode == ENTER_SCOPE:
             if next_scope_ptr < len(all_scopes):
@@ -394,20 +750,18 @@ def cilly_vm_dis(code, consts, all_scopes):
             line += f' {index} ({v})'
 
         elif opcode in [LOAD_VAR, STORE_VAR]:
-            relative_scope_i = code[pc + 1]
-            var_i = code[pc + 2]
-            var_name = "???"
-            try:
-                target_scope = dis_scopes[-relative_scope_i - 1]
-                var_name = target_scope[var_i]
-            except IndexError:
-                var_name = "Error:OOB"
-            line += f' {relative_scope_i} {var_i} ({var_name})'
+            line += var_operand(pc + 1)
+
+        elif opcode == LOAD_VAR2:
+            line += var_operand(pc + 1) + var_operand(pc + 3)
+
+        elif opcode == BINARY_CONST:
+            index = code[pc + 2]
+            line += f' {OPS_NAME[code[pc + 1]][0]} {index} ({consts[index]})'
 
         elif opcode == CALL_PRIMITIVE:
-            const_i = code[pc + 1]
-            prim_name = consts[const_i]
-            line += f' {const_i} ({val(prim_name)})'
+            prim_id = code[pc + 1]
+            line += f' {prim_id} {code[pc + 2]} ({get_primitive(prim_id)["name"]})'
 
         else:
             if size > 1:
@@ -415,6 +769,9 @@ def cilly_vm_dis(code, consts, all_scopes):
             if size > 2:
                 line += f' {code[pc + 2]}'
         
+        if annotations and pc in annotations:
+            line += f'\t; {annotations[pc]}'
+
         output.append(line)
         pc += size
         
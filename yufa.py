@@ -2,21 +2,15 @@ import sys
 from lexer import cilly_lexer, error
 from cilly_parser_module import cilly_parser
 from compile import cilly_vm_compiler
-import turtle
 from vm import CillyVM, cilly_vm_dis
+from py_transpiler import cilly_to_py, load_py_module, run_py_module
+from providers import lazy_primitives
+from examples import tests  # 测试用例集合定义在 examples.py，在此重新导出
 
-turtle_primitives = {
-    "forward": turtle.forward,
-    "backward": turtle.backward,
-    "left": turtle.left,
-    "right": turtle.right,
-    "penup": turtle.penup,
-    "pendown": turtle.pendown,
-    "pencolor": turtle.pencolor,
-    "speed": turtle.speed,
-}
+# turtle (tkinter) 在程序第一次调用 primitive 时才导入
+turtle_primitives = lazy_primitives('tk')
 
-def run_test(name, program, primitives=None):
+def run_test(name, program, primitives=None, backend='vm'):
     print(f"\n=== Testing {name} ===")
     print("Program:")
     print(program)
@@ -25,6 +19,14 @@ def run_test(name, program, primitives=None):
     ast = cilly_parser(ts)
     
     primitive_names = list(primitives.keys()) if primitives else []
+    if backend == 'py':
+        source = cilly_to_py(ast, primitive_names)
+        print("\nGenerated Python:")
+        print(source)
+        print("\nActual output:")
+        run_py_module(load_py_module(source, primitives))
+        return
+
     code, consts, scopes, functions = cilly_vm_compiler(ast, primitive_names)
     
     print("\nDisassembly with variable names:")
@@ -34,84 +36,31 @@ def run_test(name, program, primitives=None):
     vm_instance = CillyVM(code, consts, scopes, functions, primitives)
     vm_instance.run()
 
-# Test cases collection
-tests = {
-    "Basic Arithmetic": '''
-print(1 + 2 * 3);
-print(4 * 5);
-''',
-    "Variable Scoping": '''
-var x1 = 100;
-{
-    var x1 = 200;
-    {
-        var x1 = 300;
-        print("inner x1", x1);
-    }
-    print("middle x1", x1);
-}
-print("outer x1", x1);
-''',
-    "Conditional Statements": '''
-if(1 > 2)
-    print(3);
-else
-    print(4);
-
-if(1 > 2 && 5 > 4)
-    print(30);
-else
-    print(42);
-''',
-    "Variable Name Display": '''
-var a = 100;
-var b = 200;
-var c = a + b * 5;
-print(c);
-''',
-    "Mutual Recursion": '''
-define odd = fun(n){
-  if(n == 0)
-    return false;
-  else
-   return even(n-1);
-};
-define even = fun(n) {
- if(n==0)
-   return true;
- else
-   return odd(n-1);
-};
-
-print("even(3)=", even(3));
-print("odd(3)=", odd(3));
-''',
-    "Fern Turtle Graphics": '''
-define fern = fun(len) {
-    if(len > 5){
-        forward(len);
-        right(10);
-        fern(len - 10);
-        left(40);
-        fern(len - 10);
-        right(30);
-        backward(len);
-    }
-};
-
-pencolor("green");
-left(90);
-penup();
-backward(200);
-pendown();
-fern(100);
-'''
-}
+def run_file(path, backend='vm', provider='tk'):
+    with open(path, encoding='utf-8') as f:
+        program = f.read()
+    primitives = turtle_primitives if provider == 'tk' else lazy_primitives(provider)
+    ast = cilly_parser(cilly_lexer(program))
+    if backend == 'py':
+        run_py_module(load_py_module(cilly_to_py(ast, list(primitives)), primitives))
+    else:
+        code, consts, scopes, functions = cilly_vm_compiler(ast, list(primitives))
+        CillyVM(code, consts, scopes, functions, primitives).run()
 
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == 'gui':
         print("Starting GUI mode...")
         from gui import main as run_gui
         run_gui()
+    elif len(sys.argv) > 2 and sys.argv[1] == 'run':
+        backend = sys.argv[3] if len(sys.argv) > 3 else 'vm'
+        if backend not in ('vm', 'py'):
+            sys.exit(f"未知后端: {backend} (可选 vm, py)")
+        provider = sys.argv[4] if len(sys.argv) > 4 else 'tk'
+        if provider not in ('tk', 'headless'):
+            sys.exit(f"未知的 primitive 提供者: {provider} (可选 tk, headless)")
+        run_file(sys.argv[2], backend, provider)
     else:
-        print("Running command-line tests (currently disabled). Use 'python yufa.py gui' to start the IDE.")
+        print("Running command-line tests (currently disabled). Use 'python yufa.py gui' to start the IDE,")
+        print("or 'python yufa.py run <file> [vm|py] [tk|headless]' to run a program.")
+        print("See 'python cilly.py --help' for the full command-line runner.")